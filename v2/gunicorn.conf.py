@@ -0,0 +1,71 @@
+# gunicorn.conf.py
+"""Gunicorn settings for `gunicorn -c gunicorn.conf.py src.api.wsgi:app`.
+
+Sizing comes from the environment: WEB_CONCURRENCY workers with
+GUNICORN_THREADS threads each (gthread workers: requests mostly wait on the
+LLM, so threads are cheap concurrency). With RAG_PRELOAD=True the app module,
+and so the model and index, is loaded once in the master before forking.
+Workers share metrics through snapshot files in METRICS_DIR (a fresh temp
+directory unless set), so /api/metrics reports the whole server whichever
+worker answers the scrape.
+"""
+import glob
+import os
+import tempfile
+
+bind = os.getenv("GUNICORN_BIND", f"0.0.0.0:{os.getenv('PORT', '5050')}")
+workers = int(os.getenv("WEB_CONCURRENCY", "2"))
+# more threads than the generation bulkhead admits (8 running + 8 queued), so
+# retrieval and light endpoints always find a free thread
+threads = int(os.getenv("GUNICORN_THREADS", "32"))
+worker_class = "gthread"
+preload_app = os.getenv("RAG_PRELOAD", "True") == "True"
+timeout = int(os.getenv("GUNICORN_TIMEOUT", "120"))
+graceful_timeout = int(os.getenv("GUNICORN_GRACEFUL_TIMEOUT", "30"))
+keepalive = 5
+accesslog = os.getenv("GUNICORN_ACCESS_LOG")  # e.g. "-" for stdout
+# HF tokenizers' thread pool does not survive fork
+raw_env = ["TOKENIZERS_PARALLELISM=false"]
+# set before the app (and src.core.metrics) is imported, so every worker inherits it
+if not os.getenv("METRICS_DIR"):
+    os.environ["METRICS_DIR"] = tempfile.mkdtemp(prefix="rag-metrics-")
+
+
+def on_starting(server):
+    # snapshots from a previous run would add its totals to this one
+    for path in glob.glob(os.path.join(os.environ["METRICS_DIR"], "metrics-*.json")):
+        os.remove(path)
+
+
+def when_ready(server):
+    # what preloading recorded in the master (warm-up stages), counted once
+    import sys
+    metrics = sys.modules.get("src.core.metrics")
+    if metrics is not None:
+        metrics.REGISTRY.write_snapshot(collectors=False)
+
+
+def post_fork(server, worker):
+    from src.core.metrics import REGISTRY
+    # the master's values are in its own snapshot: don't count them once per worker
+    REGISTRY.reset()
+    REGISTRY.start_flusher()
+    # one torch intra-op pool per worker would oversubscribe the CPUs
+    import sys
+    torch = sys.modules.get("torch")
+    if torch is not None:
+        per_worker = int(os.getenv("TORCH_THREADS_PER_WORKER", max(1, (os.cpu_count() or 1) // workers)))
+        torch.set_num_threads(per_worker)
+
+
+def worker_exit(server, worker):
+    # Native thread pools started in the master (onnxruntime, imported by
+    # chromadb) do not exist in forked workers; their C++ destructors then
+    # abort or hang at interpreter exit. Skip them: nothing is left to flush.
+    import sys
+    metrics = sys.modules.get("src.core.metrics")
+    if metrics is not None:
+        metrics.REGISTRY.write_snapshot()  # counted since the last flush
+    sys.stdout.flush()
+    sys.stderr.flush()
+    os._exit(0)
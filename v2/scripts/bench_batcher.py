@@ -0,0 +1,72 @@
+# scripts/bench_batcher.py
+"""Query-embedding latency and throughput with and without dynamic batching.
+
+N client threads in one process each encode distinct single queries as fast
+as they can, like concurrent /api/chat requests calling embed_query. Reports
+p50/p99 latency and queries/s for direct model calls and for
+`BatchingEncoder` at each --wait-ms window.
+
+Offline by default (MiniLM-L6-shaped stand-in, see bench_embedding_server);
+pass --minilm for the real model.
+
+Usage: python -m scripts.bench_batcher [--clients 1 4 16 64] [--wait-ms 2 5] [--seconds 5]
+"""
+import sys
+sys.path.append('.')
+
+import argparse
+import threading
+import time
+
+import numpy as np
+
+from scripts.bench_embedding_server import _load_model
+from src.core.batcher import BatchingEncoder
+
+
+def measure(encoder, clients: int, seconds: float) -> dict:
+    latencies = []
+    lock = threading.Lock()
+    barrier = threading.Barrier(clients)
+
+    def client(i):
+        own, n = [], 0
+        barrier.wait()
+        deadline = time.perf_counter() + seconds
+        while time.perf_counter() < deadline:
+            t0 = time.perf_counter()
+            encoder.encode(f"what does article {i}-{n} of the convention protect")
+            own.append(time.perf_counter() - t0)
+            n += 1
+        with lock:
+            latencies.extend(own)
+
+    threads = [threading.Thread(target=client, args=(i,)) for i in range(clients)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    lat = np.array(latencies) * 1000
+    return {"qps": len(lat) / seconds, "p50_ms": np.percentile(lat, 50), "p99_ms": np.percentile(lat, 99)}
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--clients", type=int, nargs="+", default=[1, 2, 4, 8, 16, 32, 64])
+    parser.add_argument("--wait-ms", type=float, nargs="+", default=[2.0, 5.0])
+    parser.add_argument("--max-batch", type=int, default=32)
+    parser.add_argument("--seconds", type=float, default=5)
+    parser.add_argument("--minilm", action="store_true")
+    args = parser.parse_args()
+
+    model = _load_model(args.minilm)
+    model.encode(["warm up"])
+    encoders = {"direct": model}
+    for wait in args.wait_ms:
+        encoders[f"batched {wait:g}ms"] = BatchingEncoder(model, max_batch=args.max_batch, max_wait_ms=wait)
+
+    print(f"{'clients':>7} {'encoder':>14} {'queries/s':>10} {'p50 ms':>8} {'p99 ms':>8}")
+    for clients in args.clients:
+        for name, encoder in encoders.items():
+            r = measure(encoder, clients, args.seconds)
+            print(f"{clients:>7} {name:>14} {r['qps']:>10.1f} {r['p50_ms']:>8.1f} {r['p99_ms']:>8.1f}", flush=True)
@@ -0,0 +1,118 @@
+# scripts/bench_context_packing.py
+"""End-to-end latency with and without token-budgeted context packing.
+
+Runs SimpleRAG offline (throwaway Chroma dir) against a fake LLM whose
+latency grows with prompt size, so the effect of shorter prompts on response
+time can be measured without calling Gemini.
+
+Packing is not free: pack_context re-encodes up to 64 candidate sentences per
+request. That cost is reported on its own (pack ms, of which sentence
+encoding), so it can be weighed against the LLM time saved. It depends on the
+embedder:
+  standin   MiniLM-L6-shaped transformer with random weights (default):
+            MiniLM's compute without downloading weights
+  minilm    the real all-MiniLM-L6-v2
+  hashing   the hashing embedder: near-zero encode cost, hides it
+
+Usage: python -m scripts.bench_context_packing [--embedder standin|minilm|hashing]
+"""
+import sys
+sys.path.append('.')
+
+import argparse
+import tempfile
+import time
+
+from src.core import rag_system as rag_module
+from src.core.embeddings import HashingEmbedder
+from src.core.llm_client import FakeLLMBackend
+from src.core.rag_system import SimpleRAG
+
+
+QUERIES = [
+    ("What are human rights?", "foundational_rights"),
+    ("What is the CRC?", "childrens_rights"),
+    ("What is CEDAW?", "womens_rights"),
+]
+
+
+class PackTimer:
+    """Wraps pack_context to time it, and the sentence encoding inside it"""
+
+    def __init__(self, pack):
+        self.pack = pack
+        self.reset()
+
+    def reset(self):
+        self.calls, self.pack_s, self.encode_s, self.sentences = 0, 0.0, 0.0, 0
+
+    def __call__(self, *args, encode, **kwargs):
+        def timed_encode(sentences):
+            t0 = time.perf_counter()
+            try:
+                return encode(sentences)
+            finally:
+                self.encode_s += time.perf_counter() - t0
+                self.sentences += len(sentences)
+
+        t0 = time.perf_counter()
+        try:
+            return self.pack(*args, encode=timed_encode, **kwargs)
+        finally:
+            self.pack_s += time.perf_counter() - t0
+            self.calls += 1
+
+
+def load_embedder(name):
+    if name == "hashing":
+        return HashingEmbedder()
+    if name == "minilm":
+        from sentence_transformers import SentenceTransformer
+        return SentenceTransformer(rag_module.EMBEDDING_MODEL_ID)
+    from scripts.bench_embedding_server import MiniLMStandIn
+    # MiniLM reads up to 256 word pieces; sentences are rarely longer than 128 words
+    return MiniLMStandIn(max_len=128)
+
+
+def run(rag: SimpleRAG, timer: PackTimer, compress: bool, difficulty: str):
+    rag.compress_context = compress
+    timer.reset()
+    tokens, times = [], []
+    for query, topic in QUERIES:
+        start = time.perf_counter()
+        answer = rag.generate_answer(query, topic, difficulty)
+        times.append(time.perf_counter() - start)
+        tokens.append(answer.prompt_stats["prompt_tokens_after"])
+    n = len(QUERIES)
+    return {"tokens": sum(tokens) / n, "latency_s": sum(times) / n, "pack_s": timer.pack_s / n,
+            "encode_s": timer.encode_s / n, "sentences": timer.sentences / n}
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--embedder", choices=["standin", "minilm", "hashing"], default="standin")
+    args = parser.parse_args()
+
+    timer = PackTimer(rag_module.pack_context)
+    rag_module.pack_context = timer
+    with tempfile.TemporaryDirectory() as tmp:
+        rag = SimpleRAG(persist_directory=tmp, preload_topics=False,
+                        embedding_model=load_embedder(args.embedder),
+                        # full prompt sent every time: isolate the effect of packing
+                        llm=FakeLLMBackend(base_latency_s=0.05, latency_per_1k_tokens_s=0.08, cache_prefixes=False))
+        for _, topic in QUERIES:
+            rag.load_documents_for_topic(topic)
+        rag.warm_up()
+
+        results = {}
+        for difficulty in ["beginner", "intermediate", "advanced"]:
+            results[difficulty] = (run(rag, timer, False, difficulty), run(rag, timer, True, difficulty))
+
+    print("\n" + "=" * 60)
+    print(f"✂️  Context packing: prompt tokens and end-to-end latency ({args.embedder} embedder)")
+    print("=" * 60)
+    for difficulty, (off, on) in results.items():
+        print(f"  {difficulty:<12} tokens {off['tokens']:6.0f} → {on['tokens']:6.0f}   "
+              f"latency {off['latency_s'] * 1000:6.1f}ms → {on['latency_s'] * 1000:6.1f}ms   "
+              f"packing {on['pack_s'] * 1000:5.1f}ms (encoding {on['sentences']:.0f} sentences: "
+              f"{on['encode_s'] * 1000:5.1f}ms)")
@@ -0,0 +1,164 @@
+# scripts/bench_embedding_server.py
+"""Query-encoding throughput: a model per worker vs one shared embedding server.
+
+Each "worker" is a process with several threads encoding distinct one-line
+queries, like gunicorn gthread workers serving /api/chat. In `per-worker`
+mode every process loads its own model; in `shared` mode they all talk to
+one `src.core.embedding_server` process that batches across them.
+
+Offline by default: a randomly initialised transformer with MiniLM-L6's
+shape (6 layers, 384 hidden, 12 heads) stands in for the real model, so
+compute and batching behaviour match without downloading weights. Pass
+--minilm to use the real model.
+
+Usage: python -m scripts.bench_embedding_server [--workers 4] [--threads 8] [--seconds 10] [--minilm]
+"""
+import sys
+sys.path.append('.')
+
+import argparse
+import multiprocessing as mp
+import os
+import subprocess
+import tempfile
+import time
+import zlib
+from pathlib import Path
+
+import numpy as np
+
+
+class MiniLMStandIn:
+    """MiniLM-L6-shaped encoder with random weights and hashed word ids."""
+
+    model_id = "minilm-standin"
+
+    def __init__(self, vocab: int = 30522, dim: int = 384, max_len: int = 32):
+        import torch
+        from torch import nn
+        torch.manual_seed(0)
+        self.torch, self.vocab, self.dim, self.max_len = torch, vocab, dim, max_len
+        self.embed = nn.Embedding(vocab, dim).eval()
+        layer = nn.TransformerEncoderLayer(dim, 12, 1536, batch_first=True)
+        self.encoder = nn.TransformerEncoder(layer, 6, enable_nested_tensor=False).eval()
+
+    def get_sentence_embedding_dimension(self) -> int:
+        return self.dim
+
+    def encode(self, sentences, batch_size: int = 32, convert_to_numpy: bool = True, **kwargs):
+        single = isinstance(sentences, str)
+        texts = [sentences] if single else list(sentences)
+        ids = [[zlib.crc32(w.encode()) % (self.vocab - 1) + 1 for w in t.lower().split()][:self.max_len] or [1]
+               for t in texts]
+        width = max(map(len, ids))
+        tokens = self.torch.tensor([row + [0] * (width - len(row)) for row in ids])
+        mask = tokens == 0
+        with self.torch.inference_mode():
+            hidden = self.encoder(self.embed(tokens), src_key_padding_mask=mask)
+            keep = (~mask).unsqueeze(-1).float()
+            pooled = (hidden * keep).sum(1) / keep.sum(1)
+            pooled = self.torch.nn.functional.normalize(pooled, dim=-1)
+        vectors = pooled.numpy()
+        return vectors[0] if single else vectors
+
+
+def minilm_standin():
+    return MiniLMStandIn()
+
+
+def _load_model(minilm: bool):
+    if minilm:
+        from sentence_transformers import SentenceTransformer
+        return SentenceTransformer("sentence-transformers/all-MiniLM-L6-v2")
+    return MiniLMStandIn()
+
+
+def _worker(worker_id, args, socket_path, start_at, results):
+    import threading
+    import torch
+    torch.set_num_threads(1)  # as gunicorn.conf.py's post_fork does
+    if socket_path:
+        from src.core.embedding_server import EmbeddingClient
+        model = EmbeddingClient(socket_path, pool_size=args.threads)
+    else:
+        model = _load_model(args.minilm)
+    model.encode(["warm up"])
+
+    latencies = []
+    lock = threading.Lock()
+    deadline = start_at + args.seconds
+
+    def client(i):
+        n, own = 0, []
+        while time.time() < deadline:
+            t0 = time.perf_counter()
+            model.encode([f"what does article {worker_id}-{i}-{n} of the convention protect"])
+            own.append(time.perf_counter() - t0)
+            n += 1
+        with lock:
+            latencies.extend(own)
+
+    while time.time() < start_at:
+        time.sleep(0.01)
+    threads = [threading.Thread(target=client, args=(i,)) for i in range(args.threads)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    results.put(latencies)
+
+
+def run(mode: str, args) -> dict:
+    ctx = mp.get_context("spawn")
+    results = ctx.Queue()
+    server, socket_path = None, None
+    tmp = tempfile.TemporaryDirectory(prefix="emb")
+    try:
+        if mode == "shared":
+            socket_path = str(Path(tmp.name) / "embed.sock")
+            cmd = [sys.executable, "-m", "src.core.embedding_server", "--socket", socket_path,
+                   "--max-batch", str(args.max_batch), "--max-wait-ms", str(args.max_wait_ms)]
+            cmd += ["--model", "sentence-transformers/all-MiniLM-L6-v2"] if args.minilm else \
+                ["--factory", "scripts.bench_embedding_server:minilm_standin"]
+            server = subprocess.Popen(cmd, env=dict(os.environ, OMP_NUM_THREADS=str(args.server_threads)),
+                                      stdout=subprocess.DEVNULL)
+            while not os.path.exists(socket_path):
+                if server.poll() is not None:
+                    raise RuntimeError("embedding server exited")
+                time.sleep(0.1)
+
+        start_at = time.time() + args.startup_s
+        procs = [ctx.Process(target=_worker, args=(w, args, socket_path, start_at, results))
+                 for w in range(args.workers)]
+        for p in procs:
+            p.start()
+        latencies = np.array([s for _ in procs for s in results.get()])
+        for p in procs:
+            p.join()
+    finally:
+        if server is not None:
+            server.terminate()
+            server.wait(timeout=30)
+        tmp.cleanup()
+    return {"mode": mode, "qps": len(latencies) / args.seconds,
+            "p50_ms": np.percentile(latencies, 50) * 1000, "p99_ms": np.percentile(latencies, 99) * 1000}
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--threads", type=int, default=8, help="concurrent requests per worker")
+    parser.add_argument("--seconds", type=float, default=10)
+    parser.add_argument("--startup-s", type=float, default=15, help="time allowed for workers to load models")
+    parser.add_argument("--max-batch", type=int, default=64)
+    parser.add_argument("--max-wait-ms", type=float, default=2.0)
+    parser.add_argument("--server-threads", type=int, default=os.cpu_count())
+    parser.add_argument("--minilm", action="store_true")
+    args = parser.parse_args()
+
+    rows = [run(mode, args) for mode in ("per-worker", "shared")]
+    print(f"\n{args.workers} workers x {args.threads} threads, {os.cpu_count()} CPU(s)")
+    print(f"{'mode':>10} {'queries/s':>10} {'p50 ms':>8} {'p99 ms':>8}")
+    for r in rows:
+        print(f"{r['mode']:>10} {r['qps']:>10.1f} {r['p50_ms']:>8.1f} {r['p99_ms']:>8.1f}")
+    print(f"shared / per-worker throughput: {rows[1]['qps'] / rows[0]['qps']:.2f}x")
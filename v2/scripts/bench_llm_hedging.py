@@ -0,0 +1,41 @@
+# scripts/bench_llm_hedging.py
+"""Tail latency of LLM calls with and without hedged requests (offline).
+
+The fake backend answers in ~50ms but 5% of calls stall for an extra second.
+
+Usage: python -m scripts.bench_llm_hedging
+"""
+import sys
+sys.path.append('.')
+
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from src.core.llm_client import FakeLLMBackend, LLMClient
+
+
+def percentile(samples, q):
+    samples = sorted(samples)
+    return samples[min(len(samples) - 1, int(q * len(samples)))]
+
+
+def run(hedge: bool, calls: int = 400, concurrency: int = 8):
+    backend = FakeLLMBackend(base_latency_s=0.05, tail_latency_s=1.0, tail_rate=0.05, seed=7)
+    client = LLMClient(backend, hedge=hedge, hedge_after_s=0.2, hedge_min_samples=20, timeout_s=5.0)
+
+    def one(_):
+        start = time.perf_counter()
+        client.generate("What are human rights?")
+        return time.perf_counter() - start
+
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        latencies = list(pool.map(one, range(calls)))
+    return latencies, backend.calls
+
+
+if __name__ == '__main__':
+    print("⏱️  LLM call latency, 5% of calls stalling for 1s")
+    for hedge in (False, True):
+        latencies, backend_calls = run(hedge)
+        print(f"  hedge={str(hedge):<5}  p50 {percentile(latencies, 0.5) * 1000:6.0f}ms  "
+              f"p99 {percentile(latencies, 0.99) * 1000:6.0f}ms  backend calls {backend_calls}")
@@ -0,0 +1,34 @@
+# scripts/bench_mmr.py
+"""Microbenchmark for MMR context selection.
+
+Usage: python -m scripts.bench_mmr
+"""
+import sys
+sys.path.append('.')
+
+import time
+
+import numpy as np
+
+from src.core.context import mmr_select
+
+DIM = 384  # all-MiniLM-L6-v2
+
+
+def bench(pool: int, k: int, repeats: int = 2000) -> float:
+    rng = np.random.default_rng(0)
+    query = rng.standard_normal(DIM).astype(np.float32)
+    cands = rng.standard_normal((pool, DIM)).astype(np.float32)
+    mmr_select(query, cands, k)  # warm-up
+    start = time.perf_counter()
+    for _ in range(repeats):
+        mmr_select(query, cands, k)
+    return (time.perf_counter() - start) / repeats * 1e6
+
+
+if __name__ == '__main__':
+    print("⏱️  MMR selection overhead (384-dim)")
+    for pool, k in [(12, 3), (24, 4), (50, 5), (100, 8)]:
+        us = bench(pool, k)
+        status = "✅" if us < 1000 else "⚠️ "
+        print(f"  {status} pool={pool:>3} k={k}: {us:7.1f} µs/query")
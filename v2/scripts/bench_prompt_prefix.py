@@ -0,0 +1,62 @@
+# scripts/bench_prompt_prefix.py
+"""Per-request prompt size with and without a cached static prefix.
+
+The fake backend enforces the provider's minimum cacheable size (1024 tokens
+for gemini-2.5-flash), so a prefix below it is billed in full, as it is by
+Gemini. The shipped prefix holds every level's instructions and examples
+(about 1370 tokens) so that it clears the minimum. The price: a request that
+misses the cache sends the whole shared prefix, more than one level's
+instructions and examples alone would have been.
+
+Usage: python -m scripts.bench_prompt_prefix [--min-cache-tokens 1024]
+"""
+import sys
+sys.path.append('.')
+
+import argparse
+import tempfile
+
+from src.core.embeddings import HashingEmbedder
+from src.core.llm_client import CACHE_MIN_TOKENS, FakeLLMBackend, LLMClient
+from src.core.rag_system import SimpleRAG
+
+QUERIES = [
+    ("What are human rights?", "foundational_rights"),
+    ("What is the CRC?", "childrens_rights"),
+    ("What is CEDAW?", "womens_rights"),
+]
+
+
+def billed_tokens(rag: SimpleRAG, difficulty: str):
+    """Mean prompt tokens billed per request, and the prefix size"""
+    for query, topic in QUERIES:
+        answer = rag.generate_answer(query, topic, difficulty)
+    return rag.llm.backend.billed_prompt_tokens / len(QUERIES), answer.prompt_stats["prefix_tokens"]
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--min-cache-tokens", type=int, default=CACHE_MIN_TOKENS["gemini-2.5-flash"],
+                        help="smallest prefix the provider caches (gemini-2.5-flash: 1024)")
+    args = parser.parse_args()
+
+    rows = []
+    with tempfile.TemporaryDirectory() as tmp:
+        rag = SimpleRAG(persist_directory=tmp, preload_topics=False, embedding_model=HashingEmbedder(),
+                        llm=FakeLLMBackend(cache_prefixes=False))
+        for _, topic in QUERIES:
+            rag.load_documents_for_topic(topic)
+        for difficulty in ["beginner", "intermediate", "advanced"]:
+            rag.llm = LLMClient(FakeLLMBackend(cache_prefixes=False))
+            full, prefix = billed_tokens(rag, difficulty)
+            rag.llm = LLMClient(FakeLLMBackend(cache_prefixes=True, min_cache_tokens=args.min_cache_tokens))
+            cached, _ = billed_tokens(rag, difficulty)
+            rows.append((difficulty, prefix, full, cached))
+
+    print("\n" + "=" * 60)
+    print(f"📦 Per-request prompt tokens sent (cached prefix vs full prompt, cache minimum {args.min_cache_tokens})")
+    print("=" * 60)
+    for difficulty, prefix, full, cached in rows:
+        note = "  below the cache minimum: sent in full" if prefix < args.min_cache_tokens else ""
+        print(f"  {difficulty:<12} prefix {prefix:4d}  full {full:6.0f} → sent {cached:6.0f}  "
+              f"(-{(1 - cached / full) * 100:.0f}%){note}")
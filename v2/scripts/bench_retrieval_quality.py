@@ -0,0 +1,245 @@
+# scripts/bench_retrieval_quality.py
+"""Retrieval quality vs. latency and memory, per retrieval configuration.
+
+Scores every combination of chunker and backend on the labeled query set in
+data/eval/retrieval_queries.jsonl (see src/core/retrieval_eval.py), over the
+shipped corpus. The query set has 30 queries, at least three per topic.
+Metrics:
+  recall@k, nDCG@k  for each --k, where k plays the role of n_results
+                    (chunks handed to the prompt)
+  MRR               over the deepest k
+  search p50/p95    ms per query (embedding excluded: same for every config)
+  words/chunk       mean chunk length
+  context_words@k   words handed to the prompt by the top k chunks (mean per
+                    query): a config that retrieves a few huge chunks scores
+                    well on recall but fills the prompt
+  index_mb          vectors + graph held in memory. Exact: the matrix.
+                    HNSW: hnswlib's level-0 layout,
+                    n * (4*dim + 8*M + 12) bytes
+  disk_mb           persisted index directory (Chroma only)
+
+Chunkers:  paragraph[:min_len]      what ingestion stores today (blank-line paragraphs)
+           words:<size>:<overlap>   fixed word windows
+Backends:  exact                    brute-force cosine (numpy), the quality ceiling
+           chroma:M=16,ef=64[,construction_ef=100]   Chroma HNSW
+
+The Pareto table marks (★) the configurations that no other configuration
+beats on all of nDCG@--pareto-k, recall@--pareto-k, context words@--pareto-k,
+p95 latency and memory.
+
+Offline by default (hashing embedder); --minilm for the real model.
+
+Usage: python -m scripts.bench_retrieval_quality [--chunkers paragraph words:200:40 words:100:20]
+           [--backends exact chroma:M=16,ef=10 chroma:M=16,ef=100] [--k 1 3 5 10] [--out logs/retrieval_quality.json]
+"""
+import sys
+sys.path.append('.')
+
+import argparse
+import json
+import os
+import shutil
+import tempfile
+import time
+from pathlib import Path
+
+import numpy as np
+
+from src.core.retrieval_eval import (chunk_paragraphs, chunk_words, load_labels, mean, pareto_front,
+                                     score_query)
+
+DEFAULT_LABELS = "data/eval/retrieval_queries.jsonl"
+
+
+def parse_chunker(spec):
+    name, *args = spec.split(":")
+    if name == "paragraph":
+        min_len = int(args[0]) if args else 50
+        return lambda text: chunk_paragraphs(text, min_len)
+    if name == "words":
+        size, overlap = (int(a) for a in (args + ["200", "40"][len(args):])[:2])
+        return lambda text: chunk_words(text, size, overlap)
+    raise ValueError(f"unknown chunker: {spec}")
+
+
+def parse_backend(spec):
+    name, _, params = spec.partition(":")
+    if name not in ("exact", "chroma"):
+        raise ValueError(f"unknown backend: {spec}")
+    opts = dict(p.split("=") for p in params.split(",") if p)
+    return name, {k: int(v) for k, v in opts.items()}
+
+
+def build_corpus(topics_dir, topics, chunker):
+    """{topic: (texts, sources)} with every file of the topic chunked"""
+    corpus = {}
+    for topic in topics:
+        texts, sources = [], []
+        for path in sorted(Path(topics_dir, topic).glob("*.txt")):
+            for chunk in chunker(path.read_text(encoding="utf-8", errors="ignore")):
+                texts.append(chunk)
+                sources.append(path.name)
+        corpus[topic] = (texts, sources)
+    return corpus
+
+
+class ExactIndex:
+    def __init__(self, vectors_by_topic):
+        self.vectors = {t: np.asarray(v, dtype=np.float32) for t, v in vectors_by_topic.items()}
+
+    def search(self, topic, query_vec, k):
+        scores = self.vectors[topic] @ query_vec
+        k = min(k, len(scores))
+        top = np.argpartition(-scores, k - 1)[:k]
+        return top[np.argsort(-scores[top])].tolist()
+
+    def memory_bytes(self):
+        return sum(v.nbytes for v in self.vectors.values())
+
+    def close(self):
+        pass
+
+
+class ChromaIndex:
+    def __init__(self, vectors_by_topic, M=16, ef=10, construction_ef=100):
+        from chromadb import PersistentClient
+        from chromadb.config import Settings
+
+        self.path = tempfile.mkdtemp(prefix="retrieval-bench-")
+        self.client = PersistentClient(path=self.path, settings=Settings(anonymized_telemetry=False))
+        self.M, self.collections, self.n, self.dim = M, {}, 0, 0
+        batch = self.client.get_max_batch_size()
+        for topic, vectors in vectors_by_topic.items():
+            col = self.client.create_collection(topic, metadata={
+                "hnsw:space": "cosine", "hnsw:M": M, "hnsw:search_ef": ef, "hnsw:construction_ef": construction_ef})
+            ids = [str(i) for i in range(len(vectors))]
+            for start in range(0, len(ids), batch):
+                col.add(ids=ids[start:start + batch], embeddings=vectors[start:start + batch].tolist())
+            self.collections[topic] = col
+            self.n += len(vectors)
+            self.dim = vectors.shape[1]
+
+    def search(self, topic, query_vec, k):
+        col = self.collections[topic]
+        res = col.query(query_embeddings=[query_vec.tolist()], n_results=min(k, col.count()), include=[])
+        return [int(i) for i in res["ids"][0]]
+
+    def memory_bytes(self):
+        return self.n * (4 * self.dim + 8 * self.M + 12)
+
+    def disk_bytes(self):
+        return sum(f.stat().st_size for f in Path(self.path).rglob("*") if f.is_file())
+
+    def close(self):
+        shutil.rmtree(self.path, ignore_errors=True)
+
+
+def evaluate(index, corpus, labels, query_vecs, ks, repeats):
+    """Mean metrics over the query set, plus search latency percentiles"""
+    depth = max(ks)
+    per_query, latencies = [], []
+    for q, qv in zip(labels, query_vecs):
+        texts, sources = corpus[q.topic]
+        n_relevant = sum(1 for t, s in zip(texts, sources) if q.hits(t, s))
+        for _ in range(repeats):
+            t0 = time.perf_counter()
+            ranked = index.search(q.topic, qv, depth)
+            latencies.append((time.perf_counter() - t0) * 1000)
+        scores = score_query(q, [texts[i] for i in ranked], [sources[i] for i in ranked], n_relevant, ks)
+        # what the prompt pays for that recall
+        for k in ks:
+            scores[f"context_words@{k}"] = sum(len(texts[i].split()) for i in ranked[:k])
+        per_query.append(scores)
+    row = {m: round(mean(s[m] for s in per_query), 4) for m in per_query[0]}
+    p50, p95 = np.percentile(latencies, [50, 95])
+    row.update(search_p50_ms=round(float(p50), 3), search_p95_ms=round(float(p95), 3))
+    return row
+
+
+def run(labels_path, topics_dir, chunkers, backends, ks, repeats=3, model=None):
+    from src.core.embeddings import HashingEmbedder
+
+    model = model or HashingEmbedder()
+    labels = load_labels(labels_path)
+    topics = sorted({q.topic for q in labels})
+    t0 = time.perf_counter()
+    query_vecs = np.asarray(model.encode([q.query for q in labels], convert_to_numpy=True), dtype=np.float32)
+    embed_ms = (time.perf_counter() - t0) * 1000 / len(labels)
+
+    rows = []
+    for chunker_spec in chunkers:
+        corpus = build_corpus(topics_dir, topics, parse_chunker(chunker_spec))
+        vectors = {t: np.asarray(model.encode(texts, batch_size=32, convert_to_numpy=True), dtype=np.float32)
+                   for t, (texts, _) in corpus.items()}
+        n_chunks = sum(len(texts) for texts, _ in corpus.values())
+        avg_words = sum(len(t.split()) for texts, _ in corpus.values() for t in texts) / max(1, n_chunks)
+        for backend_spec in backends:
+            name, opts = parse_backend(backend_spec)
+            index = ExactIndex(vectors) if name == "exact" else ChromaIndex(vectors, **opts)
+            try:
+                row = {"chunker": chunker_spec, "backend": backend_spec, "chunks": n_chunks,
+                       "avg_chunk_words": round(avg_words, 1)}
+                row.update(evaluate(index, corpus, labels, query_vecs, ks, repeats))
+                row["index_mb"] = round(index.memory_bytes() / 2**20, 2)
+                if hasattr(index, "disk_bytes"):
+                    row["disk_mb"] = round(index.disk_bytes() / 2**20, 2)
+            finally:
+                index.close()
+            rows.append(row)
+            print(f"📏 {chunker_spec:18s} {backend_spec:28s} nDCG@{max(ks)} {row[f'ndcg@{max(ks)}']:.3f}  "
+                  f"MRR {row['mrr']:.3f}  p95 {row['search_p95_ms']:.2f} ms")
+    return {"labels": labels_path, "queries": len(labels), "embedder": getattr(model, "model_id", type(model).__name__),
+            "query_embed_ms": round(embed_ms, 3), "rows": rows}
+
+
+def pareto_table(report, k):
+    rows = report["rows"]
+    # large chunks make recall@k easy but hand the prompt more text: context size is an axis
+    front = pareto_front(rows, maximize=(f"ndcg@{k}", f"recall@{k}"),
+                         minimize=(f"context_words@{k}", "search_p95_ms", "index_mb"))
+    lines = [f"| | chunker | backend | chunks | words/chunk | context words@{k} | recall@{k} | nDCG@{k} | MRR | "
+             "p50 ms | p95 ms | index MB |",
+             "|---|---|---|---|---|---|---|---|---|---|---|---|"]
+    order = sorted(range(len(rows)), key=lambda i: (-rows[i][f"ndcg@{k}"], rows[i]["search_p95_ms"]))
+    for i in order:
+        r = rows[i]
+        lines.append(f"| {'★' if front[i] else ''} | {r['chunker']} | {r['backend']} | {r['chunks']} | {r['avg_chunk_words']:.0f} | "
+                     f"{r[f'context_words@{k}']:.0f} | {r[f'recall@{k}']:.3f} | {r[f'ndcg@{k}']:.3f} | {r['mrr']:.3f} | "
+                     f"{r['search_p50_ms']:.2f} | {r['search_p95_ms']:.2f} | {r['index_mb']:.2f} |")
+    return "\n".join(lines)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--labels", default=DEFAULT_LABELS)
+    parser.add_argument("--topics-dir", default="data/processed")
+    parser.add_argument("--chunkers", nargs="+", default=["paragraph", "words:200:40", "words:100:20"])
+    parser.add_argument("--backends", nargs="+",
+                        default=["exact", "chroma:M=16,ef=10", "chroma:M=16,ef=100", "chroma:M=32,ef=100"])
+    parser.add_argument("--k", nargs="+", type=int, default=[1, 3, 5, 10], help="cutoffs (n_results)")
+    parser.add_argument("--pareto-k", type=int, default=5)
+    parser.add_argument("--repeats", type=int, default=3, help="timed searches per query")
+    parser.add_argument("--minilm", action="store_true", help="real MiniLM instead of the hashing embedder")
+    parser.add_argument("--out", default="logs/retrieval_quality.json")
+    args = parser.parse_args()
+    if args.pareto_k not in args.k:
+        parser.error("--pareto-k must be one of --k")
+
+    model = None
+    if args.minilm:
+        from sentence_transformers import SentenceTransformer
+        from src.core.rag_system import EMBEDDING_MODEL_ID
+        model = SentenceTransformer(EMBEDDING_MODEL_ID)
+    report = run(args.labels, args.topics_dir, args.chunkers, args.backends, sorted(args.k), args.repeats, model)
+    report["pareto_table"] = pareto_table(report, args.pareto_k)
+
+    os.makedirs(os.path.dirname(args.out) or ".", exist_ok=True)
+    with open(args.out, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2)
+    print(f"\n{report['pareto_table']}\n\n★ Pareto-optimal (nDCG@{args.pareto_k}, recall@{args.pareto_k}, "
+          f"context words@{args.pareto_k}, p95 latency, memory)\n💾 Report written to {args.out}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
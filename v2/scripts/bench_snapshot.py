@@ -0,0 +1,61 @@
+# scripts/bench_snapshot.py
+"""Node bring-up time: restoring a snapshot vs re-ingesting from text.
+
+Builds the index once (the re-ingest path every new node used to take),
+exports it, then restores the snapshot into a fresh root and checks that
+retrieval from the restored copy matches the original.
+
+Usage: python -m scripts.bench_snapshot [--minilm]
+"""
+import sys
+sys.path.append('.')
+
+import argparse
+import tempfile
+import time
+from pathlib import Path
+
+from scripts.build_index import build_index
+from src.core.snapshot import current_link, export_snapshot, import_snapshot
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--minilm", action="store_true", help="embed with MiniLM (needs the model download)")
+    args = parser.parse_args()
+
+    embedder = None
+    if not args.minilm:
+        from src.core.embeddings import HashingEmbedder
+        embedder = HashingEmbedder()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        tmp = Path(tmp)
+        start = time.perf_counter()
+        build_index(tmp / "built", embedding_model=embedder)
+        ingest_s = time.perf_counter() - start
+
+        start = time.perf_counter()
+        export_snapshot(tmp / "built", tmp / "index.ragsnap")
+        export_s = time.perf_counter() - start
+
+        start = time.perf_counter()
+        import_snapshot(tmp / "index.ragsnap", tmp / "node")
+        restore_s = time.perf_counter() - start
+
+        from src.core.rag_system import SimpleRAG
+        from src.core.llm_client import FakeLLMBackend
+        original = SimpleRAG(persist_directory=str(tmp / "built"), read_only=True,
+                             embedding_model=embedder, llm=FakeLLMBackend())
+        restored = SimpleRAG(persist_directory=str(current_link(tmp / "node")), read_only=True,
+                             embedding_model=embedder, llm=FakeLLMBackend())
+        query, topic = "What is the CRC?", "childrens_rights"
+        same = original.retrieve(query, topic)["ids"] == restored.retrieve(query, topic)["ids"]
+
+        size_kb = (tmp / "index.ragsnap").stat().st_size / 1024
+        print(f"\nSnapshot size: {size_kb:.0f} KiB, retrieval identical after restore: {same}")
+        print(f"{'path':<22}{'seconds':>10}")
+        print(f"{'re-ingest from text':<22}{ingest_s:>10.2f}")
+        print(f"{'export snapshot':<22}{export_s:>10.2f}")
+        print(f"{'restore snapshot':<22}{restore_s:>10.2f}")
+        print(f"Restore speedup over re-ingest: {ingest_s / restore_s:.1f}x")
@@ -0,0 +1,142 @@
+# scripts/bench_workers.py
+"""Memory and throughput of the gunicorn deployment at 1, 4 and 8 workers.
+
+Runs `gunicorn -c gunicorn.conf.py` against a prebuilt read-only index, with
+and without RAG_PRELOAD, and reports the summed PSS of master + workers
+(proportional set size: shared copy-on-write pages are split between the
+processes sharing them) and requests/s under concurrent distinct questions.
+
+Offline by default: the hashing embedder plus a --model-mb block of weights
+standing in for MiniLM (~90 MB of float32), and a fake LLM with fixed
+latency. Pass --minilm to load the real model instead.
+
+Usage: python -m scripts.bench_workers [--workers 1 4 8] [--seconds 10] [--minilm]
+"""
+import sys
+sys.path.append('.')
+
+import argparse
+import functools
+import os
+import socket
+import subprocess
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+import requests
+
+
+def offline_app():
+    """Gunicorn app factory for the benchmark: wsgi app with offline model and LLM."""
+    import numpy as np
+    from src.api.routes import chat
+    from src.core.embeddings import HashingEmbedder
+    from src.core.llm_client import FakeLLMBackend
+    from src.core.rag_system import SimpleRAG
+
+    embedder = HashingEmbedder(model_id=os.environ["BENCH_MODEL_ID"])
+    # resident, read-only "weights" like a loaded model's
+    embedder.weights = np.random.default_rng(0).random(int(os.environ["BENCH_MODEL_MB"]) * 2**20 // 8)
+    if os.environ.get("BENCH_MINILM") == "True":
+        embedder = None
+    chat.SimpleRAG = functools.partial(SimpleRAG, embedding_model=embedder,
+                                       llm=FakeLLMBackend(base_latency_s=0.05, latency_per_1k_tokens_s=0.0))
+    from src.api.wsgi import app
+    return app
+
+
+def _free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def _pss_kb(pid: int) -> int:
+    for line in Path(f"/proc/{pid}/smaps_rollup").read_text().splitlines():
+        if line.startswith("Pss:"):
+            return int(line.split()[1])
+    return 0
+
+
+def _tree_pss_mb(master: int) -> float:
+    children = Path(f"/proc/{master}/task/{master}/children").read_text().split()
+    return sum(_pss_kb(pid) for pid in [master, *map(int, children)]) / 1024
+
+
+def _load(url: str, seconds: float, clients: int) -> float:
+    session_pool = [requests.Session() for _ in range(clients)]
+    deadline = time.monotonic() + seconds
+
+    def client(i):
+        n = 0
+        while time.monotonic() < deadline:
+            # distinct questions: measure the workers, not request coalescing
+            resp = session_pool[i].post(url, json={"query": f"What is the CRC? ({i}-{n})",
+                                                   "topic": "childrens_rights", "difficulty": "beginner"})
+            resp.raise_for_status()
+            n += 1
+        return n
+
+    with ThreadPoolExecutor(max_workers=clients) as pool:
+        total = sum(pool.map(client, range(clients)))
+    return total / seconds
+
+
+def run(index_dir: Path, workers: int, preload: bool, args) -> dict:
+    port = _free_port()
+    env = dict(os.environ, WEB_CONCURRENCY=str(workers), GUNICORN_THREADS=str(args.threads),
+               GUNICORN_BIND=f"127.0.0.1:{port}", GUNICORN_GRACEFUL_TIMEOUT="2",
+               RAG_PRELOAD=str(preload), RAG_READ_ONLY="True", CHROMA_PERSIST_DIR=str(index_dir), FLASK_DEBUG="False",
+               BENCH_MODEL_MB=str(args.model_mb), BENCH_MODEL_ID=args.model_id, BENCH_MINILM=str(args.minilm))
+    start = time.perf_counter()
+    proc = subprocess.Popen(["gunicorn", "-c", "gunicorn.conf.py", "scripts.bench_workers:offline_app()"],
+                            env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    base = f"http://127.0.0.1:{port}"
+    try:
+        # every worker must be warm: hit readiness until all report ready
+        while True:
+            try:
+                if requests.get(base + "/api/health/ready", timeout=1).status_code == 200:
+                    break
+            except requests.RequestException:
+                pass
+            if time.perf_counter() - start > 300:
+                raise RuntimeError("gunicorn did not become ready")
+            time.sleep(0.1)
+        _load(base + "/api/chat", 2.0, workers * 2)  # let lazily-started workers warm up
+        ready_s = time.perf_counter() - start
+        rps = _load(base + "/api/chat", args.seconds, args.clients)
+        return {"workers": workers, "preload": preload, "ready_s": ready_s,
+                "pss_mb": _tree_pss_mb(proc.pid), "rps": rps}
+    finally:
+        proc.terminate()
+        proc.wait(timeout=30)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 4, 8])
+    parser.add_argument("--threads", type=int, default=8)
+    parser.add_argument("--clients", type=int, default=32)
+    parser.add_argument("--seconds", type=float, default=10)
+    parser.add_argument("--model-mb", type=int, default=90, help="stand-in model weights (offline mode)")
+    parser.add_argument("--minilm", action="store_true")
+    args = parser.parse_args()
+    from src.core.rag_system import EMBEDDING_MODEL_ID
+    args.model_id = EMBEDDING_MODEL_ID if args.minilm else "hashing-embedder-v1"
+
+    from scripts.build_index import build_index
+    with tempfile.TemporaryDirectory() as tmp:
+        embedder = None
+        if not args.minilm:
+            from src.core.embeddings import HashingEmbedder
+            embedder = HashingEmbedder()
+        build_index(Path(tmp) / "index", embedding_model=embedder)
+
+        rows = [run(Path(tmp) / "index", w, preload, args) for w in args.workers for preload in (False, True)]
+
+    print(f"\n{'workers':>7} {'preload':>8} {'ready s':>8} {'PSS MB':>8} {'req/s':>8}")
+    for r in rows:
+        print(f"{r['workers']:>7} {str(r['preload']):>8} {r['ready_s']:>8.1f} {r['pss_mb']:>8.0f} {r['rps']:>8.1f}")
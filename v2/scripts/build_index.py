@@ -0,0 +1,83 @@
+# scripts/build_index.py
+"""Build the Chroma index offline, ahead of deployment.
+
+Ingests data/processed/<topic>/*.txt into --persist-dir and writes
+index_manifest.json (embedding model, dim, chunker settings, per-topic counts).
+Serving processes started with RAG_READ_ONLY=True open this directory without
+ingesting anything and refuse it if their embedding model differs.
+
+Usage: python -m scripts.build_index --persist-dir ./chromadb [--topics a b] [--rebuild]
+"""
+import sys
+sys.path.append('.')
+
+import argparse
+import shutil
+import time
+from pathlib import Path
+
+from src.core.index_manifest import (INDEX_FORMAT_VERSION, IndexMismatchError, check_compatible,
+                                     load_manifest, new_manifest, write_manifest)
+from src.core.rag_system import SimpleRAG
+
+
+def build_index(persist_dir, topics_dir="data/processed", topics=None, rebuild=False, dedup=True,
+                min_chunk_len=50, embedding_model=None) -> dict:
+    """Ingest ``topics`` (default: all discovered) and write the manifest; returns it."""
+    persist_path = Path(persist_dir)
+    existing = load_manifest(persist_path)
+    if existing is not None and rebuild:
+        print(f"🧹 Removing existing index at {persist_path}")
+        shutil.rmtree(persist_path)
+        existing = None
+
+    rag = SimpleRAG(persist_directory=str(persist_path), topics_dir=topics_dir, preload_topics=False,
+                    dedup_chunks=dedup, embedding_model=embedding_model, load_llm=False)
+    if existing is not None:
+        # appending to an index embedded by another model would mix vector spaces
+        try:
+            check_compatible(existing, rag.embedding_model_id,
+                             rag.embedding_model.get_sentence_embedding_dimension())
+        except IndexMismatchError as e:
+            raise SystemExit(f"❌ {e}. Re-run with --rebuild.")
+
+    topic_stats = dict(existing["topics"]) if existing else {}
+    for topic in topics or rag.topics:
+        start = time.perf_counter()
+        stats = rag.load_documents_for_topic(topic, min_chunk_len=min_chunk_len)
+        elapsed = time.perf_counter() - start
+        rate = stats["chunks"] / elapsed if elapsed > 0 else 0.0
+        print(f"⏱️  {topic}: {stats['chunks']} chunks in {elapsed:.2f}s ({rate:.1f} chunks/s)")
+        topic_stats[topic] = stats
+
+    manifest = new_manifest(
+        model_id=rag.embedding_model_id,
+        embedding_dim=rag.embedding_model.get_sentence_embedding_dimension(),
+        chunker={"min_chunk_len": min_chunk_len, "dedup": dedup, "dedup_threshold": rag.dedup_threshold},
+        topics=topic_stats,
+    )
+    write_manifest(persist_path, manifest)
+    print(f"✅ Wrote index manifest v{INDEX_FORMAT_VERSION} for {len(topic_stats)} topics -> {persist_path}")
+    return manifest
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--persist-dir", default="./chromadb")
+    parser.add_argument("--topics-dir", default="data/processed")
+    parser.add_argument("--topics", nargs="*", help="topics to (re)ingest; default: all")
+    parser.add_argument("--rebuild", action="store_true", help="delete the existing index first")
+    parser.add_argument("--no-dedup", action="store_true", help="keep near-duplicate chunks")
+    parser.add_argument("--min-chunk-len", type=int, default=50)
+    parser.add_argument("--hashing-embedder", action="store_true",
+                        help="offline hashing embedder instead of MiniLM (tests/benchmarks only)")
+    args = parser.parse_args()
+
+    embedder = None
+    if args.hashing_embedder:
+        from src.core.embeddings import HashingEmbedder
+        embedder = HashingEmbedder()
+    start = time.perf_counter()
+    build_index(args.persist_dir, args.topics_dir, args.topics, rebuild=args.rebuild,
+                dedup=not args.no_dedup, min_chunk_len=args.min_chunk_len, embedding_model=embedder)
+    print(f"🏁 Index built in {time.perf_counter() - start:.1f}s")
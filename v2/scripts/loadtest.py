@@ -0,0 +1,322 @@
+# scripts/loadtest.py
+"""Offline load test: throughput and p50/p95/p99 per endpoint and per stage.
+
+Serves the real Flask app over HTTP from this process (threaded werkzeug
+server). It is backed by the fixture corpus in tests/fixtures/corpus, the
+hashing embedder and a seeded FakeLLMBackend, whose latency distribution is
+set with --llm-*. At each --concurrency level, N client threads send
+--requests requests in total:
+
+  chat      POST /api/chat with distinct questions (nothing is coalesced)
+  retrieve  POST /api/retrieve (the retrieval-only "search" endpoint)
+  ingest    load_documents_for_topic on N copies of the corpus at once
+
+Stage percentiles come from each response's Server-Timing header.
+Rejections (429/503) are counted per status code. The per-client rate
+limiter is switched off, since all requests come from one address. The
+bulkheads keep their configured sizes.
+
+The report is JSON (--out). With --compare, a stored baseline is checked
+scenario by scenario. The exit status is 1 if throughput dropped, or
+p95/p99 rose, by more than --tolerance (and by at least --min-delta-ms).
+
+Usage: python -m scripts.loadtest [--concurrency 1 4 16] [--requests 200] [--scenarios chat retrieve ingest]
+                                  [--out logs/loadtest.json] [--compare baseline.json] [--minilm]
+"""
+import sys
+sys.path.append('.')
+
+import argparse
+import json
+import os
+import platform
+import shutil
+import tempfile
+import threading
+import time
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+import numpy as np
+import requests
+
+CORPUS = Path(__file__).resolve().parent.parent / "tests" / "fixtures" / "corpus"
+
+QUESTIONS = [
+    ("What does the CRC say about the best interests of the child?", "childrens_rights"),
+    ("At what age can children take part in hostilities?", "childrens_rights"),
+    ("Is primary education free and compulsory?", "childrens_rights"),
+    ("What protects children from economic exploitation?", "childrens_rights"),
+    ("What does Article 1 of the UDHR say?", "foundational_rights"),
+    ("Which rights are in the ICESCR?", "foundational_rights"),
+    ("Who monitors the ICCPR?", "foundational_rights"),
+    ("What is freedom of expression?", "foundational_rights"),
+    ("How does CEDAW define discrimination against women?", "womens_rights"),
+    ("What does CEDAW say about maternity leave?", "womens_rights"),
+    ("Do women have the right to vote under CEDAW?", "womens_rights"),
+    ("What does CEDAW require for marriage and family?", "womens_rights"),
+]
+
+
+def percentiles(samples_ms):
+    if not samples_ms:
+        return {"p50": None, "p95": None, "p99": None}
+    p50, p95, p99 = np.percentile(samples_ms, [50, 95, 99])
+    return {"p50": round(float(p50), 2), "p95": round(float(p95), 2), "p99": round(float(p99), 2)}
+
+
+def parse_server_timing(header):
+    """'embed_query;dur=4.1, llm;dur=812.0' -> {'embed_query': 4.1, 'llm': 812.0}"""
+    out = {}
+    for part in (header or "").split(","):
+        name, _, params = part.strip().partition(";")
+        if params.startswith("dur="):
+            try:
+                out[name] = float(params[4:])
+            except ValueError:
+                pass
+    return out
+
+
+def build_app(persist_dir, llm, minilm=False):
+    """Flask app over the fixture corpus, with the bench's LLM and embedder."""
+    from src.api.app import create_app
+    from src.api.routes import chat
+    from src.core.embeddings import HashingEmbedder
+    from src.core.rag_system import SimpleRAG
+
+    chat.rag_system = SimpleRAG(persist_directory=persist_dir, topics_dir=str(CORPUS),
+                                embedding_model=None if minilm else HashingEmbedder(), llm=llm)
+    chat.rate_limiter = None
+    return create_app(warmup=False), chat.rag_system
+
+
+class Server:
+    """The app on a free localhost port, served by werkzeug's threaded server"""
+
+    def __init__(self, app):
+        from werkzeug.serving import make_server
+        self._server = make_server("127.0.0.1", 0, app, threaded=True)
+        self.url = f"http://127.0.0.1:{self._server.server_port}"
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._server.shutdown()
+
+
+def _drive(send, concurrency, n_requests):
+    """Run ``send(i)`` n_requests times over `concurrency` threads; returns per-call samples and wall time"""
+    samples = [None] * n_requests
+    counter = iter(range(n_requests))
+    lock = threading.Lock()
+
+    def client():
+        while True:
+            with lock:
+                i = next(counter, None)
+            if i is None:
+                return
+            t0 = time.perf_counter()
+            status, stages = send(i)
+            samples[i] = ((time.perf_counter() - t0) * 1000, status, stages)
+
+    start = time.perf_counter()
+    threads = [threading.Thread(target=client) for _ in range(concurrency)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    return samples, time.perf_counter() - start
+
+
+def _summarise(samples, wall_s, concurrency):
+    ok = [s for s in samples if s[1] == 200]
+    stages = {}
+    for _, _, timing in ok:
+        for name, ms in timing.items():
+            stages.setdefault(name, []).append(ms)
+    return {
+        "concurrency": concurrency,
+        "requests": len(samples),
+        "ok": len(ok),
+        "status": dict(sorted(Counter(str(s[1]) for s in samples).items())),
+        "throughput_rps": round(len(ok) / wall_s, 2) if wall_s else None,
+        "latency_ms": percentiles([s[0] for s in ok]),
+        "stages_ms": {name: percentiles(ms) for name, ms in sorted(stages.items())},
+    }
+
+
+def http_scenario(base_url, path, payload_for, concurrency, n_requests):
+    sessions = threading.local()
+
+    def send(i):
+        session = getattr(sessions, "s", None) or requests.Session()
+        sessions.s = session
+        resp = session.post(base_url + path, json=payload_for(i), timeout=60)
+        return resp.status_code, parse_server_timing(resp.headers.get("Server-Timing"))
+
+    return _summarise(*_drive(send, concurrency, n_requests), concurrency)
+
+
+def chat_payload(i):
+    query, topic = QUESTIONS[i % len(QUESTIONS)]
+    # a distinct question per request, so single-flight never merges two
+    return {"query": f"{query} (#{i})", "topic": topic}
+
+
+def retrieve_payload(i):
+    query, topic = QUESTIONS[i % len(QUESTIONS)]
+    return {"query": f"{query} (#{i})", "topic": topic, "n_results": 6}
+
+
+def ingest_scenario(rag_factory, concurrency, rounds):
+    """`concurrency` copies of the corpus ingested at once, `rounds` times; latency is per topic"""
+    samples, wall = [], 0.0
+    chunks = 0
+    for r in range(rounds):
+        topics_dir = Path(tempfile.mkdtemp(prefix="loadtest-topics-"))
+        persist = tempfile.mkdtemp(prefix="loadtest-ingest-")
+        try:
+            names = []
+            for c in range(concurrency):
+                for topic in sorted(p.name for p in CORPUS.iterdir() if p.is_dir()):
+                    name = f"{topic}_{c}"
+                    shutil.copytree(CORPUS / topic, topics_dir / name)
+                    names.append(name)
+            rag = rag_factory(persist, str(topics_dir))
+            lock = threading.Lock()
+
+            def load(name):
+                t0 = time.perf_counter()
+                counts = rag.load_documents_for_topic(name)
+                with lock:
+                    samples.append(((time.perf_counter() - t0) * 1000, 200, {}))
+                return counts["chunks"]
+
+            start = time.perf_counter()
+            with ThreadPoolExecutor(concurrency) as pool:
+                chunks += sum(pool.map(load, names))
+            wall += time.perf_counter() - start
+        finally:
+            shutil.rmtree(topics_dir, ignore_errors=True)
+            shutil.rmtree(persist, ignore_errors=True)
+    summary = _summarise(samples, wall, concurrency)
+    summary["chunks_per_s"] = round(chunks / wall, 1) if wall else None
+    return summary
+
+
+def run(scenarios, levels, n_requests, llm_kwargs, minilm=False, ingest_rounds=2):
+    from src.core.embeddings import HashingEmbedder
+    from src.core.llm_client import FakeLLMBackend
+    from src.core.rag_system import SimpleRAG
+
+    report = {
+        "config": {"scenarios": scenarios, "concurrency": levels, "requests": n_requests, "llm": llm_kwargs,
+                   "embedder": "minilm" if minilm else "hashing", "corpus": str(CORPUS.name),
+                   "python": platform.python_version(), "cpus": os.cpu_count()},
+        "results": {},
+    }
+    persist = tempfile.mkdtemp(prefix="loadtest-")
+    try:
+        if "chat" in scenarios or "retrieve" in scenarios:
+            app, _ = build_app(persist, FakeLLMBackend(**llm_kwargs), minilm)
+            with Server(app) as server:
+                for scenario, path, payload in (("chat", "/api/chat", chat_payload),
+                                                ("retrieve", "/api/retrieve", retrieve_payload)):
+                    if scenario not in scenarios:
+                        continue
+                    http_scenario(server.url, path, payload, 1, min(4, n_requests))  # warm connections/caches
+                    for c in levels:
+                        result = http_scenario(server.url, path, payload, c, n_requests)
+                        report["results"][f"{scenario}@{c}"] = result
+                        _print(f"{scenario}@{c}", result)
+        if "ingest" in scenarios:
+            def rag_factory(persist_dir, topics_dir):
+                return SimpleRAG(persist_directory=persist_dir, topics_dir=topics_dir, preload_topics=False,
+                                 embedding_model=None if minilm else HashingEmbedder(), llm=FakeLLMBackend())
+            for c in levels:
+                result = ingest_scenario(rag_factory, c, ingest_rounds)
+                report["results"][f"ingest@{c}"] = result
+                _print(f"ingest@{c}", result)
+    finally:
+        shutil.rmtree(persist, ignore_errors=True)
+    return report
+
+
+def _print(name, result):
+    lat = result["latency_ms"]
+    p = lambda v: "-" if v is None else f"{v:.1f}"  # noqa: E731
+    print(f"📈 {name:14s} {result['throughput_rps']!s:>8} req/s   p50 {p(lat['p50']):>8} ms   "
+          f"p95 {p(lat['p95']):>8} ms   p99 {p(lat['p99']):>8} ms   status {result['status']}")
+
+
+def compare(report, baseline, tolerance=0.2, min_delta_ms=5.0):
+    """Regressions of `report` against `baseline`: a list of human-readable findings"""
+    problems = []
+    for name, base in baseline.get("results", {}).items():
+        now = report.get("results", {}).get(name)
+        if now is None:
+            continue
+        if base.get("throughput_rps") and now.get("throughput_rps") is not None:
+            if now["throughput_rps"] < base["throughput_rps"] * (1 - tolerance):
+                problems.append(f"{name}: throughput {base['throughput_rps']} -> {now['throughput_rps']} req/s")
+        for q in ("p95", "p99"):
+            before, after = base["latency_ms"].get(q), now["latency_ms"].get(q)
+            if before is None or after is None:
+                continue
+            if after - before >= min_delta_ms and after > before * (1 + tolerance):
+                problems.append(f"{name}: {q} {before} -> {after} ms")
+        if now["ok"] < now["requests"] and base["ok"] == base["requests"]:
+            problems.append(f"{name}: {now['requests'] - now['ok']} requests failed ({now['status']})")
+    return problems
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--scenarios", nargs="+", default=["chat", "retrieve", "ingest"],
+                        choices=["chat", "retrieve", "ingest"])
+    parser.add_argument("--concurrency", nargs="+", type=int, default=[1, 4, 16])
+    parser.add_argument("--requests", type=int, default=200, help="requests per scenario and level")
+    parser.add_argument("--ingest-rounds", type=int, default=2)
+    parser.add_argument("--llm-latency-ms", type=float, default=200, help="fake LLM base latency")
+    parser.add_argument("--llm-ms-per-1k-tokens", type=float, default=50)
+    parser.add_argument("--llm-tail-ms", type=float, default=1500, help="extra latency of a slow call")
+    parser.add_argument("--llm-tail-rate", type=float, default=0.02)
+    parser.add_argument("--llm-failure-rate", type=float, default=0.0)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--minilm", action="store_true", help="real MiniLM instead of the hashing embedder")
+    parser.add_argument("--out", default="logs/loadtest.json")
+    parser.add_argument("--compare", help="baseline report; exit 1 on regressions")
+    parser.add_argument("--tolerance", type=float, default=0.2)
+    parser.add_argument("--min-delta-ms", type=float, default=5.0)
+    args = parser.parse_args()
+
+    llm_kwargs = {"base_latency_s": args.llm_latency_ms / 1000,
+                  "latency_per_1k_tokens_s": args.llm_ms_per_1k_tokens / 1000,
+                  "tail_latency_s": args.llm_tail_ms / 1000, "tail_rate": args.llm_tail_rate,
+                  "failure_rate": args.llm_failure_rate, "seed": args.seed}
+    report = run(args.scenarios, args.concurrency, args.requests, llm_kwargs, args.minilm, args.ingest_rounds)
+
+    os.makedirs(os.path.dirname(args.out) or ".", exist_ok=True)
+    with open(args.out, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2)
+    print(f"💾 Report written to {args.out}")
+
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as f:
+            problems = compare(report, json.load(f), args.tolerance, args.min_delta_ms)
+        for problem in problems:
+            print(f"❌ {problem}")
+        if problems:
+            return 1
+        print("✅ No regressions against the baseline")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
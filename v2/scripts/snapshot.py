@@ -0,0 +1,51 @@
+# scripts/snapshot.py
+"""Export, import and switch portable index snapshots.
+
+    python -m scripts.snapshot export --persist-dir ./chromadb --out snapshots/index.ragsnap
+    python -m scripts.snapshot import snapshots/index.ragsnap --root ./index
+    python -m scripts.snapshot list --root ./index
+    python -m scripts.snapshot activate <snapshot_id> --root ./index   # rollback
+
+Serve the active version with CHROMA_PERSIST_DIR=./index/current RAG_READ_ONLY=True.
+"""
+import sys
+sys.path.append('.')
+
+import argparse
+import time
+
+from src.core.snapshot import activate, current_version, export_snapshot, import_snapshot, list_versions
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    sub = parser.add_subparsers(dest="command", required=True)
+    p_export = sub.add_parser("export")
+    p_export.add_argument("--persist-dir", default="./chromadb")
+    p_export.add_argument("--out", required=True)
+    p_import = sub.add_parser("import")
+    p_import.add_argument("snapshot")
+    p_import.add_argument("--root", default="./index")
+    p_import.add_argument("--model-id", help="refuse snapshots embedded by another model")
+    p_import.add_argument("--no-activate", action="store_true", help="restore without switching to it")
+    p_list = sub.add_parser("list")
+    p_list.add_argument("--root", default="./index")
+    p_activate = sub.add_parser("activate")
+    p_activate.add_argument("snapshot_id")
+    p_activate.add_argument("--root", default="./index")
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    if args.command == "export":
+        export_snapshot(args.persist_dir, args.out)
+    elif args.command == "import":
+        import_snapshot(args.snapshot, args.root, expected_model_id=args.model_id,
+                        activate_version=not args.no_activate)
+    elif args.command == "activate":
+        activate(args.root, args.snapshot_id)
+    else:
+        active = current_version(args.root)
+        for version in list_versions(args.root):
+            print(("* " if version == active else "  ") + version)
+    if args.command in ("export", "import"):
+        print(f"⏱️  {args.command} took {time.perf_counter() - start:.2f}s")
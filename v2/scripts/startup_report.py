@@ -0,0 +1,95 @@
+# scripts/startup_report.py
+"""Cold-start breakdown: heavy imports, SimpleRAG.__init__ phases, warm-up.
+
+Runs the API's own warm-up (chat.warm_up) once in this fresh interpreter.
+By default it runs against an empty index, so the topics are re-ingested as
+on a first boot. It writes the same report /api/health/startup serves.
+With --compare, a previous report (e.g. the last release's) is diffed phase
+by phase. The exit status is 1 if any phase got slower by more than
+--tolerance and by at least --min-delta-s.
+
+Usage: python -m scripts.startup_report [--out logs/startup.json] [--compare baseline.json]
+                                        [--persist ./chromadb] [--hashing] [--fake-llm]
+"""
+import sys
+sys.path.append('.')
+
+import argparse
+import functools
+import json
+import os
+import tempfile
+
+
+def _rows(report):
+    for section in ("imports_s", "init_phases_s", "warmup_phases_s"):
+        for name, s in report.get(section, {}).items():
+            yield f"{section[:-2]}.{name}", s
+
+
+def compare(report, baseline, tolerance, min_delta_s):
+    """Print a phase table against `baseline`; returns the regressed phases"""
+    base = dict(_rows(baseline))
+    regressed = []
+    print(f"{'phase':40s} {'baseline':>9s} {'now':>9s} {'delta':>9s}")
+    for name, now in _rows(report):
+        before = base.get(name)
+        if before is None:
+            print(f"{name:40s} {'-':>9s} {now:9.3f} {'new':>9s}")
+            continue
+        delta = now - before
+        flag = ""
+        if delta >= min_delta_s and delta > before * tolerance:
+            regressed.append(name)
+            flag = "  ⚠️ slower"
+        print(f"{name:40s} {before:9.3f} {now:9.3f} {delta:+9.3f}{flag}")
+    return regressed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--out", default=os.getenv("STARTUP_REPORT", "logs/startup.json"))
+    parser.add_argument("--compare", help="earlier report to diff against")
+    parser.add_argument("--tolerance", type=float, default=0.25, help="relative slowdown that counts (0.25 = 25%%)")
+    parser.add_argument("--min-delta-s", type=float, default=0.2, help="ignore slowdowns smaller than this")
+    parser.add_argument("--persist", help="index directory (default: a fresh one, so topics are ingested)")
+    parser.add_argument("--hashing", action="store_true", help="offline hashing embedder instead of MiniLM")
+    parser.add_argument("--fake-llm", action="store_true", help="fake LLM (no GOOGLE_API_KEY needed)")
+    args = parser.parse_args()
+
+    os.environ["CHROMA_PERSIST_DIR"] = args.persist or tempfile.mkdtemp(prefix="startup-")
+    from src.api.routes import chat
+    from src.core.startup import RAG_IMPORTS, STARTUP
+
+    # the import phase is timed here, so the overrides below can be applied
+    with chat.warmup.phase("import"):
+        STARTUP.import_modules(RAG_IMPORTS)
+    from src.core.rag_system import SimpleRAG
+    overrides = {}
+    if args.hashing:
+        from src.core.embeddings import HashingEmbedder
+        overrides["embedding_model"] = HashingEmbedder()
+    if args.fake_llm:
+        from src.core.llm_client import FakeLLMBackend
+        overrides["llm"] = FakeLLMBackend()
+    chat.SimpleRAG = functools.partial(SimpleRAG, **overrides)
+
+    if not chat.warmup.run(chat.warm_up):
+        print(f"❌ Warm-up failed: {chat.warmup.error}")
+        return 2
+    report = STARTUP.write(args.out, chat.warmup.status()["phases_s"])
+
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as f:
+            regressed = compare(report, json.load(f), args.tolerance, args.min_delta_s)
+        if regressed:
+            print(f"❌ Startup regressed: {', '.join(regressed)}")
+            return 1
+    else:
+        for name, s in _rows(report):
+            print(f"{name:40s} {s:9.3f}s")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,38 @@
+# scripts/sync_index.py
+"""Pull index changes from a peer node (Merkle-tree delta sync).
+
+Compares this node's per-topic Merkle trees with the peer's
+/api/replication endpoints and transfers only missing chunks (with their
+embeddings); chunks the peer no longer has are removed locally.
+
+Usage: python -m scripts.sync_index --peer http://10.0.0.5:5050 [--persist-dir ./chromadb] [--topics a b]
+"""
+import sys
+sys.path.append('.')
+
+import argparse
+import os
+import time
+
+from chromadb import PersistentClient
+from chromadb.config import Settings
+
+from src.core.replication import IndexReplica, PeerClient, sync_from_peer
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--peer", required=True, help="base URL of the node to pull from")
+    parser.add_argument("--persist-dir", default=os.getenv("CHROMA_PERSIST_DIR", "./chromadb"))
+    parser.add_argument("--topics", nargs="*", help="topics to sync; default: all the peer has")
+    parser.add_argument("--token", default=os.getenv("REPLICATION_TOKEN"))
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    client = PersistentClient(path=args.persist_dir, settings=Settings(anonymized_telemetry=False))
+    results = sync_from_peer(IndexReplica(client), PeerClient(args.peer, token=args.token),
+                             topics=args.topics, persist_directory=args.persist_dir)
+    added = sum(r["added"] for r in results.values())
+    removed = sum(r["removed"] for r in results.values())
+    print(f"✅ Synced {len(results)} topics from {args.peer}: +{added} / -{removed} chunks "
+          f"in {time.perf_counter() - start:.2f}s")
@@ -5,8 +5,11 @@ from dotenv import load_dotenv
 
 load_dotenv()
 
-def create_app():
-    """Create and configure Flask app"""
+def create_app(warmup=None):
+    """Create and configure Flask app
+
+    warmup: build the RAG system on a background thread (default: RAG_WARMUP, True)
+    """
     # Set template and static folders
     template_dir = os.path.join(os.path.dirname(__file__), '../frontend/templates')
     static_dir = os.path.join(os.path.dirname(__file__), '../frontend/static')
@@ -23,12 +26,21 @@ def create_app():
     CORS(app)
     
     # Register blueprints
-    from src.api.routes import chat, health
+    from src.api.routes import admin, chat, health, metrics, replication
     print(f"Health blueprint: {health.bp.name}")
     print(f"Chat blueprint: {chat.bp.name}")
     
     app.register_blueprint(health.bp)
     app.register_blueprint(chat.bp)
+    app.register_blueprint(replication.bp)
+    app.register_blueprint(metrics.bp)
+    app.register_blueprint(admin.bp)
+
+    # Bind the port now; model, index and first query warm up in the background
+    if warmup is None:
+        warmup = os.getenv('RAG_WARMUP', 'True') == 'True'
+    if warmup:
+        chat.warmup.start(chat.warm_up)
     # Frontend route
     @app.route('/')
     def index():
@@ -41,5 +53,6 @@ def create_app():
     return app
 
 if __name__ == '__main__':
-    app = create_app()
+    # with the reloader, only the child process (WERKZEUG_RUN_MAIN) serves requests
+    app = create_app(warmup=os.environ.get('WERKZEUG_RUN_MAIN') == 'true')
     app.run(host='0.0.0.0', port=5050, debug=True)
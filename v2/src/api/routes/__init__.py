@@ -1,6 +1,6 @@
 """
 API routes package
 """
-from . import chat, health
+from . import admin, chat, health, metrics, replication
 
-__all__ = ["chat", "health"]
+__all__ = ["admin", "chat", "health", "metrics", "replication"]
@@ -0,0 +1,76 @@
+
+from flask import Blueprint, Response, g, jsonify, request, send_from_directory
+from src.core import profiling
+import hmac
+import os
+
+bp = Blueprint('admin', __name__)
+
+
+def _authorized():
+    """Check X-Admin-Token against ADMIN_TOKEN (admin features are off without one)"""
+    token = os.getenv("ADMIN_TOKEN")
+    sent = request.headers.get("X-Admin-Token")
+    return bool(token) and sent is not None and hmac.compare_digest(sent, token)
+
+
+@bp.before_app_request
+def _start_profile():
+    """`X-Profile: 1` from an admin profiles this request's answer/ingestion calls"""
+    if request.headers.get('X-Profile') == '1' and _authorized():
+        g.profile_names, g.profile_token = profiling.request_profile()
+
+
+@bp.after_app_request
+def _report_profile(response):
+    names = g.get('profile_names')
+    if names:
+        response.headers['X-Profile-Id'] = ', '.join(names)
+    return response
+
+
+@bp.teardown_app_request
+def _end_profile(exc):
+    token = g.pop('profile_token', None)
+    if token is not None:
+        profiling.end_request_profile(token)
+
+
+@bp.route('/api/admin/profiles', methods=['GET'])
+def list_profiles():
+    """
+    Recent profiles of this node, newest first (requires ADMIN_TOKEN)
+
+    Response JSON:
+    {
+        "profiles": [{"name": "20251107T101500-generate_answer-4242-3-845ms.prof",
+                      "kind": "generate_answer", "pid": 4242, "duration_ms": 845,
+                      "bytes": 48211, "created": 1762510500.2}, ...],
+        "stats": {"captured": 3, "skipped": 0, "sample_rate": 0.0}
+    }
+    """
+    if not _authorized():
+        return jsonify({'error': 'Invalid admin token'}), 403
+    limit = request.args.get('limit', 50, type=int)
+    return jsonify({'profiles': profiling.PROFILER.list()[:max(limit, 0)],
+                    'stats': profiling.PROFILER.stats()}), 200
+
+
+@bp.route('/api/admin/profiles/<name>', methods=['GET'])
+def download_profile(name):
+    """
+    One profile: the raw .prof file, or ?format=text for the top functions
+    (?sort=cumulative|tottime|calls, ?limit=40)
+    """
+    if not _authorized():
+        return jsonify({'error': 'Invalid admin token'}), 403
+    if profiling.PROFILER.path(name) is None:
+        return jsonify({'error': f'Unknown profile: {name}'}), 404
+    if request.args.get('format') == 'text':
+        sort = request.args.get('sort', 'cumulative')
+        if sort not in ('cumulative', 'tottime', 'calls'):
+            return jsonify({'error': 'sort must be cumulative, tottime or calls'}), 400
+        text = profiling.PROFILER.summary(name, sort, request.args.get('limit', 40, type=int))
+        return Response(text, mimetype='text/plain; charset=utf-8')
+    return send_from_directory(os.path.abspath(profiling.PROFILER.directory), name,
+                               as_attachment=True, mimetype='application/octet-stream')
@@ -1,22 +1,300 @@
 
-from flask import Blueprint, request, jsonify
-from src.core.rag_system import SimpleRAG
+from flask import Blueprint, Response, copy_current_request_context, make_response, request, jsonify, stream_with_context
+from src.core import tracing
+from src.core.bulkhead import BulkheadFullError, bulkheads_from_env
+from src.core.metrics import REGISTRY, stats_family
+from src.core.prompts import DIFFICULTIES
+from src.core.ratelimit import ClientRateLimiter
+from src.core.singleflight import SingleFlight
+from src.core.startup import RAG_IMPORTS, STARTUP
+from src.core.warmup import Warmup
+import functools
+import hashlib
+import json
 import logging
+import math
+import os
+import threading
+import time
 
 bp = Blueprint('chat', __name__)
 
 # Initialize RAG system (singleton)
+# SimpleRAG is imported on first use: it pulls in torch, sentence-transformers,
+# chromadb and google.generativeai, which would delay binding the port by seconds
+SimpleRAG = None
 rag_system = None
+_rag_lock = threading.Lock()
+warmup = Warmup()
+
+# Identical concurrent questions share one retrieval + generation
+inflight = SingleFlight("chat")
+
+# Separate pools (workers, queue) so slow generation can't starve retrieval or
+# light endpoints; a full pool answers 503. Health checks never queue.
+bulkheads = bulkheads_from_env({
+    "retrieval": (4, 16),
+    "generation": (8, 8),
+    "light": (2, 32),
+})
+
+# Per-client token buckets in front of generation (off unless RATE_LIMIT_PER_MIN is set)
+rate_limiter = ClientRateLimiter.from_env()
+
+# Longest budget a client may ask for with X-Deadline-Ms
+MAX_DEADLINE_S = 120
+
+# Span trees in responses: "opt_in" (X-Debug-Trace: 1), "always" or "off";
+# TRACE_SAMPLE_RATE of the traces are also appended to TRACE_LOG
+TRACE_MODE = os.getenv('RAG_TRACE', 'opt_in')
+trace_log = tracing.TraceLog.from_env()
+
+VALID_TOPICS = [
+    'foundational_rights',
+    'childrens_rights',
+    'womens_rights',
+    'indigenous_rights',
+    'minority_rights',
+    'civil_political_rights',
+    'freedom_expression',
+    'economic_social_cultural',
+    'right_to_education'
+]
 
 def get_rag_system():
     """Get or create RAG system instance"""
-    global rag_system
+    global rag_system, SimpleRAG
     if rag_system is None:
-        rag_system = SimpleRAG(preload_topics=True)
+        # concurrent first requests wait here instead of each building a SimpleRAG
+        with _rag_lock:
+            if rag_system is None:
+                if SimpleRAG is None:
+                    with warmup.phase("import"):
+                        STARTUP.import_modules(RAG_IMPORTS)
+                        from src.core.rag_system import SimpleRAG as rag_class
+                    SimpleRAG = rag_class
+                # RAG_READ_ONLY=True serves a prebuilt index and never ingests
+                read_only = os.getenv("RAG_READ_ONLY", "False") == "True"
+                with warmup.phase("build"):
+                    rag_system = SimpleRAG(persist_directory=os.getenv("CHROMA_PERSIST_DIR", "./chromadb"),
+                                           preload_topics=not read_only, read_only=read_only)
+                # without a warm-up (RAG_WARMUP=False) nothing else would flip readiness
+                warmup.mark_ready()
     return rag_system
 
 
+def warm_up():
+    """Build the RAG system and run a throwaway query (model + HNSW) before traffic"""
+    rag = get_rag_system()
+    with warmup.phase("warm_query"):
+        rag.warm_up()
+    if os.getenv('STARTUP_REPORT'):
+        STARTUP.write(os.getenv('STARTUP_REPORT'), warmup.status()['phases_s'])
+
+
+def _busy(error):
+    """503 for a request rejected by a full bulkhead"""
+    response = jsonify({'error': f'Server busy: {error}', 'pool': error.name})
+    response.headers['Retry-After'] = '1'
+    return response, 503
+
+
+def bulkheaded(pool):
+    """Run the whole view in the named pool (503 when it is full)"""
+    def decorator(view):
+        @functools.wraps(view)
+        def wrapper(*args, **kwargs):
+            try:
+                return bulkheads[pool].run(copy_current_request_context(view), *args, **kwargs)
+            except BulkheadFullError as e:
+                return _busy(e)
+        return wrapper
+    return decorator
+
+
+def _client_id():
+    """Rate-limit identity: a known API key if one is sent, else the client address
+
+    Only keys listed in API_KEYS (comma-separated) count: otherwise a client
+    could dodge its limit by sending a new random key with every request.
+    """
+    api_key = request.headers.get('X-API-Key')
+    if api_key:
+        digest = hashlib.sha256(api_key.encode()).hexdigest()
+        known = {hashlib.sha256(k.strip().encode()).hexdigest()
+                 for k in os.getenv('API_KEYS', '').split(',') if k.strip()}
+        if digest in known:
+            return 'key:' + digest[:16]
+    forwarded = request.headers.get('X-Forwarded-For')
+    if forwarded and os.getenv('TRUST_FORWARDED_FOR', 'False') == 'True':
+        return 'ip:' + forwarded.split(',')[0].strip()
+    return 'ip:' + (request.remote_addr or 'unknown')
+
+
+def rate_limited(view):
+    """429 with Retry-After once the client's token bucket is empty"""
+    @functools.wraps(view)
+    def wrapper(*args, **kwargs):
+        if rate_limiter is not None:
+            allowed, retry_after = rate_limiter.allow(_client_id())
+            if not allowed:
+                response = jsonify({'error': 'Rate limit exceeded, slow down'})
+                response.headers['Retry-After'] = str(max(1, math.ceil(retry_after)))
+                return response, 429
+        return view(*args, **kwargs)
+    return wrapper
+
+
+def _trace_opted_in():
+    return TRACE_MODE == 'always' or (TRACE_MODE == 'opt_in' and request.headers.get('X-Debug-Trace') == '1')
+
+
+def traced(view):
+    """Request ID and Server-Timing stage breakdown on every response
+
+    A detailed trace (opt-in header, RAG_TRACE=always, or sampled) keeps the
+    span attributes for the view's `debug` field and the trace log.
+    """
+    @functools.wraps(view)
+    def wrapper(*args, **kwargs):
+        trace = tracing.Trace(tracing.new_request_id(request.headers.get('X-Request-ID')),
+                              name=request.path, detailed=_trace_opted_in(), sampled=trace_log.sample())
+        tokens = tracing.start_trace(trace)
+        try:
+            response = make_response(view(*args, **kwargs))
+        finally:
+            tracing.end_trace(tokens)
+        response.headers['X-Request-ID'] = trace.request_id
+        response.headers['Server-Timing'] = trace.server_timing()
+        if trace.sampled:
+            try:
+                trace_log.write(trace)
+            except OSError as e:
+                print(f"⚠️  Could not write trace: {e}")
+        return response
+    return wrapper
+
+
+def _debug_field():
+    """`debug` payload when the client opted in, else None (sampled traces only go to the log)"""
+    trace = tracing.current_trace()
+    if trace is None or not _trace_opted_in():
+        return None
+    return {'request_id': trace.request_id, 'trace': trace.to_dict()}
+
+
+def admission_stats():
+    """Generation admission at a glance: what autoscaling should watch"""
+    generation = bulkheads["generation"].stats()
+    limits = rate_limiter.stats() if rate_limiter is not None else {}
+    return {
+        'in_flight': generation['active'],
+        'queued': generation['queued'],
+        'capacity': generation['max_workers'] + generation['max_queue'],
+        'avg_queue_wait_ms': generation['avg_queue_wait_ms'],
+        'max_queue_wait_ms': generation['max_queue_wait_ms'],
+        'shed': generation['rejected'] + generation['shed'],
+        'rate_limited': limits.get('limited', 0),
+    }
+
+
+@REGISTRY.register_collector
+def _collect_metrics():
+    """Export pool, admission, coalescing and LLM counters at scrape time"""
+    yield stats_family("rag_bulkhead", "Bulkhead pool state and counters",
+                       {name: pool.stats() for name, pool in bulkheads.items()}, "pool")
+    yield stats_family("rag_admission", "Generation admission (autoscaling signals)",
+                       {"generation": admission_stats()}, "pool")
+    yield stats_family("rag_coalescing", "Single-flight request coalescing", {"chat": inflight.stats()}, "flight")
+    if rate_limiter is not None:
+        yield stats_family("rag_rate_limit", "Per-client token bucket counters", {"chat": rate_limiter.stats()}, "limiter")
+    rag = rag_system
+    llm = getattr(rag, "llm", None)
+    cascade = getattr(rag, "cascade", None)
+    clients = dict(cascade.clients) if cascade is not None else {}
+    if hasattr(llm, "stats"):
+        clients.setdefault(llm.model_name, llm)
+    if clients:
+        yield stats_family("rag_llm_client", "LLM call policy counters",
+                           {name: client.stats() for name, client in clients.items()}, "model")
+    if cascade is not None:
+        yield stats_family("rag_llm_cascade", "Model cascade usage per model (calls, failovers, latency)",
+                           cascade.stats(), "model")
+    batcher = getattr(getattr(rag, "query_encoder", None), "batcher", None)
+    if batcher is not None:
+        yield stats_family("rag_query_batcher", "Query embedding micro-batching", {"query": batcher.stats()}, "batcher")
+
+
+def _request_budget():
+    """Seconds this request may take, or None for no deadline
+
+    X-Deadline-Ms sets the budget per request; a value of 0 or less means the
+    caller has no time left, so the deadline is already spent (extractive
+    answer, no LLM call). Otherwise REQUEST_DEADLINE_S (default 15, 0 disables).
+    """
+    header = request.headers.get('X-Deadline-Ms')
+    if header:
+        try:
+            return min(max(float(header) / 1000, 0.0), MAX_DEADLINE_S)
+        except ValueError:
+            pass
+    budget_s = float(os.getenv('REQUEST_DEADLINE_S', '15'))
+    return budget_s if budget_s > 0 else None
+
+
+def _request_deadline():
+    """Absolute deadline (time.monotonic()) for this request, counted from arrival"""
+    budget_s = _request_budget()
+    return time.monotonic() + budget_s if budget_s is not None else None
+
+
+def _parse_chat_request(data):
+    """Validate a chat payload; returns (query, topic, difficulty, error_response)"""
+    if not data:
+        return None, None, None, (jsonify({'error': 'No JSON data provided'}), 400)
+    
+    # Validate required fields
+    query = data.get('query')
+    topic = data.get('topic')
+    difficulty = data.get('difficulty', 'intermediate')
+    
+    if not query:
+        return None, None, None, (jsonify({'error': 'Missing required field: query'}), 400)
+    
+    if not topic:
+        return None, None, None, (jsonify({'error': 'Missing required field: topic'}), 400)
+    
+    # Validate topic
+    if topic not in VALID_TOPICS:
+        return None, None, None, (jsonify({'error': f'Invalid topic. Must be one of: {", ".join(VALID_TOPICS)}'}), 400)
+    
+    # Validate difficulty (it becomes a metrics label)
+    if difficulty not in DIFFICULTIES:
+        return None, None, None, (jsonify({'error': f'Invalid difficulty. Must be one of: {", ".join(DIFFICULTIES)}'}), 400)
+    
+    return query, topic, difficulty, None
+
+
+def _coalesce_key(query, topic, difficulty):
+    """Requests that only differ in case/whitespace share one computation
+
+    The deadline budget is part of the key: a follower with 15 s to spare must
+    not be handed the extractive answer of a leader that only had 200 ms.
+    """
+    return (" ".join(query.lower().split()), topic, difficulty, _request_budget())
+
+
+def _split_sources(answer):
+    """Split "📚 Sources: file1.txt, file2.txt" off the generated answer"""
+    if "📚 Sources:" in answer:
+        parts = answer.split("📚 Sources:")
+        return parts[0].strip(), [s.strip() for s in parts[1].strip().split(',')]
+    return answer, []
+
+
 @bp.route('/api/chat', methods=['POST'])
+@traced
+@rate_limited
 def chat():
     """
     Process a chat query
@@ -32,73 +310,186 @@ def chat():
     {
         "answer": "Human rights are...",
         "sources": ["udhr.txt", "bill_of_rights.txt"],
-        "topic": "foundational_rights"
+        "topic": "foundational_rights",
+        "degraded": false,  # true: extractive answer (the LLM missed the deadline) or partial retrieval
+        "partial": false    # true: a shard did not answer, the context may be incomplete
     }
+    
+    Send `X-Debug-Trace: 1` to get the request's span tree under `debug`
+    (retrieval candidates, prompt tokens, model, retries).
     """
     try:
-        # Get request data
-        data = request.get_json()
-        
-        if not data:
-            return jsonify({'error': 'No JSON data provided'}), 400
-        
-        # Validate required fields
-        query = data.get('query')
-        topic = data.get('topic')
-        difficulty = data.get('difficulty', 'intermediate')
-        
-        if not query:
-            return jsonify({'error': 'Missing required field: query'}), 400
+        deadline = _request_deadline()
         
-        if not topic:
-            return jsonify({'error': 'Missing required field: topic'}), 400
-        
-        # Validate topic
-        valid_topics = [
-            'foundational_rights',
-            'childrens_rights',
-            'womens_rights',
-            'indigenous_rights',
-            'minority_rights',
-            'civil_political_rights',
-            'freedom_expression',
-            'economic_social_cultural',
-            'right_to_education'
-        ]
-        
-        if topic not in valid_topics:
-            return jsonify({'error': f'Invalid topic. Must be one of: {", ".join(valid_topics)}'}), 400
+        # Get request data
+        query, topic, difficulty, error = _parse_chat_request(request.get_json())
+        if error:
+            return error
         
         # Get RAG system
         rag = get_rag_system()
         
-        # Generate answer
-        answer = rag.generate_answer(query, topic, difficulty)
+        # Generate answer (joining an identical in-flight request if there is one);
+        # only the leader takes a generation slot
+        answer, coalesced = inflight.do(_coalesce_key(query, topic, difficulty),
+                                        lambda: bulkheads["generation"].run(rag.generate_answer, query, topic,
+                                                                            difficulty, deadline=deadline))
         
         # Extract sources from answer (they're in the format "📚 Sources: file1.txt, file2.txt")
-        sources = []
-        if "📚 Sources:" in answer:
-            parts = answer.split("📚 Sources:")
-            answer_text = parts[0].strip()
-            sources_text = parts[1].strip()
-            sources = [s.strip() for s in sources_text.split(',')]
-        else:
-            answer_text = answer
+        answer_text, sources = _split_sources(answer)
         
         # Return response
-        return jsonify({
+        body = {
             'answer': answer_text,
             'sources': sources,
             'topic': topic,
-            'query': query
-        }), 200
+            'query': query,
+            'degraded': getattr(answer, 'degraded', False),
+            'partial': getattr(answer, 'partial', False)
+        }
+        debug = _debug_field()
+        if debug is not None:
+            # a coalesced follower did no work of its own: its tree is empty
+            body['debug'] = {**debug, 'coalesced': coalesced}
+        return jsonify(body), 200
         
+    except BulkheadFullError as e:
+        return _busy(e)
     except Exception as e:
         logging.error(f"Error in chat endpoint: {e}")
         return jsonify({'error': f'Internal server error: {str(e)}'}), 500
 
 
+@bp.route('/api/chat/stream', methods=['POST'])
+@rate_limited
+def chat_stream():
+    """
+    Process a chat query as Server-Sent Events
+    
+    Same request JSON as /api/chat. Emits `meta`, one `chunk` per answer
+    paragraph, `sources` (with the `degraded` and `partial` flags) and `done` events.
+    Identical concurrent requests subscribe to the same stream. If the generation
+    pool fills up after the stream has started, a `busy` event (like the 503 body,
+    plus `retry_after_s`) ends it instead.
+    """
+    deadline = _request_deadline()
+    query, topic, difficulty, error = _parse_chat_request(request.get_json(silent=True))
+    if error:
+        return error
+    
+    try:
+        rag = get_rag_system()
+    except Exception as e:
+        logging.error(f"Error in chat stream: {e}")
+        return jsonify({'error': f'Internal server error: {str(e)}'}), 500
+    # early 503 while a status code can still be sent; the pool may still fill before produce() runs
+    if bulkheads["generation"].full():
+        return _busy(BulkheadFullError("generation"))
+    
+    def produce():
+        answer = bulkheads["generation"].run(rag.generate_answer, query, topic, difficulty, deadline=deadline)
+        answer_text, sources = _split_sources(answer)
+        for paragraph in answer_text.split("\n\n"):
+            yield 'chunk', {'text': paragraph}
+        yield 'sources', {'sources': sources, 'degraded': getattr(answer, 'degraded', False),
+                          'partial': getattr(answer, 'partial', False)}
+    
+    events, shared = inflight.stream(_coalesce_key(query, topic, difficulty), produce)
+    
+    def sse():
+        yield _sse('meta', {'topic': topic, 'query': query, 'coalesced': shared})
+        try:
+            for event, payload in events:
+                yield _sse(event, payload)
+        except BulkheadFullError as e:
+            yield _sse('busy', {'error': f'Server busy: {e}', 'pool': e.name, 'retry_after_s': 1})
+            return
+        except Exception as e:
+            logging.error(f"Error in chat stream: {e}")
+            yield _sse('error', {'error': f'Internal server error: {str(e)}'})
+            return
+        yield _sse('done', {})
+    
+    # Server-Timing can't follow a body that is still streaming: only the request ID
+    return Response(stream_with_context(sse()), mimetype='text/event-stream',
+                    headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no',
+                             'X-Request-ID': tracing.new_request_id(request.headers.get('X-Request-ID'))})
+
+
+def _sse(event, payload):
+    return f"event: {event}\ndata: {json.dumps(payload)}\n\n"
+
+
+@bp.route('/api/retrieve', methods=['POST'])
+@traced
+@bulkheaded("retrieval")
+def retrieve():
+    """
+    Retrieval only: nearest chunks for a query, without generation
+    
+    Request JSON:
+    {
+        "query": "What is the CRC?",
+        "topic": "childrens_rights",
+        "n_results": 6  # optional, 1-20
+    }
+    
+    Response JSON:
+    {
+        "results": [{"text": "...", "source": "crc.txt", "distance": 0.41}, ...],
+        "topic": "childrens_rights",
+        "partial": false,  # true: these shards did not answer in time
+        "missing_shards": []
+    }
+    """
+    data = request.get_json(silent=True)
+    query, topic, _, error = _parse_chat_request(data)
+    if error:
+        return error
+    n_results = data.get('n_results', 6)
+    if not isinstance(n_results, int) or not 1 <= n_results <= 20:
+        return jsonify({'error': 'n_results must be an integer between 1 and 20'}), 400
+    
+    result = get_rag_system().retrieve(query, topic, n_results=n_results, deadline=_request_deadline())
+    if not result:
+        return jsonify({'error': f'Retrieval failed for topic: {topic}'}), 503
+    results = [
+        {'text': doc, 'source': (meta or {}).get('source'), 'distance': dist}
+        for doc, meta, dist in zip(result['documents'][0], result['metadatas'][0], result['distances'][0])
+    ]
+    return jsonify({'results': results, 'topic': topic, 'query': query,
+                    'partial': bool(result.get('partial')), 'missing_shards': result.get('missing_shards', [])}), 200
+
+
+@bp.route('/api/stats', methods=['GET'])
+@bulkheaded("light")
+def get_stats():
+    """
+    Runtime counters for autoscaling and debugging
+    
+    Response JSON:
+    {
+        "coalescing": {"requests": 30, "executions": 1, "coalesced": 29, "in_flight": 0},
+        "bulkheads": {"generation": {"max_workers": 8, "max_queue": 8, "active": 3, "queued": 0,
+                                     "rejected": 0, "avg_queue_wait_ms": 0.1, ...}, ...},
+        "admission": {"in_flight": 8, "queued": 5, "capacity": 16, "shed": 12, "rate_limited": 3, ...},
+        "rate_limit": {"allowed": 140, "limited": 3, "clients": 57, "rate_per_min": 60, "burst": 20},
+        "cascade": {"gemini-2.5-flash": {"calls": 40, "failovers": 2, "p95_s": 6.1, ...},
+                    "gemini-2.5-flash-lite": {"calls": 25, ...}}  # null without a cascade
+    }
+    """
+    cascade = getattr(rag_system, 'cascade', None)
+    return jsonify({
+        'coalescing': inflight.stats(),
+        'bulkheads': {name: pool.stats() for name, pool in bulkheads.items()},
+        'admission': admission_stats(),
+        'rate_limit': rate_limiter.stats() if rate_limiter is not None else None,
+        'cascade': cascade.stats() if cascade is not None else None,
+    }), 200
+
+
 @bp.route('/api/topics', methods=['GET'])
+@bulkheaded("light")
 def get_topics():
     """
     Get list of available topics
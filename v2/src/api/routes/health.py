@@ -16,4 +16,53 @@ def health_check():
     return jsonify({
         'status': 'healthy',
         'message': 'Human Rights RAG API is running'
-    }), 200
\ No newline at end of file
+    }), 200
+
+@bp.route('/api/health/live', methods=['GET'])
+def liveness():
+    """
+    Liveness: the process is up and serving HTTP (never waits for warm-up)
+    """
+    return jsonify({'status': 'alive'}), 200
+
+
+@bp.route('/api/health/ready', methods=['GET'])
+def readiness():
+    """
+    Readiness: the RAG system is built and warm; 503 until then
+
+    Returns:
+        {
+            "state": "ready",
+            "ready": true,
+            "phases_s": {"import": 5.8, "build": 21.3, "warm_query": 0.4, "total": 27.5},
+            "error": null,
+            "uptime_s": 28.1
+        }
+    """
+    from src.api.routes import chat
+    status = chat.warmup.status()
+    return jsonify(status), 200 if status['ready'] else 503
+
+
+@bp.route('/api/health/startup', methods=['GET'])
+def startup():
+    """
+    Where start-up time went (seconds): heavy imports, SimpleRAG.__init__ phases, warm-up phases
+
+    Returns:
+        {
+            "imports_s": {"numpy": 0.2, "chromadb": 1.9, "google.generativeai": 1.1,
+                          "src.core.rag_system": 0.1, "torch": 3.2, "transformers": 1.4,
+                          "sentence_transformers": 0.6},
+            "init_phases_s": {"llm": 0.01, "embedding_imports": 5.2, "embedding_model": 2.3,
+                              "vector_db": 0.4, "topics": 0.01, "ingest": 9.8},
+            "warmup_phases_s": {"import": 3.3, "build": 17.7, "warm_query": 0.4, "total": 21.4},
+            "state": "ready",
+            ...
+        }
+    """
+    from src.api.routes import chat
+    from src.core.startup import STARTUP
+    status = chat.warmup.status()
+    return jsonify({**STARTUP.report(status['phases_s']), 'state': status['state']}), 200
@@ -0,0 +1,17 @@
+
+from flask import Blueprint, Response
+from src.core.metrics import REGISTRY
+
+bp = Blueprint('metrics', __name__)
+
+
+@bp.route('/api/metrics', methods=['GET'])
+def prometheus_metrics():
+    """
+    Stage latency histograms and counters in Prometheus text format
+
+    Never queued behind a bulkhead, so scrapes keep working under load.
+    Counters and histograms are summed over all gunicorn workers (METRICS_DIR
+    snapshots); live gauges are per worker (label `pid`).
+    """
+    return Response(REGISTRY.render(), mimetype='text/plain; version=0.0.4; charset=utf-8')
@@ -0,0 +1,127 @@
+
+from flask import Blueprint, request, jsonify
+from src.core.index_manifest import IndexMismatchError, load_manifest
+from src.core.replication import IndexReplica, PeerClient, sync_from_peer
+import hmac
+import os
+import threading
+
+bp = Blueprint('replication', __name__)
+
+# Replica over this node's index (same directory SimpleRAG serves from)
+replica = None
+_replica_lock = threading.Lock()
+
+
+def _persist_dir():
+    return os.getenv("CHROMA_PERSIST_DIR", "./chromadb")
+
+
+def get_replica():
+    """Get or create the IndexReplica for this node"""
+    global replica
+    if replica is None:
+        with _replica_lock:
+            if replica is None:
+                from chromadb import PersistentClient  # deferred: heavy import
+                from chromadb.config import Settings
+                client = PersistentClient(path=_persist_dir(), settings=Settings(anonymized_telemetry=False))
+                replica = IndexReplica(client)
+    return replica
+
+
+def _authorized():
+    """Check X-Replication-Token against REPLICATION_TOKEN (replication is off without one)
+
+    Every route needs it: the chunk endpoints hand out the whole corpus with
+    its embeddings.
+    """
+    token = os.getenv("REPLICATION_TOKEN")
+    sent = request.headers.get("X-Replication-Token")
+    return bool(token) and sent is not None and hmac.compare_digest(sent.encode(), token.encode())
+
+
+def _known_topic(topic):
+    return topic in get_replica().topics()
+
+
+@bp.route('/api/replication/topics', methods=['GET'])
+def replication_topics():
+    """
+    Root Merkle hash per topic
+
+    Response JSON:
+    {
+        "embedding_model_id": "sentence-transformers/all-MiniLM-L6-v2",
+        "topics": {"childrens_rights": {"hash": "9f2c...", "chunks": 8,
+                                        "metadata": {"hnsw:space": "cosine", ...}}, ...}
+    }
+    """
+    if not _authorized():
+        return jsonify({'error': 'Invalid replication token'}), 403
+    manifest = load_manifest(_persist_dir()) or {}
+    topics = {}
+    for topic in get_replica().topics():
+        tree = get_replica().tree(topic)
+        topics[topic] = {'hash': tree.root, 'chunks': tree.size, 'metadata': get_replica().metadata(topic)}
+    return jsonify({'embedding_model_id': manifest.get('embedding_model_id'), 'topics': topics}), 200
+
+
+@bp.route('/api/replication/<topic>/tree', methods=['GET'])
+def replication_tree(topic):
+    """One Merkle node: ?prefix=<hex> returns its hash and children (or ids at a leaf)"""
+    if not _authorized():
+        return jsonify({'error': 'Invalid replication token'}), 403
+    if not _known_topic(topic):
+        return jsonify({'error': f'Unknown topic: {topic}'}), 404
+    return jsonify(get_replica().tree(topic).node(request.args.get('prefix', ''))), 200
+
+
+@bp.route('/api/replication/<topic>/ids', methods=['GET'])
+def replication_ids(topic):
+    """All chunk ids under ?prefix=<hex>"""
+    if not _authorized():
+        return jsonify({'error': 'Invalid replication token'}), 403
+    if not _known_topic(topic):
+        return jsonify({'error': f'Unknown topic: {topic}'}), 404
+    return jsonify({'ids': get_replica().tree(topic).ids(request.args.get('prefix', ''))}), 200
+
+
+@bp.route('/api/replication/<topic>/chunks', methods=['POST'])
+def replication_chunks(topic):
+    """
+    Chunks with their stored embeddings
+
+    Request JSON: {"ids": ["crc_c0_ab12...", ...]}
+    """
+    if not _authorized():
+        return jsonify({'error': 'Invalid replication token'}), 403
+    if not _known_topic(topic):
+        return jsonify({'error': f'Unknown topic: {topic}'}), 404
+    ids = (request.get_json(silent=True) or {}).get('ids')
+    if not isinstance(ids, list):
+        return jsonify({'error': 'ids must be a list'}), 400
+    return jsonify(get_replica().chunks(topic, ids)), 200
+
+
+@bp.route('/api/replication/sync', methods=['POST'])
+def replication_sync():
+    """
+    Pull changes from a peer into this node
+
+    Request JSON: {"peer": "http://10.0.0.5:5050", "topics": ["childrens_rights"]}
+    Response JSON: {"topics": {"childrens_rights": {"added": 3, "removed": 1, "requests": 6}}}
+    """
+    if not _authorized():
+        return jsonify({'error': 'Invalid replication token'}), 403
+    data = request.get_json(silent=True) or {}
+    if not data.get('peer'):
+        return jsonify({'error': 'peer is required'}), 400
+    peer = PeerClient(data['peer'], token=os.getenv("REPLICATION_TOKEN"))
+    try:
+        results = sync_from_peer(get_replica(), peer, topics=data.get('topics'), persist_directory=_persist_dir())
+    except IndexMismatchError as e:
+        return jsonify({'error': str(e)}), 409
+    except Exception as e:
+        return jsonify({'error': f'Sync failed: {e}'}), 502
+    return jsonify({'topics': results}), 200
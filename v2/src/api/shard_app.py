@@ -0,0 +1,78 @@
+"""
+Retrieval shard server: hosts a subset of topic collections for a ShardRouter
+
+Usage: python -m src.api.shard_app --persist-dir ./shards/a --port 7001 [--topics childrens_rights womens_rights]
+"""
+# --- put telemetry env flags BEFORE importing chromadb ---
+import os
+os.environ["CHROMADB_ANONYMIZED_TELEMETRY"] = "false"
+
+import argparse
+
+from flask import Flask, request, jsonify
+from chromadb import PersistentClient
+from chromadb.config import Settings
+
+from src.core.index_manifest import load_manifest
+from src.core.sharding import flatten_query_result, merge_results
+
+
+def create_shard_app(persist_directory, topics=None):
+    """Create a Flask app serving vector queries over the hosted topics"""
+    app = Flask(__name__)
+    client = PersistentClient(path=str(persist_directory), settings=Settings(anonymized_telemetry=False))
+    manifest = load_manifest(persist_directory) or {}
+    hosted = list(topics or manifest.get("topics") or [c.name for c in client.list_collections()])
+    collections = {topic: client.get_collection(topic) for topic in hosted}
+    print(f"✅ Shard hosting {sorted(collections)} from {persist_directory}")
+
+    @app.route('/shard/info', methods=['GET'])
+    def info():
+        """Hosted topics and the model that embedded them"""
+        return jsonify({
+            'topics': {t: c.count() for t, c in collections.items()},
+            'embedding_model_id': manifest.get('embedding_model_id'),
+        }), 200
+
+    @app.route('/shard/query', methods=['POST'])
+    def query():
+        """
+        Nearest chunks across the requested topics, merged by distance
+
+        Request JSON:
+        {"topics": ["childrens_rights"], "query_embedding": [...], "n_results": 6, "include_embeddings": false}
+        Response JSON: flat lists {"ids", "documents", "metadatas", "distances"[, "embeddings"]}
+        plus "embedding_model_id", so the router can reject an index built with another model
+        """
+        data = request.get_json(silent=True) or {}
+        topics = data.get('topics') or []
+        embedding = data.get('query_embedding')
+        if not isinstance(embedding, list) or not embedding:
+            return jsonify({'error': 'query_embedding is required'}), 400
+        unknown = [t for t in topics if t not in collections]
+        if unknown:
+            return jsonify({'error': f'Topics not hosted here: {unknown}'}), 404
+        n_results = int(data.get('n_results', 6))
+        include = ["documents", "metadatas", "distances"]
+        if data.get('include_embeddings'):
+            include.append("embeddings")
+        parts = [
+            flatten_query_result(collections[t].query(query_embeddings=[embedding], n_results=n_results, include=include))
+            for t in topics
+        ]
+        merged = merge_results(parts, n_results) if parts else {}
+        body = {k: v[0] for k, v in merged.items()}
+        body['embedding_model_id'] = manifest.get('embedding_model_id')
+        return jsonify(body), 200
+
+    return app
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Retrieval shard server")
+    parser.add_argument("--persist-dir", default=os.getenv("CHROMA_PERSIST_DIR", "./chromadb"))
+    parser.add_argument("--topics", nargs="*")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=7001)
+    args = parser.parse_args()
+    create_shard_app(args.persist_dir, args.topics).run(host=args.host, port=args.port, threaded=True)
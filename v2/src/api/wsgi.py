@@ -0,0 +1,25 @@
+"""
+Production WSGI entry point
+
+    gunicorn -c gunicorn.conf.py src.api.wsgi:app
+
+With RAG_PRELOAD=True (default) the embedding model and index are loaded and
+warmed here, in the gunicorn master, before workers fork: every worker then
+shares those read-only pages copy-on-write instead of loading its own copy.
+"""
+import gc
+import os
+
+from src.api.app import create_app
+from src.api.routes import chat
+
+PRELOAD = os.getenv('RAG_PRELOAD', 'True') == 'True'
+
+# without preloading each worker warms up on its own background thread
+app = create_app(warmup=not PRELOAD)
+
+if PRELOAD:
+    if not chat.warmup.run(chat.warm_up):
+        raise RuntimeError(f"RAG warm-up failed: {chat.warmup.error}")
+    # keep the collector from writing to (and un-sharing) pages of preloaded objects
+    gc.freeze()
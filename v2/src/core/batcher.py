@@ -0,0 +1,157 @@
+# src/core/batcher.py
+"""Dynamic micro-batching for the embedding model.
+
+Concurrent requests each encode a single query; run one by one they contend
+for the same torch thread pool and pay the per-call overhead every time.
+``DynamicBatcher`` queues items from any thread and hands them to one
+batch function together: a batch closes ``max_wait_ms`` after its first item
+arrives or when it reaches ``max_batch`` items, whichever comes first. A
+batch also closes as soon as every caller currently waiting is in it, so a
+lone request doesn't pay the window.
+"""
+import collections
+import os
+import queue
+import threading
+import time
+from typing import Callable, List, Optional, Sequence
+
+import numpy as np
+
+from src.core import profiling
+
+
+class _Request:
+    __slots__ = ("items", "done", "results", "error", "capture")
+
+    def __init__(self, items: Sequence):
+        self.items = items
+        # a profiled request's batch is profiled on the batcher thread too
+        self.capture = profiling.current_capture()
+        self.done = threading.Event()
+        self.results = None
+        self.error: Optional[BaseException] = None
+
+
+class DynamicBatcher:
+    def __init__(self, fn: Callable[[List], Sequence], max_batch: int = 32, max_wait_ms: float = 2.0,
+                 name: str = "batcher"):
+        """`fn` maps a list of items to a same-length sequence of results."""
+        self.fn = fn
+        self.max_batch = max_batch
+        self.max_wait_s = max_wait_ms / 1000.0
+        self.name = name
+        self._lock = threading.Lock()
+        self._pid: Optional[int] = None
+        self._queue: "queue.Queue[Optional[_Request]]" = queue.Queue()
+        self._stats = collections.Counter()
+        self._inflight = 0  # callers blocked in submit_many
+
+    def _ensure_started(self):
+        # lazily, and again in each forked worker (threads don't survive fork)
+        if self._pid == os.getpid():
+            return
+        with self._lock:
+            if self._pid != os.getpid():
+                self._queue = queue.Queue()
+                threading.Thread(target=self._loop, args=(self._queue,), daemon=True, name=self.name).start()
+                self._pid = os.getpid()
+
+    def submit(self, item):
+        """Block until `item` has been processed in some batch; return its result."""
+        return self.submit_many([item])[0]
+
+    def submit_many(self, items: Sequence):
+        """Process several items in the same batch (counted against `max_batch`)."""
+        self._ensure_started()
+        request = _Request(items)
+        with self._lock:
+            self._inflight += 1
+        try:
+            self._queue.put(request)
+            request.done.wait()
+        finally:
+            with self._lock:
+                self._inflight -= 1
+        if request.error is not None:
+            raise request.error
+        return request.results
+
+    def close(self):
+        if self._pid == os.getpid():
+            self._queue.put(None)
+            self._pid = None
+
+    def stats(self):
+        with self._lock:
+            stats = {"requests": 0, "items": 0, "batches": 0, "max_batch_seen": 0, **self._stats}
+        stats["avg_batch_items"] = stats["items"] / stats["batches"] if stats["batches"] else 0.0
+        return stats
+
+    def _loop(self, q: "queue.Queue[Optional[_Request]]"):
+        while True:
+            first = q.get()
+            if first is None:
+                return
+            batch, n_items = [first], len(first.items)
+            deadline = time.monotonic() + self.max_wait_s
+            while n_items < self.max_batch and len(batch) < self._inflight:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    request = q.get(timeout=remaining)
+                except queue.Empty:
+                    break
+                if request is None:
+                    q.put(None)  # stop after this batch
+                    break
+                batch.append(request)
+                n_items += len(request.items)
+            self._run(batch, n_items)
+
+    def _run(self, batch: List[_Request], n_items: int):
+        items = [item for request in batch for item in request.items]
+        try:
+            with profiling.profile_thread(*(request.capture for request in batch)):
+                results = self.fn(items)
+        except Exception as e:
+            for request in batch:
+                request.error = e
+                request.done.set()
+            return
+        with self._lock:
+            self._stats["requests"] += len(batch)
+            self._stats["items"] += n_items
+            self._stats["batches"] += 1
+            self._stats["max_batch_seen"] = max(self._stats["max_batch_seen"], n_items)
+        offset = 0
+        for request in batch:
+            request.results = results[offset:offset + len(request.items)]
+            offset += len(request.items)
+            request.done.set()
+
+
+class BatchingEncoder:
+    """Wraps an encoder so single-query ``encode(str)`` calls share model calls.
+
+    Lists (ingestion, context compression) are already batches and go
+    straight to the model.
+    """
+
+    def __init__(self, model, max_batch: int = 32, max_wait_ms: float = 2.0):
+        self.model = model
+        self.model_id = getattr(model, "model_id", None)
+        self.batcher = DynamicBatcher(self._encode_batch, max_batch=max_batch, max_wait_ms=max_wait_ms,
+                                      name="query-batcher")
+
+    def _encode_batch(self, texts: List[str]) -> np.ndarray:
+        return np.asarray(self.model.encode(texts, batch_size=len(texts), convert_to_numpy=True), dtype=np.float32)
+
+    def get_sentence_embedding_dimension(self) -> int:
+        return self.model.get_sentence_embedding_dimension()
+
+    def encode(self, sentences, batch_size: int = 32, convert_to_numpy: bool = True, **kwargs):
+        if isinstance(sentences, str):
+            return self.batcher.submit(sentences)
+        return self.model.encode(sentences, batch_size=batch_size, convert_to_numpy=convert_to_numpy, **kwargs)
@@ -0,0 +1,140 @@
+# src/core/bulkhead.py
+"""Bulkheads: independently sized execution pools with bounded queues.
+
+Retrieval takes ~10 ms and generation ~5 s. If both run directly on the web
+server's request threads, a burst of chats occupies every thread, and cheap
+requests queue behind them. Each kind of work instead goes to its own pool.
+A pool accepts at most ``max_workers`` running plus ``max_queue`` waiting
+calls and rejects the rest immediately with ``BulkheadFullError`` (the API
+answers 503). Slow generation can therefore hold only a bounded number of
+request threads. With ``max_queue_wait_s``, calls that waited longer than that
+for a worker are shed instead of run: their clients have likely given up.
+"""
+import contextvars
+import os
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Callable, Dict, Optional, Tuple
+
+
+class BulkheadFullError(RuntimeError):
+    """The pool's workers and queue are all taken."""
+
+    def __init__(self, name: str):
+        super().__init__(f"{name} pool is full")
+        self.name = name
+
+
+class BulkheadTimeoutError(BulkheadFullError):
+    """The call waited longer than ``max_queue_wait_s`` for a worker and was shed."""
+
+    def __init__(self, name: str, waited_s: float):
+        RuntimeError.__init__(self, f"{name} queue wait exceeded ({waited_s:.1f}s)")
+        self.name = name
+
+
+class Bulkhead:
+    def __init__(self, name: str, max_workers: int, max_queue: int, max_queue_wait_s: Optional[float] = None):
+        self.name = name
+        self.max_workers = max_workers
+        self.max_queue = max_queue
+        self.max_queue_wait_s = max_queue_wait_s
+        self._lock = threading.Lock()
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._pid: Optional[int] = None
+        self._admitted = 0  # running + queued
+        self._active = 0
+        self._completed = 0
+        self._failed = 0
+        self._rejected = 0
+        self._shed = 0
+        self._wait_s_total = 0.0
+        self._wait_s_max = 0.0
+        self._run_s_total = 0.0
+
+    def _get_executor(self) -> ThreadPoolExecutor:
+        # (re)created per process: pool threads don't survive a pre-fork
+        if self._pid != os.getpid():
+            self._executor = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix=self.name)
+            self._pid = os.getpid()
+            self._admitted = self._active = 0
+        return self._executor
+
+    def full(self) -> bool:
+        with self._lock:
+            return self._admitted >= self.max_workers + self.max_queue
+
+    def submit(self, fn: Callable, *args, **kwargs) -> Future:
+        """Schedule ``fn``; raises BulkheadFullError instead of queueing without bound."""
+        with self._lock:
+            executor = self._get_executor()
+            if self._admitted >= self.max_workers + self.max_queue:
+                self._rejected += 1
+                raise BulkheadFullError(self.name)
+            self._admitted += 1
+        enqueued = time.perf_counter()
+
+        def task():
+            started = time.perf_counter()
+            with self._lock:
+                self._active += 1
+                wait = started - enqueued
+                self._wait_s_total += wait
+                self._wait_s_max = max(self._wait_s_max, wait)
+                if self.max_queue_wait_s is not None and wait > self.max_queue_wait_s:
+                    self._active -= 1
+                    self._admitted -= 1
+                    self._shed += 1
+                    raise BulkheadTimeoutError(self.name, wait)
+            ok = False
+            try:
+                result = fn(*args, **kwargs)
+                ok = True
+                return result
+            finally:
+                with self._lock:
+                    self._active -= 1
+                    self._admitted -= 1
+                    self._run_s_total += time.perf_counter() - started
+                    if ok:
+                        self._completed += 1
+                    else:
+                        self._failed += 1
+
+        # the caller's context (request trace) follows the call into the pool
+        return executor.submit(contextvars.copy_context().run, task)
+
+    def run(self, fn: Callable, *args, **kwargs):
+        """Run ``fn`` in the pool and wait for its result (exceptions re-raised)."""
+        return self.submit(fn, *args, **kwargs).result()
+
+    def stats(self) -> Dict[str, object]:
+        with self._lock:
+            finished = self._completed + self._failed
+            started = finished + self._shed + self._active
+            return {
+                "max_workers": self.max_workers,
+                "max_queue": self.max_queue,
+                "active": self._active,
+                "queued": self._admitted - self._active,
+                "completed": self._completed,
+                "failed": self._failed,
+                "rejected": self._rejected,
+                "shed": self._shed,
+                "avg_queue_wait_ms": round(self._wait_s_total / started * 1000, 2) if started else 0.0,
+                "max_queue_wait_ms": round(self._wait_s_max * 1000, 2),
+                "avg_run_ms": round(self._run_s_total / finished * 1000, 2) if finished else 0.0,
+            }
+
+
+def bulkheads_from_env(defaults: Dict[str, Tuple[int, int]]) -> Dict[str, Bulkhead]:
+    """One Bulkhead per name; BULKHEAD_<NAME>_WORKERS / _QUEUE / _MAX_WAIT_S override the defaults."""
+    pools = {}
+    for name, (workers, queue) in defaults.items():
+        prefix = f"BULKHEAD_{name.upper()}"
+        max_wait = os.getenv(f"{prefix}_MAX_WAIT_S")
+        pools[name] = Bulkhead(name, int(os.getenv(f"{prefix}_WORKERS", workers)),
+                               int(os.getenv(f"{prefix}_QUEUE", queue)),
+                               max_queue_wait_s=float(max_wait) if max_wait else None)
+    return pools
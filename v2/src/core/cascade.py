@@ -0,0 +1,151 @@
+# src/core/cascade.py
+"""Latency-budgeted cascade between a fast and a full LLM.
+
+Rules route a request to a model by difficulty or prompt size (beginner
+answers don't need the bigger model). If the routed model runs over the
+latency budget, the cascade fails over to the fallback model: either after
+the primary gives up (``race=False``) or by racing the fallback against the
+still-running primary once the budget is spent (``race=True``).
+"""
+import collections
+import contextvars
+import os
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Tuple
+
+from src.core.llm_client import LLMClient, LLMError, LLMTimeoutError
+
+
+@dataclass
+class CascadeRule:
+    """Send matching requests to ``model``; empty criteria match everything."""
+    model: str
+    difficulties: Tuple[str, ...] = ()
+    max_prompt_tokens: Optional[int] = None
+
+    def matches(self, difficulty: str, prompt_tokens: int) -> bool:
+        if self.difficulties and difficulty not in self.difficulties:
+            return False
+        if self.max_prompt_tokens is not None and prompt_tokens > self.max_prompt_tokens:
+            return False
+        return True
+
+
+class ModelCascade:
+    """Routes requests between LLM clients and records per-model usage."""
+
+    def __init__(self, clients: Dict[str, LLMClient], default: str, rules: Optional[List[CascadeRule]] = None,
+                 fallback: Optional[str] = None, latency_budget_s: float = 8.0, race: bool = False):
+        self.clients = clients
+        self.default = default
+        self.rules = rules or []
+        self.fallback = fallback
+        self.latency_budget_s = latency_budget_s
+        self.race = race
+        self._executor = ThreadPoolExecutor(max_workers=32, thread_name_prefix="cascade")
+        self._lock = threading.Lock()
+        self._usage = {name: collections.Counter() for name in clients}
+        self._latencies = {name: collections.deque(maxlen=500) for name in clients}
+
+    @classmethod
+    def from_env(cls, backend_factory, primary: LLMClient) -> "ModelCascade":
+        """Cascade configured by LLM_FAST_MODEL, LLM_LATENCY_BUDGET_S and LLM_CASCADE_RACE.
+
+        ``backend_factory(model_name)`` builds the backend for the fast model.
+        Beginner requests go to the fast model; the fast model is also the
+        fallback when the primary runs over budget.
+        """
+        fast_name = os.getenv("LLM_FAST_MODEL", "gemini-2.5-flash-lite")
+        fast = LLMClient.from_env(backend_factory(fast_name))
+        return cls(
+            clients={primary.model_name: primary, fast_name: fast},
+            default=primary.model_name,
+            rules=[CascadeRule(model=fast_name, difficulties=("beginner",))],
+            fallback=fast_name,
+            latency_budget_s=float(os.getenv("LLM_LATENCY_BUDGET_S", "8")),
+            race=os.getenv("LLM_CASCADE_RACE", "False") == "True",
+        )
+
+    def choose(self, difficulty: str, prompt_tokens: int) -> str:
+        for rule in self.rules:
+            if rule.matches(difficulty, prompt_tokens):
+                return rule.model
+        return self.default
+
+    def stats(self) -> Dict[str, Dict[str, object]]:
+        """Per-model usage counters and latency percentiles."""
+        out = {}
+        with self._lock:
+            for name in self.clients:
+                samples = sorted(self._latencies[name])
+                entry = dict(self._usage[name])
+                if samples:
+                    entry["p50_s"] = samples[len(samples) // 2]
+                    entry["p95_s"] = samples[min(len(samples) - 1, int(0.95 * len(samples)))]
+                out[name] = entry
+        return out
+
+    def _call(self, name: str, suffix: str, prefix: str, prefix_key: Optional[str],
+              prompt_tokens: int, deadline: float) -> str:
+        start = time.monotonic()
+        try:
+            text = self.clients[name].generate(suffix, prefix=prefix, prefix_key=prefix_key, deadline=deadline)
+        except LLMError:
+            with self._lock:
+                self._usage[name]["errors"] += 1
+            raise
+        with self._lock:
+            usage = self._usage[name]
+            usage["calls"] += 1
+            usage["prompt_tokens"] += prompt_tokens
+            usage["response_chars"] += len(text)
+            self._latencies[name].append(time.monotonic() - start)
+        return text
+
+    def _count(self, name: str, key: str):
+        with self._lock:
+            self._usage[name][key] += 1
+
+    def generate(self, suffix: str, prefix: str = "", prefix_key: Optional[str] = None,
+                 difficulty: str = "intermediate", prompt_tokens: int = 0,
+                 deadline: Optional[float] = None) -> Tuple[str, str]:
+        """Return ``(answer, model_name)`` for the request."""
+        deadline = deadline or float("inf")
+        primary = self.choose(difficulty, prompt_tokens)
+        fallback = self.fallback if self.fallback not in (None, primary) else None
+        args = (suffix, prefix, prefix_key, prompt_tokens)
+        if fallback is None:
+            return self._call(primary, *args, deadline), primary
+
+        budget_deadline = min(time.monotonic() + self.latency_budget_s, deadline)
+        if not self.race:
+            try:
+                return self._call(primary, *args, budget_deadline), primary
+            except LLMError as e:
+                print(f"⚠️ {primary} failed ({e}); falling back to {fallback}")
+                self._count(primary, "failovers")
+                return self._call(fallback, *args, deadline), fallback
+
+        # race: primary gets the budget alone, then the fallback joins in. Each call runs in a
+        # copy of the request's context so its trace annotations and request id come along
+        futures = {self._executor.submit(contextvars.copy_context().run, self._call, primary, *args, deadline): primary}
+        done, _ = wait(futures, timeout=max(budget_deadline - time.monotonic(), 0))
+        if not done or next(iter(done)).exception() is not None:
+            self._count(primary, "failovers")
+            futures[self._executor.submit(contextvars.copy_context().run, self._call, fallback, *args,
+                                          deadline)] = fallback
+        last_exc: Optional[BaseException] = None
+        pending = set(futures)
+        while pending:
+            timeout = None if deadline == float("inf") else max(deadline - time.monotonic(), 0)
+            done, pending = wait(pending, timeout=timeout, return_when=FIRST_COMPLETED)
+            if not done:
+                raise LLMTimeoutError("no model answered within deadline")
+            for future in done:
+                if future.exception() is None:
+                    return future.result(), futures[future]
+                last_exc = future.exception()
+        raise last_exc
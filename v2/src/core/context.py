@@ -0,0 +1,148 @@
+# src/core/context.py
+"""Context selection helpers: passage diversification and sentence handling."""
+import math
+import re
+from dataclasses import dataclass, field
+from typing import Callable, List, Sequence
+
+import numpy as np
+
+_WORD_RE = re.compile(r"\w+")
+_SENTENCE_RE = re.compile(r"(?<=[.!?])\s+(?=[\"'(\[A-Z0-9])")
+
+
+def split_sentences(text: str) -> List[str]:
+    """Split text into sentences on terminal punctuation followed by a capital/number."""
+    text = " ".join(text.split())
+    return [s for s in _SENTENCE_RE.split(text) if s]
+
+
+def trim_to_sentences(text: str, max_chars: int) -> str:
+    """Return the longest run of leading sentences that fits in ``max_chars``."""
+    if len(text) <= max_chars:
+        return text
+    kept, used = [], 0
+    for sentence in split_sentences(text):
+        extra = len(sentence) + (1 if kept else 0)
+        if used + extra > max_chars:
+            break
+        kept.append(sentence)
+        used += extra
+    if not kept:
+        # a single over-long "sentence" (common in extracted PDFs): cut at a word
+        return text[:max_chars].rsplit(" ", 1)[0]
+    return " ".join(kept)
+
+
+def _normalize(vectors: np.ndarray) -> np.ndarray:
+    norms = np.linalg.norm(vectors, axis=-1, keepdims=True)
+    return vectors / np.maximum(norms, 1e-12)
+
+
+def mmr_select(query_emb: Sequence[float], candidate_embs: Sequence[Sequence[float]], k: int, lambda_mult: float = 0.7) -> List[int]:
+    """Pick ``k`` candidate indices by maximal marginal relevance.
+
+    score(i) = lambda * sim(q, d_i) - (1 - lambda) * max_{j in selected} sim(d_i, d_j)
+
+    Similarities are computed once as matrix products; each greedy step only
+    updates a running max over the newly selected column.
+    """
+    cands = np.asarray(candidate_embs, dtype=np.float32)
+    n = cands.shape[0] if cands.ndim == 2 else 0
+    if n == 0 or k <= 0:
+        return []
+    k = min(k, n)
+
+    cands = _normalize(cands)
+    query = _normalize(np.asarray(query_emb, dtype=np.float32))
+    relevance = cands @ query
+    pairwise = cands @ cands.T
+
+    selected = [int(np.argmax(relevance))]
+    max_sim = pairwise[:, selected[0]].copy()
+    available = np.ones(n, dtype=bool)
+    available[selected[0]] = False
+    for _ in range(k - 1):
+        scores = lambda_mult * relevance - (1.0 - lambda_mult) * max_sim
+        scores[~available] = -np.inf
+        best = int(np.argmax(scores))
+        selected.append(best)
+        available[best] = False
+        np.maximum(max_sim, pairwise[:, best], out=max_sim)
+    return selected
+
+
+# ---------- Token-budgeted packing ----------
+def count_tokens(text: str) -> int:
+    """Approximate token count (~4 characters per token for Gemini/English)."""
+    return math.ceil(len(text) / 4)
+
+
+@dataclass
+class PackedContext:
+    text: str
+    tokens: int
+    sentences: int
+    sources: List[str] = field(default_factory=list)
+
+
+def _lexical_overlap(query_terms: set, sentence: str) -> float:
+    terms = set(_WORD_RE.findall(sentence.lower()))
+    return len(query_terms & terms) / (len(query_terms) or 1)
+
+
+def pack_context(query: str, query_emb: Sequence[float], passages: List[str], passage_embs: Sequence[Sequence[float]],
+                 sources: List[str], encode: Callable[[List[str]], np.ndarray], budget_tokens: int,
+                 passage_weight: float = 0.3, max_candidates: int = 64, min_sentence_chars: int = 30) -> PackedContext:
+    """Keep the highest-value sentences of ``passages`` within ``budget_tokens``.
+
+    Sentences are scored by cosine similarity to the query, blended with the
+    similarity of the passage they come from (reusing the retrieved passage
+    vectors). Whole-document chunks can hold thousands of sentences, so a cheap
+    lexical prefilter limits how many are embedded. Kept sentences stay in
+    document order, grouped under a ``[Source: ...]`` label so answers can cite.
+    Labels and group separators count against ``budget_tokens`` too.
+    """
+    query_terms = set(_WORD_RE.findall(query.lower()))
+    candidates = []  # (passage index, position, sentence)
+    for p, passage in enumerate(passages):
+        for pos, sentence in enumerate(split_sentences(passage)):
+            if len(sentence) >= min_sentence_chars:
+                candidates.append((p, pos, sentence))
+    if not candidates:
+        return PackedContext(text="", tokens=0, sentences=0)
+
+    if len(candidates) > max_candidates:
+        overlap = np.array([_lexical_overlap(query_terms, c[2]) for c in candidates])
+        # stable sort keeps earlier sentences first among equal overlap
+        keep = np.argsort(-overlap, kind="stable")[:max_candidates]
+        candidates = [candidates[i] for i in sorted(keep)]
+
+    query_vec = _normalize(np.asarray(query_emb, dtype=np.float32))
+    sent_vecs = _normalize(np.asarray(encode([c[2] for c in candidates]), dtype=np.float32))
+    passage_sims = _normalize(np.asarray(passage_embs, dtype=np.float32)) @ query_vec
+    scores = (1.0 - passage_weight) * (sent_vecs @ query_vec) \
+        + passage_weight * passage_sims[[c[0] for c in candidates]]
+
+    separator = "\n\n---\n\n"
+    chosen, used, opened = [], 0, set()
+    for i in np.argsort(-scores):
+        p = candidates[i][0]
+        cost = count_tokens(candidates[i][2]) + 1
+        if p not in opened:
+            # the first sentence of a passage brings its label (and a separator after the first group)
+            cost += count_tokens(f"[Source: {sources[p]}]\n") + (count_tokens(separator) if opened else 0)
+        if used + cost > budget_tokens:
+            continue
+        chosen.append(candidates[i])
+        opened.add(p)
+        used += cost
+
+    groups: List[str] = []
+    kept_sources: List[str] = []
+    for p in sorted({c[0] for c in chosen}):
+        sentences = [c[2] for c in sorted(chosen) if c[0] == p]
+        groups.append(f"[Source: {sources[p]}]\n" + " ".join(sentences))
+        kept_sources.append(sources[p])
+    text = separator.join(groups)
+    return PackedContext(text=text, tokens=count_tokens(text), sentences=len(chosen), sources=kept_sources)
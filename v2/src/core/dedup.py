@@ -0,0 +1,122 @@
+# src/core/dedup.py
+"""Near-duplicate chunk detection (MinHash + LSH) used at ingestion time.
+
+The same treaty text is reproduced in several documents (the UDHR inside the
+toolkit, the brief intro and the booklet; CEDAW in three handbooks). Instead of
+embedding and storing every copy, ingestion keeps one canonical chunk and
+records where the other copies came from.
+"""
+import re
+import zlib
+from typing import Dict, Hashable, List, Optional, Tuple
+
+import numpy as np
+
+_MERSENNE_PRIME = np.uint64((1 << 61) - 1)
+_MAX_HASH = np.uint64((1 << 32) - 1)
+_TOKEN_RE = re.compile(r"\w+")
+
+
+def _lsh_params(threshold: float, num_perm: int) -> Tuple[int, int]:
+    """Pick (bands, rows) whose LSH threshold sits just below ``threshold``.
+
+    Candidates are verified against the estimated Jaccard afterwards, so we
+    prefer recall: the banding threshold (1/b)^(1/r) should not exceed it.
+    """
+    best = (num_perm, 1)
+    best_gap = float("inf")
+    for rows in range(1, num_perm + 1):
+        if num_perm % rows:
+            continue
+        bands = num_perm // rows
+        lsh_threshold = (1.0 / bands) ** (1.0 / rows)
+        gap = threshold - lsh_threshold
+        if 0 <= gap < best_gap:
+            best, best_gap = (bands, rows), gap
+    return best
+
+
+class MinHasher:
+    """Computes MinHash signatures over word shingles."""
+
+    def __init__(self, num_perm: int = 128, shingle_size: int = 5, seed: int = 1):
+        self.num_perm = num_perm
+        self.shingle_size = shingle_size
+        rng = np.random.RandomState(seed)
+        self._a = rng.randint(1, np.iinfo(np.int64).max, size=num_perm, dtype=np.int64).astype(np.uint64) % _MERSENNE_PRIME
+        self._b = rng.randint(0, np.iinfo(np.int64).max, size=num_perm, dtype=np.int64).astype(np.uint64) % _MERSENNE_PRIME
+
+    def shingles(self, text: str) -> np.ndarray:
+        """Hash word n-grams of the normalized text to 32-bit integers."""
+        tokens = _TOKEN_RE.findall(text.lower())
+        k = self.shingle_size
+        if len(tokens) <= k:
+            grams = [" ".join(tokens)]
+        else:
+            grams = [" ".join(tokens[i:i + k]) for i in range(len(tokens) - k + 1)]
+        hashed = {zlib.crc32(g.encode("utf-8")) for g in grams}
+        return np.fromiter(hashed, dtype=np.uint64, count=len(hashed))
+
+    def signature(self, text: str, block: int = 8192) -> np.ndarray:
+        """Return the MinHash signature (``num_perm`` uint64 values) of ``text``."""
+        sig = np.full(self.num_perm, _MAX_HASH, dtype=np.uint64)
+        values = self.shingles(text)
+        # process shingles in blocks so whole-document chunks stay cheap in memory
+        for start in range(0, len(values), block):
+            hv = values[start:start + block, None]
+            with np.errstate(over="ignore"):
+                perm = ((hv * self._a + self._b) % _MERSENNE_PRIME) & _MAX_HASH
+            np.minimum(sig, perm.min(axis=0), out=sig)
+        return sig
+
+
+class NearDuplicateIndex:
+    """MinHash-LSH index mapping near-duplicate texts to the first one seen.
+
+    ``add(key, text)`` returns ``None`` when ``text`` is new (it then becomes a
+    canonical entry) or the key of the canonical entry it duplicates.
+    """
+
+    def __init__(self, threshold: float = 0.85, num_perm: int = 128, shingle_size: int = 5, seed: int = 1):
+        self.threshold = threshold
+        self.hasher = MinHasher(num_perm=num_perm, shingle_size=shingle_size, seed=seed)
+        self.bands, self.rows = _lsh_params(threshold, num_perm)
+        self._buckets: List[Dict[bytes, List[Hashable]]] = [{} for _ in range(self.bands)]
+        self._signatures: Dict[Hashable, np.ndarray] = {}
+
+    def __len__(self) -> int:
+        return len(self._signatures)
+
+    def __contains__(self, key: Hashable) -> bool:
+        return key in self._signatures
+
+    def _band_keys(self, sig: np.ndarray) -> List[bytes]:
+        return [sig[i * self.rows:(i + 1) * self.rows].tobytes() for i in range(self.bands)]
+
+    def similarity(self, a: np.ndarray, b: np.ndarray) -> float:
+        """Estimated Jaccard similarity of two signatures."""
+        return float(np.count_nonzero(a == b)) / len(a)
+
+    def find(self, text: str, sig: Optional[np.ndarray] = None) -> Optional[Hashable]:
+        """Return the key of the most similar canonical entry above threshold."""
+        if sig is None:
+            sig = self.hasher.signature(text)
+        candidates = set()
+        for band, key in zip(self._buckets, self._band_keys(sig)):
+            candidates.update(band.get(key, ()))
+        best_key, best_sim = None, self.threshold
+        for cand in candidates:
+            sim = self.similarity(sig, self._signatures[cand])
+            if sim >= best_sim:
+                best_key, best_sim = cand, sim
+        return best_key
+
+    def add(self, key: Hashable, text: str) -> Optional[Hashable]:
+        sig = self.hasher.signature(text)
+        canonical = self.find(text, sig)
+        if canonical is not None:
+            return canonical
+        self._signatures[key] = sig
+        for band, band_key in zip(self._buckets, self._band_keys(sig)):
+            band.setdefault(band_key, []).append(key)
+        return None
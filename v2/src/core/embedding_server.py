@@ -0,0 +1,290 @@
+# src/core/embedding_server.py
+"""Out-of-process embedding service shared by all web workers.
+
+One process owns the embedding model and serves it over a Unix socket, so
+gunicorn workers stop running their own torch inference and competing for
+CPU threads. Requests arriving from any worker within ``max_wait_ms`` (up to
+``max_batch`` texts) are encoded in one batch by a ``DynamicBatcher``.
+
+Wire format (little-endian), request and response frames alike::
+
+    u8 code | u32 payload length | payload
+
+Requests: ``OP_ENCODE`` with ``u32 count`` then ``u32 len + utf-8`` per text,
+or ``OP_INFO`` with an empty payload. Responses: ``STATUS_OK`` with
+``u32 rows | u32 dim | rows*dim float32`` (ENCODE) or a JSON object (INFO);
+``STATUS_ERROR`` with a utf-8 message.
+
+Run it with ``python -m src.core.embedding_server --socket /tmp/rag-embed.sock``
+and set ``EMBEDDING_SOCKET`` for the web app.
+"""
+import argparse
+import importlib
+import json
+import os
+import queue
+import socket
+import struct
+import threading
+from typing import List, Optional, Tuple
+
+import numpy as np
+
+from src.core.batcher import DynamicBatcher
+
+OP_ENCODE, OP_INFO = 1, 2
+STATUS_OK, STATUS_ERROR = 0, 1
+_HEADER = struct.Struct("<BI")
+_U32 = struct.Struct("<I")
+_SHAPE = struct.Struct("<II")
+# texts per request frame; large ingestion batches are split client-side
+MAX_TEXTS_PER_FRAME = 256
+
+
+class EmbeddingServiceError(RuntimeError):
+    """The embedding server reported an error or could not be reached."""
+
+
+# ---------- Framing ----------
+def _recv_exact(sock: socket.socket, n: int) -> bytes:
+    buf = bytearray()
+    while len(buf) < n:
+        chunk = sock.recv(n - len(buf))
+        if not chunk:
+            raise ConnectionError("embedding socket closed")
+        buf += chunk
+    return bytes(buf)
+
+
+def send_frame(sock: socket.socket, code: int, payload: bytes = b""):
+    sock.sendall(_HEADER.pack(code, len(payload)) + payload)
+
+
+def recv_frame(sock: socket.socket) -> Tuple[int, bytes]:
+    code, length = _HEADER.unpack(_recv_exact(sock, _HEADER.size))
+    return code, _recv_exact(sock, length)
+
+
+def pack_texts(texts: List[str]) -> bytes:
+    parts = [_U32.pack(len(texts))]
+    for text in texts:
+        data = text.encode("utf-8")
+        parts += [_U32.pack(len(data)), data]
+    return b"".join(parts)
+
+
+def unpack_texts(payload: bytes) -> List[str]:
+    (count,), offset, texts = _U32.unpack_from(payload), _U32.size, []
+    for _ in range(count):
+        (length,) = _U32.unpack_from(payload, offset)
+        offset += _U32.size
+        texts.append(payload[offset:offset + length].decode("utf-8"))
+        offset += length
+    return texts
+
+
+def pack_vectors(vectors: np.ndarray) -> bytes:
+    vectors = np.ascontiguousarray(vectors, dtype="<f4")
+    return _SHAPE.pack(*vectors.shape) + vectors.tobytes()
+
+
+def unpack_vectors(payload: bytes) -> np.ndarray:
+    rows, dim = _SHAPE.unpack_from(payload)
+    return np.frombuffer(payload, dtype="<f4", count=rows * dim, offset=_SHAPE.size).reshape(rows, dim)
+
+
+# ---------- Server ----------
+class EmbeddingServer:
+    def __init__(self, model, socket_path: str, model_id: Optional[str] = None,
+                 max_batch: int = 64, max_wait_ms: float = 2.0):
+        self.model = model
+        self.socket_path = socket_path
+        self.model_id = model_id or getattr(model, "model_id", None)
+        self.dim = model.get_sentence_embedding_dimension()
+        # every request's texts go into the same batch; a request is never split
+        self.batcher = DynamicBatcher(self._encode_batch, max_batch=max_batch, max_wait_ms=max_wait_ms,
+                                      name="embed-batcher")
+        self._sock: Optional[socket.socket] = None
+        self._closed = threading.Event()
+
+    def stats(self):
+        stats = self.batcher.stats()
+        return {"requests": stats["requests"], "texts": stats["items"], "batches": stats["batches"],
+                "avg_batch_texts": stats["avg_batch_items"]}
+
+    def start(self) -> "EmbeddingServer":
+        if os.path.exists(self.socket_path):
+            os.unlink(self.socket_path)  # stale socket from a previous run
+        self._sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self._sock.bind(self.socket_path)
+        os.chmod(self.socket_path, 0o600)  # same-user workers only
+        self._sock.listen(128)
+        threading.Thread(target=self._accept_loop, daemon=True, name="embed-accept").start()
+        print(f"✅ Embedding server ({self.model_id}, dim={self.dim}) on {self.socket_path}")
+        return self
+
+    def close(self):
+        self._closed.set()
+        self.batcher.close()
+        if self._sock is not None:
+            self._sock.close()
+        if os.path.exists(self.socket_path):
+            os.unlink(self.socket_path)
+
+    def _encode_batch(self, texts: List[str]) -> np.ndarray:
+        return np.asarray(self.model.encode(texts, batch_size=max(len(texts), 1), convert_to_numpy=True),
+                          dtype=np.float32).reshape(len(texts), self.dim)
+
+    def _accept_loop(self):
+        while not self._closed.is_set():
+            try:
+                conn, _ = self._sock.accept()
+            except OSError:
+                return  # closed
+            threading.Thread(target=self._handle, args=(conn,), daemon=True, name="embed-conn").start()
+
+    def _handle(self, conn: socket.socket):
+        # one thread per (long-lived, pooled) client connection
+        with conn:
+            while True:
+                try:
+                    op, payload = recv_frame(conn)
+                except (ConnectionError, OSError):
+                    return
+                if op == OP_INFO:
+                    send_frame(conn, STATUS_OK, json.dumps({"model_id": self.model_id, "dim": self.dim}).encode())
+                    continue
+                if op != OP_ENCODE:
+                    send_frame(conn, STATUS_ERROR, f"unknown op {op}".encode())
+                    continue
+                try:
+                    vectors = self.batcher.submit_many(unpack_texts(payload))
+                except Exception as e:
+                    send_frame(conn, STATUS_ERROR, f"{type(e).__name__}: {e}".encode("utf-8"))
+                    continue
+                send_frame(conn, STATUS_OK, pack_vectors(vectors))
+
+
+# ---------- Client ----------
+class EmbeddingClient:
+    """Stand-in for ``SentenceTransformer.encode`` backed by an EmbeddingServer.
+
+    Connections are kept open and reused (one per concurrent caller, up to
+    ``pool_size`` idle ones). The pool is per process: a client created
+    before a fork (gunicorn preload) drops the inherited connections in the
+    child instead of sharing them with the parent and its siblings.
+    """
+
+    # the server batches across all callers; SimpleRAG adds no batcher of its own
+    batches_queries = True
+
+    def __init__(self, socket_path: str, pool_size: int = 8, timeout_s: float = 30.0):
+        self.socket_path = socket_path
+        self.timeout_s = timeout_s
+        self.pool_size = pool_size
+        self._idle: "queue.LifoQueue[socket.socket]" = queue.LifoQueue(maxsize=pool_size)
+        self._pid = os.getpid()
+        self._pool_lock = threading.Lock()
+        info = json.loads(self._call(OP_INFO, b""))
+        self.model_id = info["model_id"]
+        self.dim = info["dim"]
+
+    def get_sentence_embedding_dimension(self) -> int:
+        return self.dim
+
+    def _connect(self) -> socket.socket:
+        sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        sock.settimeout(self.timeout_s)
+        sock.connect(self.socket_path)
+        return sock
+
+    def _pool(self) -> "queue.LifoQueue[socket.socket]":
+        if self._pid != os.getpid():
+            with self._pool_lock:
+                if self._pid != os.getpid():
+                    # inherited sockets are shared with the parent: abandon them
+                    # unclosed (closing could race the parent's use of them)
+                    self._idle = queue.LifoQueue(maxsize=self.pool_size)
+                    self._pid = os.getpid()
+        return self._idle
+
+    def _call(self, op: int, payload: bytes) -> bytes:
+        pool = self._pool()
+        try:
+            sock, reused = pool.get_nowait(), True
+        except queue.Empty:
+            sock, reused = None, False
+        for attempt in range(2):
+            try:
+                if sock is None:
+                    sock = self._connect()
+                send_frame(sock, op, payload)
+                status, body = recv_frame(sock)
+                break
+            except (OSError, ConnectionError) as e:
+                if sock is not None:
+                    sock.close()
+                sock = None
+                # a pooled connection may have been closed by a server restart
+                if not (reused and attempt == 0):
+                    raise EmbeddingServiceError(f"embedding server unreachable at {self.socket_path}: {e}") from e
+        try:
+            pool.put_nowait(sock)
+        except queue.Full:
+            sock.close()
+        if status != STATUS_OK:
+            raise EmbeddingServiceError(body.decode("utf-8", "replace"))
+        return body
+
+    def encode(self, sentences, batch_size: int = 32, convert_to_numpy: bool = True, **kwargs):
+        single = isinstance(sentences, str)
+        texts = [sentences] if single else list(sentences)
+        if not texts:
+            return np.zeros((0, self.dim), dtype=np.float32)
+        parts = [unpack_vectors(self._call(OP_ENCODE, pack_texts(texts[i:i + MAX_TEXTS_PER_FRAME])))
+                 for i in range(0, len(texts), MAX_TEXTS_PER_FRAME)]
+        vectors = parts[0] if len(parts) == 1 else np.concatenate(parts)
+        return vectors[0] if single else vectors
+
+    def close(self):
+        pool = self._pool()
+        while True:
+            try:
+                pool.get_nowait().close()
+            except queue.Empty:
+                return
+
+
+def _load_model(args):
+    if args.factory:
+        module, _, attr = args.factory.partition(":")
+        return getattr(importlib.import_module(module), attr)()
+    if args.hashing:
+        from src.core.embeddings import HashingEmbedder
+        return HashingEmbedder()
+    from sentence_transformers import SentenceTransformer
+    model = SentenceTransformer(args.model)
+    model.model_id = args.model
+    return model
+
+
+if __name__ == '__main__':
+    import sys
+    sys.path.append('.')
+    parser = argparse.ArgumentParser(description="Shared embedding server over a Unix socket")
+    parser.add_argument("--socket", default=os.getenv("EMBEDDING_SOCKET", "/tmp/rag-embed.sock"))
+    parser.add_argument("--model", default="sentence-transformers/all-MiniLM-L6-v2")
+    parser.add_argument("--hashing", action="store_true", help="offline hashing embedder (tests/benchmarks)")
+    parser.add_argument("--factory", help="module:callable returning a model (benchmarks)")
+    parser.add_argument("--max-batch", type=int, default=64)
+    parser.add_argument("--max-wait-ms", type=float, default=2.0)
+    args = parser.parse_args()
+
+    server = EmbeddingServer(_load_model(args), args.socket, max_batch=args.max_batch,
+                             max_wait_ms=args.max_wait_ms).start()
+    try:
+        server._closed.wait()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.close()
@@ -0,0 +1,39 @@
+# src/core/embeddings.py
+"""Offline stand-in for the sentence-transformers encoder.
+
+``HashingEmbedder`` exposes the subset of ``SentenceTransformer.encode`` that
+SimpleRAG uses, so benchmarks and tests can build the full pipeline without
+downloading MiniLM. Vectors are deterministic bag-of-words hashes: texts that
+share words get similar vectors, which is enough to exercise retrieval.
+"""
+import re
+import zlib
+from typing import List, Union
+
+import numpy as np
+
+_TOKEN_RE = re.compile(r"\w+")
+
+
+class HashingEmbedder:
+    def __init__(self, dim: int = 384, model_id: str = "hashing-embedder-v1"):
+        self.dim = dim
+        self.model_id = model_id
+
+    def get_sentence_embedding_dimension(self) -> int:
+        return self.dim
+
+    def _embed(self, text: str) -> np.ndarray:
+        vec = np.zeros(self.dim, dtype=np.float32)
+        for token in _TOKEN_RE.findall(text.lower()):
+            h = zlib.crc32(token.encode("utf-8"))
+            vec[h % self.dim] += 1.0 if (h >> 16) & 1 else -1.0
+        norm = np.linalg.norm(vec)
+        return vec / norm if norm else vec
+
+    def encode(self, sentences: Union[str, List[str]], batch_size: int = 32, convert_to_numpy: bool = True, **kwargs):
+        if isinstance(sentences, str):
+            return self._embed(sentences)
+        if not sentences:
+            return np.zeros((0, self.dim), dtype=np.float32)
+        return np.stack([self._embed(s) for s in sentences])
@@ -0,0 +1,62 @@
+# src/core/index_manifest.py
+"""Manifest describing a prebuilt Chroma index directory.
+
+``scripts/build_index.py`` writes it after ingesting; a read-only SimpleRAG
+refuses to serve an index whose embedding model or format does not match,
+since query vectors from a different model would silently return garbage.
+"""
+import json
+import time
+from pathlib import Path
+from typing import Dict, Optional
+
+MANIFEST_NAME = "index_manifest.json"
+INDEX_FORMAT_VERSION = 1
+
+
+class IndexMismatchError(RuntimeError):
+    """The index on disk was built with a different model or format."""
+
+
+def manifest_path(persist_directory) -> Path:
+    return Path(persist_directory) / MANIFEST_NAME
+
+
+def load_manifest(persist_directory) -> Optional[Dict]:
+    path = manifest_path(persist_directory)
+    if not path.exists():
+        return None
+    return json.loads(path.read_text(encoding="utf-8"))
+
+
+def write_manifest(persist_directory, manifest: Dict):
+    path = manifest_path(persist_directory)
+    tmp = path.with_suffix(".tmp")
+    tmp.write_text(json.dumps(manifest, indent=2), encoding="utf-8")
+    tmp.replace(path)
+
+
+def new_manifest(model_id: str, embedding_dim: int, chunker: Dict, topics: Dict[str, Dict]) -> Dict:
+    return {
+        "format_version": INDEX_FORMAT_VERSION,
+        "embedding_model_id": model_id,
+        "embedding_dim": embedding_dim,
+        "chunker": chunker,
+        "topics": topics,
+        "built_at": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+    }
+
+
+def check_compatible(manifest: Optional[Dict], model_id: str, embedding_dim: Optional[int] = None):
+    """Raise IndexMismatchError unless ``manifest`` matches the running model."""
+    if manifest is None:
+        raise IndexMismatchError(f"No {MANIFEST_NAME} found; build the index with scripts/build_index.py")
+    if manifest.get("format_version") != INDEX_FORMAT_VERSION:
+        raise IndexMismatchError(
+            f"Index format v{manifest.get('format_version')} != supported v{INDEX_FORMAT_VERSION}; rebuild the index")
+    if manifest.get("embedding_model_id") != model_id:
+        raise IndexMismatchError(
+            f"Index built with '{manifest.get('embedding_model_id')}' but this process embeds with '{model_id}'")
+    if embedding_dim is not None and manifest.get("embedding_dim") not in (None, embedding_dim):
+        raise IndexMismatchError(
+            f"Index vectors have dim {manifest.get('embedding_dim')} but the model produces {embedding_dim}")
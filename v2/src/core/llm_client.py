@@ -0,0 +1,422 @@
+# src/core/llm_client.py
+"""LLM client layer used by SimpleRAG.
+
+Backends take the compiled prompt as a static ``prefix`` (identified by
+``prefix_key``) plus a per-request ``suffix``. When the prefix has been
+registered with the provider's context cache, only the suffix is sent.
+
+``LLMClient`` wraps a backend with the call policy: an overall deadline,
+jittered retries, optional hedging at the observed p95 latency and a circuit
+breaker, so one stalled Gemini call can no longer hold a worker indefinitely.
+"""
+import collections
+import datetime
+import os
+import random
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from typing import Dict, Optional, Set
+
+import google.generativeai as genai
+from google.api_core import exceptions as google_exceptions
+from google.generativeai import caching
+
+from src.core import profiling
+from src.core.context import count_tokens
+from src.core.metrics import CACHE
+from src.core.tracing import annotate
+
+
+class LLMError(RuntimeError):
+    """Generation failed after the client's retry policy gave up."""
+
+
+class LLMTimeoutError(LLMError):
+    """No answer before the call deadline."""
+
+
+class CircuitOpenError(LLMError):
+    """The circuit breaker is open; the backend is not being called."""
+
+
+# Smallest prompt each model accepts for explicit context caching (tokens);
+# anything shorter is refused, so it is never worth a provider round trip
+CACHE_MIN_TOKENS = {
+    "gemini-2.5-flash": 1024,
+    "gemini-2.5-flash-lite": 1024,
+    "gemini-2.5-pro": 4096,
+}
+DEFAULT_CACHE_MIN_TOKENS = 4096
+
+
+def min_cache_tokens(model_name: str) -> int:
+    return CACHE_MIN_TOKENS.get(model_name, DEFAULT_CACHE_MIN_TOKENS)
+
+
+class GeminiBackend:
+    """Gemini via google.generativeai, with optional cached-content prefixes.
+
+    Prefixes shorter than the model's caching minimum are sent in full. A
+    failed registration is retried after an exponential backoff
+    (``cache_retry_s``, doubling up to the TTL) instead of being given up on.
+    Only one thread registers a given prefix; the others send the full prompt
+    meanwhile rather than wait.
+    """
+
+    def __init__(self, model_name: str = "gemini-2.5-flash", cache_prefixes: bool = True, cache_ttl_s: int = 3600,
+                 cache_retry_s: float = 60.0):
+        self.model_name = model_name
+        self.model = genai.GenerativeModel(model_name=model_name)
+        self.cache_prefixes = cache_prefixes
+        self.cache_ttl_s = cache_ttl_s
+        self.cache_retry_s = cache_retry_s
+        self.min_cache_tokens = min_cache_tokens(model_name)
+        self._lock = threading.Lock()
+        self._cached: Dict[str, tuple] = {}  # key -> (model bound to cache, expires_at)
+        self._registering: Set[str] = set()
+        self._failures: Dict[str, int] = {}
+        self._retry_at: Dict[str, float] = {}  # key -> time.time() before which not to try again
+
+    def register_prefix(self, key: str, prefix: str) -> bool:
+        """Create a cached-content entry for ``prefix``; False if it is too short or the provider refuses."""
+        if count_tokens(prefix) < self.min_cache_tokens:
+            with self._lock:
+                # prefixes are static per key: it will never get long enough
+                self._retry_at[key] = float("inf")
+            print(f"ℹ️  Prefix '{key}' is under {self.model_name}'s {self.min_cache_tokens}-token caching minimum")
+            return False
+        try:
+            cache = caching.CachedContent.create(
+                model=f"models/{self.model_name}",
+                display_name=key,
+                system_instruction=prefix,
+                ttl=datetime.timedelta(seconds=self.cache_ttl_s),
+            )
+        except Exception as e:
+            with self._lock:
+                failures = self._failures[key] = self._failures.get(key, 0) + 1
+                backoff = min(self.cache_retry_s * 2 ** (failures - 1), self.cache_ttl_s)
+                self._retry_at[key] = time.time() + backoff
+            print(f"⚠️ Context cache unavailable for '{key}' (retry in {backoff:.0f}s): {e}")
+            return False
+        model = genai.GenerativeModel.from_cached_content(cached_content=cache)
+        with self._lock:
+            # refresh a minute early rather than racing the provider-side expiry
+            self._cached[key] = (model, time.time() + self.cache_ttl_s - 60)
+            self._failures.pop(key, None)
+            self._retry_at.pop(key, None)
+        print(f"✅ Registered cached prompt prefix '{key}'")
+        return True
+
+    def _cached_model(self, prefix_key: Optional[str], prefix: str):
+        if not self.cache_prefixes or not prefix_key:
+            return None
+        now = time.time()
+        with self._lock:
+            entry = self._cached.get(prefix_key)
+            if entry is not None and entry[1] >= now:
+                return entry[0]
+            if prefix_key in self._registering or self._retry_at.get(prefix_key, 0) > now:
+                return None
+            self._registering.add(prefix_key)
+        try:
+            if not self.register_prefix(prefix_key, prefix):
+                return None
+        finally:
+            with self._lock:
+                self._registering.discard(prefix_key)
+        with self._lock:
+            return self._cached[prefix_key][0]
+
+    def is_retryable(self, exc: Exception) -> bool:
+        return isinstance(exc, (
+            google_exceptions.ServiceUnavailable, google_exceptions.ResourceExhausted,
+            google_exceptions.InternalServerError, google_exceptions.DeadlineExceeded,
+            TimeoutError, ConnectionError,
+        ))
+
+    def generate(self, suffix: str, prefix: str = "", prefix_key: Optional[str] = None,
+                 timeout: Optional[float] = None) -> str:
+        request_options = {"timeout": timeout} if timeout else None
+        cached_model = self._cached_model(prefix_key, prefix)
+        if self.cache_prefixes and prefix_key:
+            CACHE.inc(cache="prompt_prefix", result="hit" if cached_model is not None else "miss")
+        if cached_model is not None:
+            resp = cached_model.generate_content(suffix, request_options=request_options)
+        else:
+            resp = self.model.generate_content(prefix + suffix, request_options=request_options)
+        return (getattr(resp, "text", "") or "").strip()
+
+
+class FakeLLMBackend:
+    """Deterministic in-process stand-in for Gemini (load tests, benchmarks, CI).
+
+    Latency is ``base_latency_s`` plus a per-prompt-token cost for the tokens
+    actually sent, with probability ``tail_rate`` of an extra ``tail_latency_s``.
+    Calls fail with probability ``failure_rate``. A seeded RNG makes runs
+    repeatable. A local prefix cache mirrors cached-content billing: once a
+    prefix is registered only the suffix counts. Like Gemini, prefixes under
+    ``min_cache_tokens`` (default: gemini-2.5-flash's minimum) are refused.
+    """
+
+    def __init__(self, answer: str = "Human rights are universal. **Key Points:** dignity, equality.",
+                 base_latency_s: float = 0.0, latency_per_1k_tokens_s: float = 0.0,
+                 tail_latency_s: float = 0.0, tail_rate: float = 0.0, failure_rate: float = 0.0,
+                 cache_prefixes: bool = True, model_name: str = "fake-llm", seed: int = 0,
+                 min_cache_tokens: int = CACHE_MIN_TOKENS["gemini-2.5-flash"]):
+        self.answer = answer
+        self.model_name = model_name
+        self.base_latency_s = base_latency_s
+        self.latency_per_1k_tokens_s = latency_per_1k_tokens_s
+        self.tail_latency_s = tail_latency_s
+        self.tail_rate = tail_rate
+        self.failure_rate = failure_rate
+        self.cache_prefixes = cache_prefixes
+        self.min_cache_tokens = min_cache_tokens
+        self._prefixes: Dict[str, str] = {}
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+        self.calls = 0
+        self.billed_prompt_tokens = 0
+        self.last_prompt = ""
+
+    def register_prefix(self, key: str, prefix: str) -> bool:
+        if count_tokens(prefix) < self.min_cache_tokens:
+            return False
+        with self._lock:
+            self._prefixes[key] = prefix
+        return True
+
+    def is_retryable(self, exc: Exception) -> bool:
+        return isinstance(exc, LLMError)
+
+    def generate(self, suffix: str, prefix: str = "", prefix_key: Optional[str] = None,
+                 timeout: Optional[float] = None) -> str:
+        if self.cache_prefixes and prefix_key and prefix_key not in self._prefixes:
+            self.register_prefix(prefix_key, prefix)
+        cached = self.cache_prefixes and self._prefixes.get(prefix_key) == prefix
+        if self.cache_prefixes and prefix_key:
+            CACHE.inc(cache="prompt_prefix", result="hit" if cached else "miss")
+        sent = suffix if cached else prefix + suffix
+        tokens = count_tokens(sent)
+        with self._lock:
+            self.calls += 1
+            self.billed_prompt_tokens += tokens
+            self.last_prompt = sent
+            fail = self._rng.random() < self.failure_rate
+            tail = self._rng.random() < self.tail_rate
+        latency = self.base_latency_s + tokens / 1000 * self.latency_per_1k_tokens_s
+        if tail:
+            latency += self.tail_latency_s
+        time.sleep(latency if timeout is None else min(latency, timeout))
+        if fail:
+            raise LLMError("fake backend failure")
+        if timeout is not None and latency > timeout:
+            raise TimeoutError("fake backend timed out")
+        return self.answer
+
+
+class CircuitBreaker:
+    """Opens after ``failure_threshold`` consecutive failures.
+
+    While open, calls are rejected immediately. After ``reset_timeout_s`` one
+    trial call is let through (half-open); its outcome closes or re-opens it.
+    """
+
+    def __init__(self, failure_threshold: int = 5, reset_timeout_s: float = 30.0):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout_s = reset_timeout_s
+        self.state = "closed"
+        self._failures = 0
+        self._opened_at = 0.0
+        self._lock = threading.Lock()
+
+    def allow(self) -> bool:
+        with self._lock:
+            if self.state == "closed":
+                return True
+            if self.state == "open" and time.monotonic() - self._opened_at >= self.reset_timeout_s:
+                self.state = "half_open"
+                return True
+            return False
+
+    def record_success(self):
+        with self._lock:
+            self.state = "closed"
+            self._failures = 0
+
+    def record_failure(self):
+        with self._lock:
+            self._failures += 1
+            if self.state == "half_open" or self._failures >= self.failure_threshold:
+                self.state = "open"
+                self._opened_at = time.monotonic()
+
+    def record_abandoned(self):
+        """A call cut short by its caller says nothing about the backend.
+
+        Counts neither way; a half-open trial goes back to open with its
+        original timestamp so the next call can take the trial instead.
+        """
+        with self._lock:
+            if self.state == "half_open":
+                self.state = "open"
+
+
+class LLMClient:
+    """Call policy around an LLM backend.
+
+    ``generate`` enforces an overall deadline (``timeout_s`` from now, or an
+    earlier absolute ``deadline`` on the ``time.monotonic()`` clock). Retryable
+    errors are retried with full-jitter exponential backoff while time remains.
+    With ``hedge`` on, a second request is sent if the first has not answered
+    by the observed p95 latency and whichever finishes first wins. Calls run on
+    a private thread pool so a stalled request never blocks past the deadline.
+    """
+
+    def __init__(self, backend, timeout_s: float = 30.0, max_retries: int = 2,
+                 backoff_base_s: float = 0.25, backoff_max_s: float = 2.0,
+                 hedge: bool = False, hedge_after_s: float = 8.0, hedge_min_samples: int = 20,
+                 breaker: Optional[CircuitBreaker] = None, max_workers: int = 32, seed: Optional[int] = None):
+        self.backend = backend
+        self.timeout_s = timeout_s
+        self.max_retries = max_retries
+        self.backoff_base_s = backoff_base_s
+        self.backoff_max_s = backoff_max_s
+        self.hedge = hedge
+        self.hedge_after_s = hedge_after_s
+        self.hedge_min_samples = hedge_min_samples
+        self.breaker = breaker or CircuitBreaker()
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="llm")
+        self._latencies = collections.deque(maxlen=500)
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+        self._stats = collections.Counter()
+
+    @classmethod
+    def from_env(cls, backend) -> "LLMClient":
+        """Build a client configured by LLM_TIMEOUT_S, LLM_MAX_RETRIES and LLM_HEDGE."""
+        return cls(
+            backend,
+            timeout_s=float(os.getenv("LLM_TIMEOUT_S", "30")),
+            max_retries=int(os.getenv("LLM_MAX_RETRIES", "2")),
+            hedge=os.getenv("LLM_HEDGE", "False") == "True",
+        )
+
+    @property
+    def model_name(self) -> str:
+        return self.backend.model_name
+
+    def stats(self) -> Dict[str, object]:
+        with self._lock:
+            stats = dict(self._stats)
+        stats["circuit"] = self.breaker.state
+        stats["p95_s"] = self.latency_p95()
+        return stats
+
+    def _count(self, key: str, n: int = 1):
+        with self._lock:
+            self._stats[key] += n
+
+    def latency_p95(self) -> Optional[float]:
+        with self._lock:
+            samples = sorted(self._latencies)
+        if not samples:
+            return None
+        return samples[min(len(samples) - 1, int(0.95 * len(samples)))]
+
+    def _hedge_delay(self) -> Optional[float]:
+        if not self.hedge:
+            return None
+        with self._lock:
+            enough = len(self._latencies) >= self.hedge_min_samples
+        return self.latency_p95() if enough else self.hedge_after_s
+
+    def _attempt(self, suffix: str, prefix: str, prefix_key: Optional[str], deadline: float) -> str:
+        capture = profiling.current_capture()
+
+        def call():
+            # runs on the executor: a profiled request profiles it there
+            with profiling.profile_thread(capture):
+                return self.backend.generate(suffix, prefix=prefix, prefix_key=prefix_key,
+                                             timeout=max(deadline - time.monotonic(), 0.001))
+
+        start = time.monotonic()
+        pending = {self._executor.submit(call)}
+        hedge_at = None
+        delay = self._hedge_delay()
+        if delay is not None and start + delay < deadline:
+            hedge_at = start + delay
+        last_exc: Optional[BaseException] = None
+        while pending:
+            wake = hedge_at if hedge_at is not None else deadline
+            done, pending = wait(pending, timeout=max(wake - time.monotonic(), 0), return_when=FIRST_COMPLETED)
+            for future in done:
+                if future.exception() is None:
+                    for other in pending:
+                        other.cancel()
+                    return future.result()
+                last_exc = future.exception()
+            if done:
+                continue
+            if hedge_at is not None:
+                # first request is slower than p95: race a second one
+                hedge_at = None
+                self._count("hedged")
+                annotate(hedged=True)
+                pending.add(self._executor.submit(call))
+                continue
+            raise LLMTimeoutError(f"no answer from {self.model_name} within deadline")
+        raise last_exc
+
+    def _record_timeout(self, caller_bound: bool):
+        # only the client's own per-call timeout says the backend is unhealthy;
+        # a short caller budget running out would otherwise open the circuit for everyone
+        if caller_bound:
+            self.breaker.record_abandoned()
+            self._count("deadline_exceeded")
+        else:
+            self.breaker.record_failure()
+        self._count("timeouts")
+
+    def generate(self, suffix: str, prefix: str = "", prefix_key: Optional[str] = None,
+                 deadline: Optional[float] = None) -> str:
+        own_deadline = time.monotonic() + self.timeout_s
+        caller_bound = deadline is not None and deadline < own_deadline
+        deadline = min(own_deadline, deadline or float("inf"))
+        attempt = 0
+        while True:
+            if time.monotonic() >= deadline:
+                self._count("timeouts")
+                raise LLMTimeoutError(f"no answer from {self.model_name} within deadline")
+            if not self.breaker.allow():
+                self._count("rejected_open_circuit")
+                raise CircuitOpenError(f"circuit open for {self.model_name}")
+            self._count("calls")
+            annotate(model=self.model_name, attempts=attempt + 1)
+            start = time.monotonic()
+            try:
+                text = self._attempt(suffix, prefix, prefix_key, deadline)
+            except LLMTimeoutError:
+                self._record_timeout(caller_bound)
+                raise
+            except Exception as e:
+                if time.monotonic() >= deadline:
+                    # the backend gave up on the timeout it was handed
+                    self._record_timeout(caller_bound)
+                    raise LLMTimeoutError(f"no answer from {self.model_name} within deadline") from e
+                self.breaker.record_failure()
+                self._count("failures")
+                backoff = self._rng.uniform(0, min(self.backoff_max_s, self.backoff_base_s * 2 ** attempt))
+                if (attempt >= self.max_retries or not self.backend.is_retryable(e)
+                        or time.monotonic() + backoff >= deadline):
+                    raise LLMError(f"generation failed: {e}") from e
+                time.sleep(backoff)
+                attempt += 1
+                self._count("retries")
+                continue
+            self.breaker.record_success()
+            with self._lock:
+                self._latencies.append(time.monotonic() - start)
+            return text
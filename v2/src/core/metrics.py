@@ -0,0 +1,337 @@
+# src/core/metrics.py
+"""Lightweight in-process metrics with Prometheus text exposition.
+
+Counters and histograms are plain Python objects behind one lock each, with
+the label children cached, so recording a stage costs a dict lookup, a
+bisect and two additions (no dependency on prometheus_client). Components
+that already keep their own counters (bulkheads, single-flight, LLM clients)
+are exported at scrape time by collectors instead of being double-counted.
+
+Every gunicorn worker has its own registry, and a scrape lands on just one
+of them. With ``METRICS_DIR`` set (gunicorn.conf.py sets it), each worker
+writes a snapshot of its registry to ``<dir>/metrics-<pid>.json`` every
+``METRICS_FLUSH_S`` (default 1) seconds, and a scrape sums counters and
+histograms over every snapshot plus the answering worker's live values. This
+is the same idea as prometheus_client's multiprocess mode. Snapshots of
+exited workers are kept so counters never go backwards. Collector gauges
+describe live state (in-flight calls, queue depth), so they are reported per
+running worker with a ``pid`` label.
+"""
+import bisect
+import glob
+import json
+import os
+import threading
+import time
+from abc import ABC, abstractmethod
+from typing import Callable, Dict, Iterable, List, Optional, Sequence, Tuple
+
+from src.core import tracing
+
+# seconds: ~1 ms retrieval stages up to ~30 s LLM calls
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+TOKEN_BUCKETS = (50, 100, 200, 400, 800, 1600, 3200, 6400)
+
+Sample = Tuple[str, Dict[str, str], float]  # (suffix, labels, value)
+
+
+def _escape(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(labels: Dict[str, str]) -> str:
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{k}="{_escape(v)}"' for k, v in labels.items()) + "}"
+
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) and not value.is_integer() else str(int(value))
+
+
+class _Metric(ABC):
+    type = ""
+
+    def __init__(self, name: str, help: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+        self._children: Dict[Tuple[str, ...], object] = {}
+
+    def _key(self, labels: Dict[str, object]) -> Tuple[str, ...]:
+        return tuple(str(labels[n]) for n in self.labelnames)
+
+    def children(self) -> Dict[Tuple[str, ...], object]:
+        """Copy of the per-label-set values (what a snapshot stores)"""
+        with self._lock:
+            return {key: self._copy(value) for key, value in self._children.items()}
+
+    @staticmethod
+    def _copy(value):
+        return value
+
+    @staticmethod
+    @abstractmethod
+    def _merge(a, b):
+        """One label set's value summed over two snapshots"""
+
+    @abstractmethod
+    def samples(self, children: Optional[Dict[Tuple[str, ...], object]] = None) -> Iterable[Sample]:
+        """Exposition samples of ``children`` (default: this process's live values)"""
+
+
+class Counter(_Metric):
+    type = "counter"
+
+    def inc(self, amount: float = 1.0, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._children[key] = self._children.get(key, 0.0) + amount
+
+    def value(self, **labels) -> float:
+        with self._lock:
+            return self._children.get(self._key(labels), 0.0)
+
+    @staticmethod
+    def _merge(a, b):
+        return a + b
+
+    def samples(self, children=None):
+        for key, value in (self.children() if children is None else children).items():
+            yield "_total", dict(zip(self.labelnames, key)), value
+
+
+class Histogram(_Metric):
+    type = "histogram"
+
+    def __init__(self, name: str, help: str, labelnames: Sequence[str] = (), buckets: Sequence[float] = LATENCY_BUCKETS):
+        super().__init__(name, help, labelnames)
+        self.buckets = tuple(sorted(buckets))
+
+    def observe(self, value: float, **labels):
+        key = self._key(labels)
+        i = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            child = self._children.get(key)
+            if child is None:
+                # per-bucket (non-cumulative) counts, then sum and count
+                child = self._children[key] = [0] * (len(self.buckets) + 1) + [0.0, 0]
+            child[i] += 1
+            child[-2] += value
+            child[-1] += 1
+
+    def count(self, **labels) -> int:
+        with self._lock:
+            child = self._children.get(self._key(labels))
+            return child[-1] if child else 0
+
+    @staticmethod
+    def _copy(value):
+        return list(value)
+
+    @staticmethod
+    def _merge(a, b):
+        return [x + y for x, y in zip(a, b)]
+
+    def samples(self, children=None):
+        for key, child in (self.children() if children is None else children).items():
+            labels = dict(zip(self.labelnames, key))
+            cumulative = 0
+            for bound, n in zip(self.buckets + (float("inf"),), child):
+                cumulative += n
+                yield "_bucket", {**labels, "le": _format_value(bound)}, cumulative
+            yield "_sum", labels, child[-2]
+            yield "_count", labels, child[-1]
+
+
+class Registry:
+    def __init__(self, directory: Optional[str] = None, flush_interval_s: float = 1.0):
+        self._metrics: List[_Metric] = []
+        self._collectors: List[Callable[[], Iterable[Tuple[str, str, str, Iterable[Sample]]]]] = []
+        self.directory = directory
+        self.flush_interval_s = flush_interval_s
+        self._flusher_pid: Optional[int] = None
+
+    @classmethod
+    def from_env(cls) -> "Registry":
+        """METRICS_DIR (unset: this process only) and METRICS_FLUSH_S."""
+        return cls(os.getenv("METRICS_DIR") or None, float(os.getenv("METRICS_FLUSH_S", "1")))
+
+    def register(self, metric: _Metric) -> _Metric:
+        self._metrics.append(metric)
+        return metric
+
+    def counter(self, name: str, help: str, labelnames: Sequence[str] = ()) -> Counter:
+        return self.register(Counter(name, help, labelnames))
+
+    def histogram(self, name: str, help: str, labelnames: Sequence[str] = (), buckets=LATENCY_BUCKETS) -> Histogram:
+        return self.register(Histogram(name, help, labelnames, buckets))
+
+    def register_collector(self, collect: Callable[[], Iterable[Tuple[str, str, str, Iterable[Sample]]]]):
+        """``collect()`` yields ``(name, type, help, samples)`` at scrape time."""
+        self._collectors.append(collect)
+        return collect
+
+    def _collect(self) -> List[Tuple[str, str, str, List[Sample]]]:
+        families = []
+        for collect in self._collectors:
+            try:
+                families.extend((name, mtype, help, list(samples)) for name, mtype, help, samples in collect())
+            except Exception as e:  # a broken collector must not break the scrape
+                print(f"⚠️  Metrics collector failed: {e}")
+        return families
+
+    # ---------- Multi-process snapshots ----------
+    def _snapshot_path(self, pid: int) -> str:
+        return os.path.join(self.directory, f"metrics-{pid}.json")
+
+    def reset(self):
+        """Drop every recorded value (a forked worker starts from zero)"""
+        for m in self._metrics:
+            with m._lock:
+                m._children.clear()
+
+    def write_snapshot(self, collectors: bool = True):
+        """Write this process's values to METRICS_DIR for the other workers' scrapes."""
+        if not self.directory:
+            return
+        pid = os.getpid()
+        data = {
+            "pid": pid,
+            "metrics": {m.name: [[list(key), value] for key, value in m.children().items()] for m in self._metrics},
+            "collectors": self._collect() if collectors else [],
+        }
+        os.makedirs(self.directory, exist_ok=True)
+        path = self._snapshot_path(pid)
+        tmp = f"{path}.{threading.get_ident()}.tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(data, f)
+        os.replace(tmp, path)  # readers never see a half-written file
+
+    def start_flusher(self):
+        """Write snapshots every flush_interval_s from a daemon thread (call once per worker, after fork)."""
+        if not self.directory or self._flusher_pid == os.getpid():
+            return
+        self._flusher_pid = os.getpid()
+        stale = self._snapshot_path(os.getpid())
+        if os.path.exists(stale):
+            # an exited worker had this pid: keep its totals under another name
+            os.replace(stale, stale.replace(".json", f"-{time.time_ns()}.json"))
+
+        def flush_forever():
+            while True:
+                time.sleep(self.flush_interval_s)
+                try:
+                    self.write_snapshot()
+                except Exception as e:
+                    print(f"⚠️  Metrics snapshot failed: {e}")
+
+        threading.Thread(target=flush_forever, name="metrics-flush", daemon=True).start()
+
+    def _peer_snapshots(self) -> List[Dict]:
+        own = self._snapshot_path(os.getpid())
+        snapshots = []
+        for path in glob.glob(os.path.join(self.directory, "metrics-*.json")):
+            if path == own:
+                continue
+            try:
+                with open(path, encoding="utf-8") as f:
+                    snapshots.append(json.load(f))
+            except (OSError, ValueError):
+                continue  # removed or replaced while listing
+        return snapshots
+
+    @staticmethod
+    def _alive(pid: int) -> bool:
+        try:
+            os.kill(pid, 0)
+        except ProcessLookupError:
+            return False
+        except PermissionError:
+            pass
+        return True
+
+    def render(self) -> str:
+        """Prometheus text exposition format (version 0.0.4)."""
+        pid = os.getpid()
+        peers = self._peer_snapshots() if self.directory else []
+        families = []
+        for m in self._metrics:
+            children = m.children()
+            for snapshot in peers:
+                for key, value in snapshot["metrics"].get(m.name, []):
+                    key = tuple(key)
+                    children[key] = m._merge(children[key], value) if key in children else value
+            families.append((m.name, m.type, m.help, m.samples(children)))
+
+        # live state: one series per running worker
+        gauges: Dict[str, Tuple[str, str, List[Sample]]] = {}
+        sources = [(pid, self._collect())] + [(snap["pid"], snap["collectors"]) for snap in peers
+                                              if snap["pid"] != pid and self._alive(snap["pid"])]
+        for source_pid, collected in sources:
+            for name, mtype, help, samples in collected:
+                entry = gauges.setdefault(name, (mtype, help, []))
+                entry[2].extend((suffix, {**labels, "pid": str(source_pid)}, value)
+                                for suffix, labels, value in samples)
+        families.extend((name, mtype, help, samples) for name, (mtype, help, samples) in gauges.items())
+
+        lines = []
+        for name, mtype, help, samples in families:
+            lines.append(f"# HELP {name} {help}")
+            lines.append(f"# TYPE {name} {mtype}")
+            for suffix, labels, value in samples:
+                lines.append(f"{name}{suffix}{_format_labels(labels)} {_format_value(value)}")
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = Registry.from_env()
+
+STAGE_SECONDS = REGISTRY.histogram(
+    "rag_stage_seconds", "Duration of each answer pipeline stage", ["stage"])
+ANSWER_SECONDS = REGISTRY.histogram(
+    "rag_answer_seconds", "End-to-end generate_answer duration", ["topic", "difficulty"])
+ANSWERS = REGISTRY.counter(
+    "rag_answers", "Answers by outcome (ok, degraded, no_context, error)", ["topic", "difficulty", "outcome"])
+ERRORS = REGISTRY.counter(
+    "rag_errors", "Generation errors by kind", ["topic", "difficulty", "kind"])
+PROMPT_TOKENS = REGISTRY.histogram(
+    "rag_prompt_tokens", "Prompt tokens sent to the LLM (prefix + suffix)", ["difficulty"], TOKEN_BUCKETS)
+RESPONSE_TOKENS = REGISTRY.histogram(
+    "rag_response_tokens", "Answer tokens returned by the LLM", ["difficulty"], TOKEN_BUCKETS)
+CACHE = REGISTRY.counter(
+    "rag_cache_requests", "Cache lookups by cache and result (hit, miss)", ["cache", "result"])
+
+
+class stage:
+    """``with stage("vector_query"):`` records the block's duration in rag_stage_seconds.
+
+    Inside a request trace the block is also a span (Server-Timing, debug trees).
+    """
+
+    __slots__ = ("name", "start", "span")
+
+    def __init__(self, name: str):
+        self.name = name
+
+    def __enter__(self):
+        self.span = tracing.open_span(self.name)
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        STAGE_SECONDS.observe(time.perf_counter() - self.start, stage=self.name)
+        tracing.close_span(self.span)
+        return False
+
+
+def stats_family(name: str, help: str, stats: Dict[str, Dict[str, object]], label: str,
+                 mtype: str = "gauge") -> Tuple[str, str, str, List[Sample]]:
+    """Export ``{instance: {field: number}}`` stats dicts as one family, fields as a ``field`` label."""
+    samples = [("", {label: instance, "field": field}, value)
+               for instance, fields in stats.items()
+               for field, value in fields.items()
+               if isinstance(value, (int, float)) and not isinstance(value, bool)]
+    return name, mtype, help, samples
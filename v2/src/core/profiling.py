@@ -0,0 +1,217 @@
+# src/core/profiling.py
+"""On-demand cProfile captures of the answer and ingestion paths.
+
+``@profiled("generate_answer")`` profiles a call when the current request
+asked for it or when it is sampled (PROFILE_SAMPLE_RATE). Requests opt in
+via ``request_profile()``; the flag is a context variable, so it follows the
+call into bulkhead pool threads. Each capture is written to PROFILE_DIR as a
+``.prof`` file (pstats format: snakeviz, ``python -m pstats``), keeping
+the newest PROFILE_KEEP.
+
+cProfile instruments one thread, but part of a request's work runs on
+worker threads: query embedding on the dynamic batcher's thread, the LLM call
+on the LLMClient executor. Those workers take ``current_capture()`` from the
+request and run its work under ``profile_thread(capture)``; their profiles are
+merged into the request's ``.prof`` file. A batched encode may include other
+requests' queries.
+
+Only one capture runs at a time per process. A call that arrives while
+another is being profiled runs without a profile (``skipped``).
+"""
+import cProfile
+import functools
+import io
+import itertools
+import os
+import pstats
+import random
+import re
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Dict, List, Optional
+
+# set per request: None, or the list the written profile names are appended to
+_requested: ContextVar[Optional[List[str]]] = ContextVar("rag_profile", default=None)
+
+
+class _Capture:
+    """Worker-thread profiles collected for the capture in progress"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.profiles: List[cProfile.Profile] = []
+        self.closed = False
+
+    def add(self, profile: cProfile.Profile):
+        with self._lock:
+            # a hedged LLM call can finish after the request's profile was written
+            if not self.closed:
+                self.profiles.append(profile)
+
+    def close(self) -> List[cProfile.Profile]:
+        with self._lock:
+            self.closed = True
+            return list(self.profiles)
+
+
+# set while a call is being profiled, for the worker threads that do part of its work
+_capture: ContextVar[Optional[_Capture]] = ContextVar("rag_profile_capture", default=None)
+
+
+def current_capture() -> Optional[_Capture]:
+    """The capture of the calling request, to hand to a worker thread (None when not profiling)."""
+    return _capture.get()
+
+
+@contextmanager
+def profile_thread(*captures: Optional[_Capture]):
+    """Profile the enclosed work on this (worker) thread into each of ``captures``."""
+    captures = list(dict.fromkeys(c for c in captures if c is not None))
+    if not captures:
+        yield
+        return
+    profile = cProfile.Profile()
+    try:
+        profile.enable()
+    except ValueError:
+        # Python 3.12+: cProfile is one process-wide monitoring tool, already taken by the request
+        yield
+        return
+    try:
+        yield
+    finally:
+        profile.disable()
+        for capture in captures:
+            capture.add(profile)
+
+
+PROFILE_NAME = re.compile(r"^[0-9]{8}T[0-9]{6}-[a-z_]+-[0-9]+-[0-9]+-[0-9]+ms\.prof$")
+
+
+def request_profile():
+    """Profile the rest of this request; returns (names, token) for ``end_request_profile``."""
+    names: List[str] = []
+    return names, _requested.set(names)
+
+
+def end_request_profile(token):
+    _requested.reset(token)
+
+
+class Profiler:
+    def __init__(self, directory: str, sample_rate: float = 0.0, keep: int = 50, seed: Optional[int] = None):
+        self.directory = directory
+        self.sample_rate = sample_rate
+        self.keep = keep
+        self._rng = random.Random(seed)
+        self._busy = threading.Lock()
+        self._seq = itertools.count(1)
+        self._lock = threading.Lock()
+        self._counts = {"captured": 0, "skipped": 0}
+
+    @classmethod
+    def from_env(cls) -> "Profiler":
+        return cls(os.getenv("PROFILE_DIR", "logs/profiles"),
+                   float(os.getenv("PROFILE_SAMPLE_RATE", "0")),
+                   int(os.getenv("PROFILE_KEEP", "50")))
+
+    def _wanted(self) -> bool:
+        return _requested.get() is not None or (self.sample_rate > 0 and self._rng.random() < self.sample_rate)
+
+    def call(self, kind: str, fn, *args, **kwargs):
+        """Run ``fn``, under cProfile if this call is requested or sampled."""
+        if not self._wanted():
+            return fn(*args, **kwargs)
+        if not self._busy.acquire(blocking=False):
+            with self._lock:
+                self._counts["skipped"] += 1
+            return fn(*args, **kwargs)
+        capture = _Capture()
+        token = _capture.set(capture)
+        try:
+            profile = cProfile.Profile()
+            start = time.perf_counter()
+            profile.enable()
+            try:
+                return fn(*args, **kwargs)
+            finally:
+                profile.disable()
+                self._save(kind, profile, capture.close(), time.perf_counter() - start)
+        finally:
+            _capture.reset(token)
+            self._busy.release()
+
+    def _save(self, kind: str, profile: cProfile.Profile, workers: List[cProfile.Profile], elapsed_s: float):
+        name = (f"{time.strftime('%Y%m%dT%H%M%S')}-{kind}-{os.getpid()}-{next(self._seq)}"
+                f"-{int(elapsed_s * 1000)}ms.prof")
+        try:
+            os.makedirs(self.directory, exist_ok=True)
+            stats = pstats.Stats(profile)
+            for worker in workers:
+                stats.add(worker)
+            stats.dump_stats(os.path.join(self.directory, name))
+            self._prune()
+        except OSError as e:
+            print(f"⚠️  Could not write profile {name}: {e}")
+            return
+        with self._lock:
+            self._counts["captured"] += 1
+        names = _requested.get()
+        if names is not None:
+            names.append(name)
+        print(f"🔬 Profiled {kind} ({elapsed_s * 1000:.0f} ms) → {name}")
+
+    def _prune(self):
+        for old in self.list()[self.keep:]:
+            try:
+                os.remove(os.path.join(self.directory, old["name"]))
+            except OSError:
+                pass  # another worker got there first
+
+    def list(self) -> List[Dict[str, object]]:
+        """Profiles on disk, newest first."""
+        try:
+            names = [n for n in os.listdir(self.directory) if PROFILE_NAME.match(n)]
+        except FileNotFoundError:
+            return []
+        out = []
+        for name in names:
+            try:
+                st = os.stat(os.path.join(self.directory, name))
+            except OSError:
+                continue
+            _, kind, pid, _, ms = name[:-len(".prof")].split("-")
+            out.append({"name": name, "kind": kind, "pid": int(pid), "duration_ms": int(ms[:-2]),
+                        "bytes": st.st_size, "created": st.st_mtime})
+        return sorted(out, key=lambda p: (p["created"], p["name"]), reverse=True)
+
+    def path(self, name: str) -> Optional[str]:
+        """Full path of a listed profile, or None (also for names that aren't profile files)."""
+        path = os.path.join(self.directory, name)
+        return path if PROFILE_NAME.match(name) and os.path.isfile(path) else None
+
+    def summary(self, name: str, sort: str = "cumulative", limit: int = 40) -> str:
+        """pstats text report of the top ``limit`` functions."""
+        out = io.StringIO()
+        stats = pstats.Stats(self.path(name), stream=out)
+        stats.strip_dirs().sort_stats(sort).print_stats(limit)
+        return out.getvalue()
+
+    def stats(self) -> Dict[str, object]:
+        with self._lock:
+            return {**self._counts, "sample_rate": self.sample_rate}
+
+
+PROFILER = Profiler.from_env()
+
+
+def profiled(kind: str):
+    """Decorator: ``PROFILER.call(kind, fn, ...)``; costs one context-variable read when off."""
+    def decorate(fn):
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            return PROFILER.call(kind, fn, *args, **kwargs)
+        return wrapper
+    return decorate
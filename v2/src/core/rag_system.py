@@ -4,57 +4,208 @@ os.environ["CHROMADB_ANONYMIZED_TELEMETRY"] = "false"
 os.environ["CHROMADB_TELEMETRY_IMPL"] = "none"  # some versions still read this
 
 # src/core/rag_system.py
+import hashlib
+import threading
+import time
 from pathlib import Path
-from typing import Dict, List
+from typing import Dict, List, Optional
 
+import numpy as np
 from dotenv import load_dotenv
-from sentence_transformers import SentenceTransformer
 from chromadb import PersistentClient
 from chromadb.config import Settings
 import google.generativeai as genai
 
+from src.core.batcher import BatchingEncoder
+from src.core.context import count_tokens, mmr_select, pack_context, trim_to_sentences
+from src.core.cascade import ModelCascade
+from src.core.dedup import NearDuplicateIndex
+from src.core.index_manifest import check_compatible, load_manifest
+from src.core.llm_client import CircuitOpenError, GeminiBackend, LLMClient, LLMError, LLMTimeoutError
+from src.core import metrics, tracing
+from src.core.metrics import stage
+from src.core.profiling import profiled
+from src.core.prompts import DIFFICULTIES, EXAMPLE_QAS, get_prompt
+from src.core.sharding import ShardError, ShardRouter, flatten_query_result, merge_results
+from src.core.singleflight import SingleFlight
+from src.core.startup import MODEL_IMPORTS, STARTUP, PhaseTimer
+
+
+EMBEDDING_MODEL_ID = "sentence-transformers/all-MiniLM-L6-v2"
+
+
+class Answer(str):
+    """Answer text; `degraded` marks an extractive fallback built without the LLM,
+    or an answer from `partial` retrieval (a shard was missing).
+
+    `prompt_stats` holds this request's prompt token counts and the model used
+    (None until generation sets it).
+    """
+    degraded = False
+    partial = False
+    prompt_stats: Optional[Dict[str, object]] = None
+
 
 class SimpleRAG:
     """Basic RAG system for human rights education"""
 
-    def __init__(self, persist_directory: str = "./chromadb", topics_dir: str = "data/processed",preload_topics: bool = True):
+    # Context selection: fetch a candidate pool, keep `context_k` passages by MMR
+    candidate_pool = 12
+    context_k = 3
+    mmr_lambda = 0.7
+    max_context_chars = 4000
+    # Extractive compression: token budget for packed context sentences, per difficulty level
+    compress_context = True
+    context_token_budget = {"beginner": 200, "intermediate": 350, "advanced": 600}
+    # Concurrent query embeddings share model calls (QUERY_BATCH_WAIT_MS=0 disables)
+    query_batch_max = 32
+    query_batch_wait_ms = 2.0
+    # Request deadlines: below this much remaining time the LLM isn't even tried;
+    # the extractive fallback then gets this token budget (unless context was packed)
+    min_generation_s = 0.5
+    degraded_token_budget = 250
+
+    def __init__(self, persist_directory: str = "./chromadb", topics_dir: str = "data/processed",preload_topics: bool = True,
+                 dedup_chunks: bool = True, dedup_threshold: float = 0.85, dedup_across_topics: bool = False,
+                 embedding_model=None, llm=None, cascade: Optional[ModelCascade] = None,
+                 read_only: bool = False, load_llm: bool = True, router: Optional[ShardRouter] = None):
+        """`embedding_model` / `llm` (a backend or LLMClient) override MiniLM and Gemini (offline benchmarks and tests).
+
+        `cascade` routes generation between several models (without `llm`, its
+        default client is the primary and Gemini is not set up); with the real
+        Gemini backend it can also be enabled with LLM_CASCADE=True.
+
+        `read_only` serves a prebuilt index (see scripts/build_index.py): existing
+        collections are opened, nothing is ever ingested. `load_llm=False` skips
+        the LLM for indexing-only use.
+
+        `router` (or RAG_SHARDS / RAG_SHARD_MAP) sends retrieval to shard
+        servers instead of a local Chroma store.
+
+        With EMBEDDING_SOCKET set (and no `embedding_model`), queries and
+        ingestion are encoded by the shared embedding server on that socket.
+        """
         print("🔧 Initializing RAG system...")
-
-        # --- 0) Env & Keys ---
-        load_dotenv()
-        api_key = os.getenv("GOOGLE_API_KEY")
-        if not api_key:
-            raise RuntimeError("GOOGLE_API_KEY not set. Put it in your .env and NEVER hardcode keys in code.")
-        genai.configure(api_key=api_key)
-
-        # --- 1) LLM ---
-        self.model = genai.GenerativeModel(model_name="gemini-2.5-flash")
-        print("✅ Gemini model ready")
+        timer = PhaseTimer()
+        self.read_only = read_only
+
+        if not load_llm:
+            llm, cascade = None, None
+            print("⏭️  LLM skipped (indexing only)")
+        else:
+            if cascade is None and llm is None and os.getenv("LLM_CASCADE", "False") == "True":
+                llm = LLMClient.from_env(self._gemini_backend("gemini-2.5-flash"))
+                cascade = ModelCascade.from_env(self._gemini_backend, llm)
+
+            if llm is None and cascade is not None:
+                # the cascade brings its own clients: its default model is the primary
+                llm = cascade.clients[cascade.default]
+            if llm is None:
+                # --- 0-1) Env & Keys, LLM ---
+                llm = self._gemini_backend("gemini-2.5-flash")
+            # deadlines, retries, hedging and circuit breaking around the backend
+            if not isinstance(llm, LLMClient):
+                llm = LLMClient.from_env(llm)
+            print("✅ Gemini model ready" + (f" (cascade: {', '.join(cascade.clients)})" if cascade else ""))
+        self.llm = llm
+        self.cascade = cascade
+        timer.lap("llm")
 
         # --- 2) Embeddings ---
-        self.embedding_model = SentenceTransformer("sentence-transformers/all-MiniLM-L6-v2")
+        if embedding_model is None and os.getenv("EMBEDDING_SOCKET"):
+            # one shared model in a separate process (src/core/embedding_server.py)
+            from src.core.embedding_server import EmbeddingClient
+            embedding_model = EmbeddingClient(os.getenv("EMBEDDING_SOCKET"))
+        if embedding_model is None:
+            # deferred: importing sentence-transformers loads torch (~4s)
+            STARTUP.import_modules(MODEL_IMPORTS)
+            from sentence_transformers import SentenceTransformer
+            timer.lap("embedding_imports")
+            embedding_model = SentenceTransformer(EMBEDDING_MODEL_ID)
+        self.embedding_model = embedding_model
+        self.embedding_model_id = getattr(self.embedding_model, "model_id", None) or EMBEDDING_MODEL_ID
+        self.query_encoder = self.embedding_model
+        wait_ms = float(os.getenv("QUERY_BATCH_WAIT_MS", self.query_batch_wait_ms))
+        # the embedding server already batches across all workers
+        if wait_ms > 0 and not getattr(self.embedding_model, "batches_queries", False):
+            self.query_encoder = BatchingEncoder(self.embedding_model, max_wait_ms=wait_ms,
+                                                 max_batch=int(os.getenv("QUERY_BATCH_MAX", self.query_batch_max)))
         print("✅ Embedding model loaded")
+        timer.lap("embedding_model")
 
-        # --- 3) Vector DB (Chroma) ---
+        # --- 3) Vector DB (Chroma, or remote shards) ---
+        self.router = router or ShardRouter.from_env()
         persist_path = Path(persist_directory)
-        persist_path.mkdir(parents=True, exist_ok=True)
-        self.chroma_client = PersistentClient(
-            path=str(persist_path),
-            settings=Settings(anonymized_telemetry=False)
-        )
-        print(f"✅ ChromaDB ready at {persist_path.resolve()}")
+        self.persist_path = persist_path
+        manifest = None
+        if self.router is not None:
+            pass  # shards own the collections; nothing is stored locally
+        elif read_only:
+            # refuse to serve vectors built by a different model
+            manifest = load_manifest(persist_path)
+            check_compatible(manifest, self.embedding_model_id,
+                             self.embedding_model.get_sentence_embedding_dimension())
+        else:
+            persist_path.mkdir(parents=True, exist_ok=True)
+        if self.router is not None:
+            self.chroma_client = None
+            print(f"✅ Retrieval routed to shards: {', '.join(self.router.shards)}")
+        else:
+            self.chroma_client = PersistentClient(
+                path=str(persist_path),
+                settings=Settings(anonymized_telemetry=False)
+            )
+            print(f"✅ ChromaDB ready at {persist_path.resolve()}" + (" (read-only)" if read_only else ""))
+        timer.lap("vector_db")
 
         # --- 4) State (init ONCE) ---
         self.collections: Dict[str, any] = {}
+        # topics fully ingested; concurrent lazy loads of one topic share a single run
+        self._loaded_topics = set()
+        self._topic_loads = SingleFlight("topic-load")
+        self._dedup_lock = threading.Lock()
+        # stats of the last answer to finish (benchmarks); concurrent requests read Answer.prompt_stats
+        self.last_prompt_stats: Dict[str, object] = {}
         self.topics_dir = Path(topics_dir)
-        self.topics: List[str] = self._discover_topics()
-        print(f"✅ Discovered topics: {self.topics}")
+        if read_only:
+            self.topics: List[str] = list(manifest.get("topics", {}))
+            for topic in self.topics:
+                self._open_topic(topic)
+            print(f"✅ Opened prebuilt topics: {sorted(self._loaded_topics)}")
+        elif self.router is not None:
+            self.topics: List[str] = sorted(set(self._discover_topics()) | set(self.router.shard_map))
+        else:
+            self.topics: List[str] = self._discover_topics()
+            print(f"✅ Discovered topics: {self.topics}")
         print("✅ Default collection ready")
+        timer.lap("topics")
+
+        # --- 5) Near-duplicate detection at ingestion ---
+        # Across topics, a copy in a later topic is dropped from that topic's
+        # collection, so only enable it when retrieval spans topics.
+        self.dedup_chunks = dedup_chunks
+        self.dedup_threshold = dedup_threshold
+        self.dedup_across_topics = dedup_across_topics
+        self._global_dedup_index = NearDuplicateIndex(threshold=dedup_threshold) if dedup_across_topics else None
         
-        if preload_topics:
+        if preload_topics and not read_only and self.router is None:
             self.load_all_topics()
+            timer.lap("ingest")
+        # wall time per phase: self.init_phases, /api/health/startup
+        self.init_phases = timer.phases
+        STARTUP.record_init(timer.phases)
 
     # ---------- Utilities ----------
+    @staticmethod
+    def _gemini_backend(model_name: str) -> GeminiBackend:
+        load_dotenv()
+        api_key = os.getenv("GOOGLE_API_KEY")
+        if not api_key:
+            raise RuntimeError("GOOGLE_API_KEY not set. Put it in your .env and NEVER hardcode keys in code.")
+        genai.configure(api_key=api_key)
+        return GeminiBackend(model_name=model_name,
+                             cache_prefixes=os.getenv("GEMINI_CONTEXT_CACHE", "True") == "True")
+
     def _discover_topics(self) -> List[str]:
         if not self.topics_dir.exists():
             return []
@@ -71,37 +222,119 @@ class SimpleRAG:
         return col
     # ---------- Ingestion ----------
 
-    def load_documents_for_topic(self, topic_name: str, min_chunk_len: int = 50):
-        """Load documents under data/processed/{topic_name}/*.txt into Chroma"""
+    def _chunk_id(self, stem: str, i: int, text: str) -> str:
+        # stable IDs (content hash) to make ingestion idempotent
+        h = hashlib.blake2b(text.encode("utf-8"), digest_size=8).hexdigest()
+        return f"{stem}_c{i}_{h}"
+
+    def _dedup_chunks(self, topic_name: str, ids: List[str], chunks: List[str], metadatas: List[dict]):
+        """Drop near-duplicate chunks, recording their sources on the canonical chunk.
+
+        Returns the kept (ids, chunks, metadatas) plus the ids that were dropped.
+        """
+        if self._global_dedup_index is not None:
+            # the cross-topic index is shared by concurrent topic loads
+            with self._dedup_lock:
+                return self._dedup_with_index(self._global_dedup_index, topic_name, ids, chunks, metadatas)
+        return self._dedup_with_index(NearDuplicateIndex(threshold=self.dedup_threshold), topic_name, ids, chunks, metadatas)
+
+    def _dedup_with_index(self, index: NearDuplicateIndex, topic_name: str, ids: List[str], chunks: List[str], metadatas: List[dict]):
+        kept = {}
+        dropped: List[str] = []
+        reloaded: List[str] = []
+        for cid, chunk, meta in zip(ids, chunks, metadatas):
+            # a shared index already knows chunks from an earlier load of this topic
+            if (topic_name, cid) in index:
+                reloaded.append(cid)
+                canonical = None
+            else:
+                canonical = index.add((topic_name, cid), chunk)
+            if canonical is None:
+                kept[cid] = (chunk, meta)
+                continue
+            dropped.append(cid)
+            canon_topic, canon_id = canonical
+            alt = meta["source"] if canon_topic == topic_name else f"{topic_name}/{meta['source']}"
+            persisted = canon_topic != topic_name or canon_id not in kept
+            if persisted:
+                # canonical chunk already lives in a collection
+                col = self._get_or_create_collection(canon_topic)
+                canon_meta = col.get(ids=[canon_id], include=["metadatas"])["metadatas"][0]
+            else:
+                canon_meta = kept[canon_id][1]
+            alts = [a for a in canon_meta.get("alt_sources", "").split(", ") if a]
+            if alt not in alts and alt != canon_meta.get("source"):
+                alts.append(alt)
+                canon_meta["alt_sources"] = ", ".join(alts)
+                if persisted:
+                    col.update(ids=[canon_id], metadatas=[canon_meta])
+
+        if reloaded:
+            # the upsert rewrites these chunks: keep the copies other topics recorded on them
+            stored = self._get_or_create_collection(topic_name).get(ids=reloaded, include=["metadatas"])
+            for cid, old_meta in zip(stored["ids"], stored["metadatas"]):
+                meta = kept[cid][1]
+                alts = [a for a in meta.get("alt_sources", "").split(", ") if a]
+                # copies from other topics are recorded as "topic/source"
+                alts += [a for a in (old_meta or {}).get("alt_sources", "").split(", ") if "/" in a and a not in alts]
+                if alts:
+                    meta["alt_sources"] = ", ".join(alts)
+
+        kept_ids = list(kept)
+        return kept_ids, [kept[i][0] for i in kept_ids], [kept[i][1] for i in kept_ids], dropped
+
+    def _open_topic(self, topic_name: str):
+        """Open an existing persisted collection (read-only serving)."""
+        try:
+            self.collections[topic_name] = self.chroma_client.get_collection(name=topic_name)
+        except Exception as e:
+            print(f"⚠️  Prebuilt collection '{topic_name}' unavailable: {e}")
+            return
+        self._loaded_topics.add(topic_name)
+
+    @profiled("ingest")
+    def load_documents_for_topic(self, topic_name: str, min_chunk_len: int = 50) -> Dict[str, int]:
+        """Load documents under data/processed/{topic_name}/*.txt into Chroma
+
+        Returns ingestion counts: docs, chunks (stored) and skipped (near-duplicates).
+        """
+        if self.read_only:
+            raise RuntimeError("SimpleRAG is in read-only serving mode; build the index with scripts/build_index.py")
         topic_dir = self.topics_dir / topic_name
         print(f"📚 Loading documents for '{topic_name}' from {topic_dir} ...")
 
         if not topic_dir.exists():
             print(f"⚠️  No documents found for {topic_name} (dir not found)")
-            return
+            return {"docs": 0, "chunks": 0, "skipped": 0}
 
         collection = self._get_or_create_collection(topic_name)
 
-
-        doc_count, chunk_count = 0, 0
-        for txt_file in topic_dir.glob("*.txt"):
+        # chunk every document first so duplicates can be resolved across files
+        doc_count = 0
+        ids: List[str] = []
+        chunks: List[str] = []
+        metadatas: List[dict] = []
+        for txt_file in sorted(topic_dir.glob("*.txt")):
             content = txt_file.read_text(encoding="utf-8", errors="ignore")
-            chunks = [p.strip() for p in content.split("\n\n") if p.strip() and len(p.strip()) > min_chunk_len]
-            if not chunks:
+            file_chunks = [p.strip() for p in content.split("\n\n") if p.strip() and len(p.strip()) > min_chunk_len]
+            if not file_chunks:
                 continue
+            ids.extend(self._chunk_id(txt_file.stem, i, ch) for i, ch in enumerate(file_chunks))
+            chunks.extend(file_chunks)
+            metadatas.extend({"source": txt_file.name, "topic": topic_name, "chunk_id": i} for i in range(len(file_chunks)))
+            doc_count += 1
 
+        dropped: List[str] = []
+        if self.dedup_chunks and chunks:
+            ids, chunks, metadatas, dropped = self._dedup_chunks(topic_name, ids, chunks, metadatas)
+            if dropped:
+                # remove copies persisted by earlier (non-deduplicated) runs
+                collection.delete(ids=dropped)
+
+        if chunks:
             # vectorize in batch
             embeddings = self.embedding_model.encode(chunks, batch_size=32, convert_to_numpy=True).tolist()
 
-            # stable IDs (content hash) to make ingestion idempotent
-            import hashlib
-            def _cid(stem, i, text):
-                h = hashlib.blake2b(text.encode("utf-8"), digest_size=8).hexdigest()
-                return f"{stem}_c{i}_{h}"
-
-            ids = [_cid(txt_file.stem, i, ch) for i, ch in enumerate(chunks)]
-            metadatas = [{"source": txt_file.name, "topic": topic_name, "chunk_id": i} for i in range(len(chunks))]
-
             # requires chromadb 0.5.x
             collection.upsert(
                 documents=chunks,
@@ -109,10 +342,10 @@ class SimpleRAG:
                 ids=ids,
                 metadatas=metadatas
             )
-            doc_count += 1
-            chunk_count += len(chunks)
 
-        print(f"✅ Loaded {doc_count} docs ({chunk_count} chunks) -> collection '{topic_name}'")
+        self._loaded_topics.add(topic_name)
+        print(f"✅ Loaded {doc_count} docs ({len(chunks)} chunks, {len(dropped)} near-duplicates skipped) -> collection '{topic_name}'")
+        return {"docs": doc_count, "chunks": len(chunks), "skipped": len(dropped)}
 
     def load_all_topics(self):
         if not self.topics:
@@ -123,53 +356,103 @@ class SimpleRAG:
             self.load_documents_for_topic(topic)
         print("✅ All topics loaded")
 
+    def _ensure_topic_loaded(self, topic: str):
+        """Lazily ingest `topic` once; concurrent callers wait for the in-progress load."""
+        if topic in self._loaded_topics or self.read_only or self.router is not None:
+            return
+
+        def load_once():
+            # re-check: a load may have finished between the check above and here
+            if topic not in self._loaded_topics:
+                self.load_documents_for_topic(topic)
+
+        self._topic_loads.do(topic, load_once)
+
     # ---------- Retrieval ----------
-    def retrieve(self, query: str, topic: str, n_results: int = 6):
-        # lazy-load if needed
-        if topic not in self.collections:
-            self.load_documents_for_topic(topic)
-        if topic not in self.collections:
-            print(f"⚠️  Topic '{topic}' still not available.")
-            return None
-
-        query_emb = self.embedding_model.encode(query, convert_to_numpy=True).tolist()
-        return self.collections[topic].query(
-            query_embeddings=[query_emb],
-            n_results=n_results,
-            include=["documents", "metadatas", "distances"]  # <-- add scores
-        )
+    def warm_up(self, query: str = "What are human rights?"):
+        """Run a throwaway query so the model and every topic's HNSW index are loaded."""
+        query_emb = self.embed_query(query)
+        if self.router is not None:
+            self.retrieve(query, self.topics, n_results=1, query_embedding=query_emb)
+            return
+        for topic in sorted(self._loaded_topics):
+            self.retrieve(query, topic, n_results=1, query_embedding=query_emb)
+
+    def embed_query(self, query: str) -> List[float]:
+        with stage("embed_query"):
+            return self.query_encoder.encode(query, convert_to_numpy=True).tolist()
+
+    def retrieve(self, query: str, topic, n_results: int = 6, include_embeddings: bool = False, query_embedding=None,
+                 deadline: Optional[float] = None):
+        """Nearest chunks for `query` in `topic` (or a list of topics, merged by distance).
+
+        With shards, `deadline` (time.monotonic()) bounds the scatter; a result
+        missing a shard carries `partial: True` and `missing_shards`.
+        """
+        topics = [topic] if isinstance(topic, str) else list(topic)
+        query_emb = query_embedding if query_embedding is not None else self.embed_query(query)
+        if self.router is not None:
+            try:
+                with stage("vector_query"):
+                    return self.router.query(query_emb, topics, n_results=n_results,
+                                             include_embeddings=include_embeddings, deadline=deadline,
+                                             embedding_model_id=self.embedding_model_id)
+            except (ShardError, KeyError) as e:
+                print(f"⚠️  Sharded retrieval failed: {e}")
+                return None
+
+        include = ["documents", "metadatas", "distances"]  # <-- add scores
+        if include_embeddings:
+            include.append("embeddings")
+        parts = []
+        for name in topics:
+            # lazy-load if needed
+            self._ensure_topic_loaded(name)
+            if name not in self.collections:
+                print(f"⚠️  Topic '{name}' still not available.")
+                continue
+            with stage("vector_query"):
+                result = self.collections[name].query(
+                    query_embeddings=[query_emb],
+                    n_results=n_results,
+                    include=include
+                )
+            if len(topics) == 1:
+                return result
+            parts.append(flatten_query_result(result))
+        return merge_results(parts, n_results) if parts else None
 
     # ---------- Generation ----------
     def _preprocess_context(self, docs: List[str], query: str) -> str:
-    #"""Preprocess retrieved documents for better context"""
-    
-    # Remove very short chunks (likely noise)
-        meaningful_docs = [d for d in docs if len(d.strip()) > 50]
-        
+        """Join MMR-selected passages within the character budget.
+
+        Redundancy is already handled by MMR selection, so this only drops noise
+        and gives each passage a fair share of the budget, cut at sentence ends.
+        """
+        # Remove very short chunks (likely noise)
+        meaningful_docs = [d.strip() for d in docs if len(d.strip()) > 50]
+
         if not meaningful_docs:
             return "\n\n".join(docs)
-        
-        # Deduplicate similar chunks
-        unique_docs = []
-        seen_content = set()
-        
-        for doc in meaningful_docs:
-            # Simple dedup based on first 100 chars
-            signature = doc[:100].lower().strip()
-            if signature not in seen_content:
-                unique_docs.append(doc)
-                seen_content.add(signature)
-        
-        # Join with clear separators
-        context = "\n\n---\n\n".join(unique_docs)
-        
-        # Truncate if too long (Gemini has limits)
-        max_context_chars = 4000
-        if len(context) > max_context_chars:
-            context = context[:max_context_chars] + "\n\n[Context truncated for length]"
-    
+
+        separator = "\n\n---\n\n"
+        budget = self.max_context_chars - len(separator) * (len(meaningful_docs) - 1)
+        parts, truncated = [], False
+        for i, doc in enumerate(meaningful_docs):
+            # unused share of earlier passages rolls over to later ones
+            share = budget // (len(meaningful_docs) - i)
+            part = trim_to_sentences(doc, share)
+            if len(part) < len(doc):
+                truncated = True
+            if part:
+                parts.append(part)
+                budget -= len(part)
+
+        context = separator.join(parts)
+        if truncated:
+            context += "\n\n[Context truncated for length]"
         return context
-    
+
     def _postprocess_answer(self, answer: str) -> str:
         # """Clean and format the AI response"""
         
@@ -197,132 +480,162 @@ class SimpleRAG:
         
         return answer.strip()
     
-    def generate_answer(self, query: str, topic: str, difficulty: str = "intermediate") -> str:
-        #"""Generate answer with context retrieval and difficulty adaptation"""
-        
+    @profiled("generate_answer")
+    def generate_answer(self, query: str, topic: str, difficulty: str = "intermediate",
+                        deadline: Optional[float] = None) -> str:
+        """Generate answer with context retrieval and difficulty adaptation
+
+        `deadline` (time.monotonic()) bounds the whole answer: if the LLM can't
+        finish by then, the result is an extractive Answer with degraded=True.
+        """
+        if difficulty not in DIFFICULTIES:
+            # the prompt falls back to intermediate anyway; keep the metric labels bounded too
+            difficulty = "intermediate"
+        started = time.perf_counter()
+        outcome = "error"
+        try:
+            answer, outcome = self._generate_answer(query, topic, difficulty, deadline)
+            return answer
+        finally:
+            metrics.ANSWER_SECONDS.observe(time.perf_counter() - started, topic=topic, difficulty=difficulty)
+            metrics.ANSWERS.inc(topic=topic, difficulty=difficulty, outcome=outcome)
+
+    def _generate_answer(self, query: str, topic: str, difficulty: str, deadline: Optional[float]):
+        """generate_answer's pipeline; returns (answer, outcome) for the metrics"""
         print(f"\n❓ Question: {query}\n📂 Topic: {topic}\n📊 Difficulty: {difficulty}")
         
         # Initialize answer variable FIRST
         answer = ""
         
-        # Retrieve context
-        results = self.retrieve(query, topic, n_results=4)
+        # Retrieve a candidate pool (with vectors) for MMR selection
+        query_emb = self.embed_query(query)
+        results = self.retrieve(query, topic, n_results=self.candidate_pool,
+                                include_embeddings=True, query_embedding=query_emb, deadline=deadline)
         if not results or not results.get("documents") or not results["documents"][0]:
-            return self._generate_no_context_response(query, topic)
+            return self._generate_no_context_response(query, topic), "no_context"
+        partial = bool(results.get("partial"))
         
         # Process retrieved documents
         docs = results["documents"][0]
         metas = results["metadatas"][0]
         dists = results.get("distances", [[None]*len(docs)])[0]
         
-        # Rank by relevance
-        rank = sorted(range(len(docs)), key=lambda i: dists[i] if dists[i] is not None else 1e9)[:3]
+        # Select relevant but mutually distinct passages
+        with stage("rerank"):
+            rank = mmr_select(query_emb, np.asarray(results["embeddings"][0]), self.context_k, self.mmr_lambda)
+            if tracing.detailed():
+                tracing.annotate(candidates=[{"source": m.get("source", "?"), "distance": d}
+                                             for m, d in zip(metas, dists)],
+                                 selected=[int(i) for i in rank])
         raw_docs = [docs[i] for i in rank]
-        context = self._preprocess_context(raw_docs, query)
         sources = [f"{metas[i].get('source','?')} (score={dists[i]:.3f})" for i in rank]
+
+        raw_embs = [results["embeddings"][0][i] for i in rank]
+        raw_sources = [metas[i].get("source", "?") for i in rank]
+
+        with stage("context"):
+            full_context = self._preprocess_context(raw_docs, query)
+            context, n_sentences = full_context, None
+            budget = self.context_token_budget.get(difficulty, self.context_token_budget["intermediate"])
+            # packing re-encodes sentences: only worth it when the passages overflow the budget
+            if self.compress_context and count_tokens(full_context) > budget:
+                # Keep only the most query-relevant sentences within the token budget
+                packed = pack_context(
+                    query, query_emb, raw_docs, raw_embs, raw_sources,
+                    encode=lambda sents: self.embedding_model.encode(sents, batch_size=32, convert_to_numpy=True),
+                    budget_tokens=budget,
+                )
+                if packed.text and packed.tokens < count_tokens(full_context):
+                    context, n_sentences = packed.text, packed.sentences
         
-        # Build enhanced prompt
-        prompt = self._build_enhanced_prompt(query, context, topic, difficulty)
+        # Compiled prompt: static prefix (cacheable) + per-request suffix
+        with stage("prompt_build"):
+            compiled = get_prompt(difficulty)
+            suffix = compiled.render_suffix(context, query, topic)
+            # local: the instance is shared by every request thread
+            prompt_stats = {
+                "prompt_tokens_before": count_tokens(compiled.render(full_context, query, topic)),
+                "prompt_tokens_after": count_tokens(compiled.prefix + suffix),
+                "prefix_tokens": count_tokens(compiled.prefix),
+                "suffix_tokens": count_tokens(suffix),
+                "context_sentences": n_sentences,
+            }
+            tracing.annotate(**prompt_stats)
+        metrics.PROMPT_TOKENS.observe(prompt_stats["prompt_tokens_after"], difficulty=difficulty)
+        print(f"✂️  Prompt tokens: {prompt_stats['prompt_tokens_before']} → {prompt_stats['prompt_tokens_after']}"
+              f" ({prompt_stats['suffix_tokens']} per-request)")
         
         # Generate with error handling
+        degraded, outcome = False, "ok"
         try:
-            resp = self.model.generate_content(prompt)
+            if deadline is not None and deadline - time.monotonic() < self.min_generation_s:
+                raise LLMTimeoutError("request deadline leaves no time for generation")
             # Get the text FIRST
-            answer = (getattr(resp, "text", "") or "").strip()
+            with stage("llm"):
+                if self.cascade is not None:
+                    answer, model_used = self.cascade.generate(
+                        suffix, prefix=compiled.prefix, prefix_key=compiled.cache_key,
+                        difficulty=difficulty, prompt_tokens=prompt_stats["prompt_tokens_after"],
+                        deadline=deadline)
+                else:
+                    answer = self.llm.generate(suffix, prefix=compiled.prefix, prefix_key=compiled.cache_key,
+                                               deadline=deadline)
+                    model_used = self.llm.model_name
+                tracing.annotate(model=model_used)
+            prompt_stats["model"] = model_used
+            metrics.RESPONSE_TOKENS.observe(count_tokens(answer), difficulty=difficulty)
             # THEN postprocess it
-            answer = self._postprocess_answer(answer)
+            with stage("postprocess"):
+                answer = self._postprocess_answer(answer)
             
             if not answer:
                 answer = "I apologize, but I couldn't generate a response. Please try rephrasing your question."
                 
-        except Exception as e:
+        except (LLMTimeoutError, CircuitOpenError) as e:
+            # the passages are already retrieved: answer from them rather than not at all
+            print(f"⚠️ Generation unavailable in time ({e}), answering extractively")
+            kind = "timeout" if isinstance(e, LLMTimeoutError) else "circuit_open"
+            metrics.ERRORS.inc(topic=topic, difficulty=difficulty, kind=kind)
+            with stage("extractive"):
+                answer, degraded = self._extractive_answer(query, query_emb, raw_docs, raw_embs, raw_sources,
+                                                           context if n_sentences else None), True
+            outcome = "degraded"
+        except LLMError as e:
             print(f"⚠️ Generation error: {e}")
-            answer = "I encountered an error while processing your question. Please try again."
+            metrics.ERRORS.inc(topic=topic, difficulty=difficulty, kind="llm_error")
+            answer, outcome = "I encountered an error while processing your question. Please try again.", "error"
         
         # Add citations
         citation = "\n\n📚 Sources: " + ", ".join(sorted(set(sources)))
-        return answer + citation
+        result = Answer(answer + citation)
+        # an answer from a subset of the shards is degraded too, even if the LLM was fine
+        result.degraded = degraded or partial
+        result.partial = partial
+        if partial and outcome == "ok":
+            outcome = "degraded"
+        result.prompt_stats = prompt_stats
+        self.last_prompt_stats = prompt_stats
+        return result, outcome
+
+    def _extractive_answer(self, query: str, query_emb, docs: List[str], doc_embs, doc_sources: List[str],
+                           packed_text: Optional[str] = None) -> str:
+        """Degraded answer without the LLM: the passages' sentences that best match the query."""
+        text = packed_text
+        if not text:
+            text = pack_context(
+                query, query_emb, docs, doc_embs, doc_sources,
+                encode=lambda sents: self.embedding_model.encode(sents, batch_size=32, convert_to_numpy=True),
+                budget_tokens=self.degraded_token_budget,
+            ).text
+        if not text:
+            text = "\n\n---\n\n".join(trim_to_sentences(d, 400) for d in docs)
+        return ("⏱️ A full answer couldn't be generated in time, so here are the most relevant passages "
+                "from the source documents:\n\n" + text)
 
 
     def _build_enhanced_prompt(self, query: str, context: str, topic: str, difficulty: str) -> str:
         """Build prompt with difficulty-level adaptation"""
-        
-        # Difficulty-specific instructions
-        difficulty_instructions = {
-            "beginner": """
-    - Use simple, everyday language
-    - Avoid legal jargon unless you explain it
-    - Provide concrete examples (e.g., "Like the right to go to school")
-    - Use analogies ("Think of it like...")
-    - Keep explanations brief and clear
-    - Focus on practical understanding
-    - Start with simplest explanation first""",
-            
-            "intermediate": """
-    - Balance technical accuracy with accessibility
-    - Use legal terminology when appropriate, with context
-    - Provide structured explanations with examples
-    - Include relevant details without overwhelming
-    - Connect concepts to real-world applications""",
-            
-            "advanced": """
-    - Use precise legal and academic terminology
-    - Reference specific articles and frameworks
-    - Provide comprehensive analysis
-    - Include nuanced interpretations
-    - Connect to broader human rights discourse"""
-        }
-        
-        instructions = difficulty_instructions.get(difficulty, difficulty_instructions["intermediate"])
-        
-        # Get few-shot examples
-        examples = self._get_example_qas(difficulty)
-        
-        # Build the prompt with examples
-        prompt = f"""You are an expert human rights educator specializing in international law and human rights frameworks.
-
-    **Example Responses at {difficulty.title()} Level:**
-    {examples}
-
-    **Now answer this question following the same style and depth:**
-
-    **Context from Authoritative Documents:**
-    {context}
-
-    **Student Question:**
-    {query}
-
-    **Topic Context:** {topic.replace('_', ' ').title()}
-
-    **Instructions for {difficulty.title()}-Level Response:**
-    {instructions}
-
-    **Response Structure:**
-    1. Direct Answer: Start with a clear, direct response to the question
-    2. Explanation: Provide detailed explanation grounded in the provided context
-    3. Key Points: Highlight 2-3 essential takeaways
-    4. Context: Connect to broader human rights frameworks when relevant
-
-    **Critical Guidelines:**
-    - Base your answer ONLY on the provided context
-    - If the context doesn't contain enough information, acknowledge limitations
-    - Cite specific documents or articles when making claims
-    - Maintain educational tone - explain, don't just state
-    - Use examples to illustrate abstract concepts
-
-    **Response Length Guidelines:**
-    - Beginner: 150-250 words
-    - Intermediate: 250-400 words  
-    - Advanced: 400-600 words (comprehensive but focused)
-
-    **Response Format:**
-    - Use clear paragraphs
-    - Bold key concepts (use **bold**)
-    - Use numbered lists for steps or multiple points
-
-    **Now provide your response:**"""
-        
-        return prompt
+        return get_prompt(difficulty).render(context, query, topic)
 
 
     def _generate_no_context_response(self, query: str, topic: str) -> str:
@@ -344,55 +657,9 @@ class SimpleRAG:
 
     def _get_example_qas(self, difficulty: str) -> str:
         """Provide example Q&As for few-shot learning"""
-        
-        examples = {
-            "beginner": """
-    **Example 1:**
-    Q: What are human rights?
-    A: Human rights are basic rights and freedoms that belong to every person in the world, from birth until death. They include things like the right to life, freedom from torture, freedom of speech, and the right to education. Think of them as the fundamental things everyone deserves, no matter who they are or where they live.
-
-    **Key Points:**
-    - Universal (for everyone)
-    - Protect human dignity
-    - Can't be taken away
-
-    **Example 2:**
-    Q: Why are human rights important?
-    A: Human rights are important because they protect people from harm and ensure everyone is treated fairly. For example, the right to education means all children can go to school. The right to freedom of speech means you can express your opinions. These rights help create a society where everyone can live safely and pursue their goals.""",
-            
-            "intermediate": """
-    **Example:**
-    Q: What is the relationship between civil-political rights and economic-social-cultural rights?
-    A: Civil and political rights (like freedom of speech and voting rights) and economic, social, and cultural rights (like the right to education and adequate housing) are interdependent and mutually reinforcing.
-
-    **The Connection:**
-    The 1993 Vienna Declaration emphasizes that all human rights are "universal, indivisible and interdependent and interrelated." This means:
-    - You need freedom of expression (civil right) to advocate for better working conditions (economic right)
-    - Access to education (social right) enables political participation (political right)
-    - Economic security supports the exercise of cultural rights
-
-    **Key Framework:**
-    Both sets of rights are protected under international law through the ICCPR (civil-political) and ICESCR (economic-social-cultural) covenants, which together with the UDHR form the International Bill of Human Rights.""",
-            
-            "advanced": """
-    **Example:**
-    Q: How does Article 29 of the UDHR establish the framework for limitations on rights?
-    A: Article 29 of the Universal Declaration of Human Rights establishes the foundational principles for permissible limitations on rights and freedoms, creating a delicate balance between individual liberties and communal responsibilities.
-
-    **Legal Framework:**
-    Article 29 articulates three critical dimensions:
-
-    1. **Duties to Community** (Article 29.1): Establishes that rights exist within a social context where "everyone has duties to the community in which alone the free and full development of his personality is possible." This reflects the principle that rights and responsibilities are correlative.
+        return EXAMPLE_QAS.get(difficulty, EXAMPLE_QAS["intermediate"])
 
-    2. **Permissible Limitations** (Article 29.2): Limitations must be "determined by law" and serve legitimate aims: "due recognition and respect for the rights and freedoms of others" and "just requirements of morality, public order and the general welfare in a democratic society."
 
-    3. **Adherence to UN Principles** (Article 29.3): Rights cannot be exercised "contrary to the purposes and principles of the United Nations," ensuring alignment with international peace, security, and human dignity.
-
-    **Interpretive Significance:**
-    This tripartite structure provides the doctrinal foundation for proportionality analysis in human rights adjudication, requiring that any restriction be: (1) prescribed by law, (2) pursue a legitimate aim, and (3) be necessary and proportionate in a democratic society."""
-        }
-        
-        return examples.get(difficulty, examples["intermediate"])
 # ---------- Quick test ----------
 
 def test_rag():
@@ -0,0 +1,77 @@
+# src/core/ratelimit.py
+"""Per-client token buckets for admission control.
+
+Each client (API key, or address) has a bucket of ``burst`` tokens that
+refills at ``rate_per_s``. A request takes one token; an empty bucket means
+429 with the time until the next token as Retry-After. Buckets live in a
+bounded LRU, so a flood of distinct clients can't grow memory without limit.
+"""
+import collections
+import os
+import threading
+import time
+from typing import Dict, Optional, Tuple
+
+
+class TokenBucket:
+    __slots__ = ("rate", "burst", "tokens", "updated")
+
+    def __init__(self, rate: float, burst: float, now: float):
+        self.rate = rate
+        self.burst = burst
+        self.tokens = burst
+        self.updated = now
+
+    def take(self, now: float) -> Tuple[bool, float]:
+        """Take one token; returns (allowed, seconds until one is available)."""
+        self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        if self.tokens >= 1:
+            self.tokens -= 1
+            return True, 0.0
+        return False, (1 - self.tokens) / self.rate
+
+
+class ClientRateLimiter:
+    def __init__(self, rate_per_s: float, burst: float, max_clients: int = 10000, clock=time.monotonic):
+        self.rate_per_s = rate_per_s
+        self.burst = burst
+        self.max_clients = max_clients
+        self.clock = clock
+        self._lock = threading.Lock()
+        self._buckets: "collections.OrderedDict[str, TokenBucket]" = collections.OrderedDict()
+        self._stats = collections.Counter()
+
+    @classmethod
+    def from_env(cls) -> Optional["ClientRateLimiter"]:
+        """RATE_LIMIT_PER_MIN (default 0: off) and RATE_LIMIT_BURST.
+
+        Off by default because both identities over-count or under-count real
+        users: a school behind one NAT address is a single client, so a whole
+        class shares one bucket unless it sends API keys. Buckets are also
+        per worker process, so a client spread over N gunicorn workers gets
+        up to N times the configured rate and burst.
+        """
+        per_min = float(os.getenv("RATE_LIMIT_PER_MIN", "0"))
+        if per_min <= 0:
+            return None
+        return cls(per_min / 60.0, float(os.getenv("RATE_LIMIT_BURST", "20")))
+
+    def allow(self, client_id: str) -> Tuple[bool, float]:
+        now = self.clock()
+        with self._lock:
+            bucket = self._buckets.get(client_id)
+            if bucket is None:
+                bucket = self._buckets[client_id] = TokenBucket(self.rate_per_s, self.burst, now)
+                if len(self._buckets) > self.max_clients:
+                    self._buckets.popitem(last=False)  # least recently seen
+            else:
+                self._buckets.move_to_end(client_id)
+            allowed, retry_after = bucket.take(now)
+            self._stats["allowed" if allowed else "limited"] += 1
+        return allowed, retry_after
+
+    def stats(self) -> Dict[str, float]:
+        with self._lock:
+            return {"allowed": 0, "limited": 0, **self._stats, "clients": len(self._buckets),
+                    "rate_per_min": self.rate_per_s * 60, "burst": self.burst}
@@ -0,0 +1,247 @@
+# src/core/replication.py
+"""Delta replication of the vector index between serving nodes.
+
+Chunk ids are content-addressed (``<stem>_c<i>_<hash>``), so the set of ids in
+a topic collection identifies its contents. Each node keeps a per-topic
+Merkle tree over those ids: ids are bucketed by a hash prefix (``depth`` hex
+characters, 16 children per level), a leaf hashes its sorted ids and inner
+nodes hash their children. Two nodes compare root hashes and descend only
+into subtrees that differ, so finding what changed costs requests
+proportional to the change, and only missing chunks (with their stored
+embeddings) are transferred. Nothing is re-embedded.
+
+Only the id set is replicated: a metadata-only edit on an unchanged chunk is
+not detected (rebuild or ship a snapshot for those). A topic the local node
+does not have yet is created with the peer's collection metadata, so it keeps
+the peer's distance space and HNSW parameters.
+"""
+import collections
+import hashlib
+import threading
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import requests
+
+from src.core.index_manifest import IndexMismatchError, load_manifest, write_manifest
+
+DEFAULT_DEPTH = 2
+TRANSFER_BATCH = 500
+_HEX = "0123456789abcdef"
+EMPTY_HASH = hashlib.sha256(b"").hexdigest()
+
+
+def _bucket(chunk_id: str, depth: int) -> str:
+    return hashlib.blake2b(chunk_id.encode("utf-8"), digest_size=8).hexdigest()[:depth]
+
+
+class MerkleTree:
+    """Hash-prefix Merkle tree over a set of chunk ids."""
+
+    def __init__(self, ids: Iterable[str], depth: int = DEFAULT_DEPTH):
+        self.depth = depth
+        leaves: Dict[str, List[str]] = collections.defaultdict(list)
+        for cid in ids:
+            leaves[_bucket(cid, depth)].append(cid)
+        self._leaves = {p: sorted(v) for p, v in leaves.items()}
+        self._hashes: Dict[str, str] = {
+            p: hashlib.sha256("\n".join(v).encode("utf-8")).hexdigest() for p, v in self._leaves.items()
+        }
+        level = self._hashes
+        for _ in range(depth):
+            parents: Dict[str, List[Tuple[str, str]]] = collections.defaultdict(list)
+            for prefix, h in level.items():
+                parents[prefix[:-1]].append((prefix, h))
+            level = {p: hashlib.sha256("".join(f"{c}:{h};" for c, h in sorted(kids)).encode()).hexdigest()
+                     for p, kids in parents.items()}
+            self._hashes.update(level)
+        self.size = sum(len(v) for v in self._leaves.values())
+
+    @property
+    def root(self) -> str:
+        return self.hash("")
+
+    def hash(self, prefix: str = "") -> str:
+        return self._hashes.get(prefix, EMPTY_HASH)
+
+    def children(self, prefix: str = "") -> Dict[str, str]:
+        """Hashes of the non-empty children of an inner node."""
+        return {prefix + c: self._hashes[prefix + c] for c in _HEX if prefix + c in self._hashes}
+
+    def ids(self, prefix: str = "") -> List[str]:
+        """All ids under ``prefix`` (a leaf or an inner node)."""
+        if len(prefix) == self.depth:
+            return list(self._leaves.get(prefix, []))
+        return [cid for p in sorted(self._leaves) if p.startswith(prefix) for cid in self._leaves[p]]
+
+    def node(self, prefix: str = "") -> Dict:
+        """Wire form of one node: its hash plus children hashes, or ids at a leaf."""
+        out = {"prefix": prefix, "depth": self.depth, "hash": self.hash(prefix)}
+        if len(prefix) == self.depth:
+            out["ids"] = self.ids(prefix)
+        else:
+            out["children"] = self.children(prefix)
+        return out
+
+
+def diff_trees(local: MerkleTree, remote) -> Tuple[List[str], List[str]]:
+    """Return ``(missing, extra)``: ids only the remote has, and ids only local has.
+
+    ``remote`` needs ``node(prefix)`` and ``ids(prefix)`` (``MerkleTree`` or
+    ``RemoteTopic``); only subtrees whose hashes differ are visited.
+    """
+    missing: List[str] = []
+    extra: List[str] = []
+
+    def walk(node: Dict):
+        prefix = node["prefix"]
+        if "ids" in node:
+            ours = set(local.ids(prefix))
+            theirs = set(node["ids"])
+            missing.extend(sorted(theirs - ours))
+            extra.extend(sorted(ours - theirs))
+            return
+        ours = local.children(prefix)
+        theirs = node["children"]
+        for child in sorted(set(ours) | set(theirs)):
+            if ours.get(child) == theirs.get(child):
+                continue
+            if child not in theirs:
+                extra.extend(local.ids(child))
+            elif child not in ours:
+                missing.extend(remote.ids(child))
+            else:
+                walk(remote.node(child))
+
+    root = remote.node("")
+    if root["depth"] != local.depth:
+        raise ValueError(f"tree depth mismatch: local {local.depth}, remote {root['depth']}")
+    if root["hash"] != local.root:
+        walk(root)
+    return missing, extra
+
+
+class IndexReplica:
+    """Merkle trees and chunk transfer over one node's Chroma client."""
+
+    def __init__(self, chroma_client, depth: int = DEFAULT_DEPTH):
+        self.client = chroma_client
+        self.depth = depth
+        self._lock = threading.Lock()
+        self._trees: Dict[str, Tuple[int, MerkleTree]] = {}
+
+    def topics(self) -> List[str]:
+        return sorted(c.name for c in self.client.list_collections())
+
+    def _collection(self, topic: str):
+        return self.client.get_collection(topic)
+
+    def metadata(self, topic: str) -> Optional[Dict]:
+        """Collection metadata (distance space, HNSW parameters) to recreate the topic elsewhere"""
+        return self._collection(topic).metadata
+
+    def tree(self, topic: str) -> MerkleTree:
+        # collections only grow/shrink through ingestion or apply(); the count
+        # catches ingestion done by SimpleRAG in the same process
+        count = self._collection(topic).count()
+        with self._lock:
+            cached = self._trees.get(topic)
+            if cached is not None and cached[0] == count:
+                return cached[1]
+        tree = MerkleTree(self._collection(topic).get(include=[])["ids"], self.depth)
+        with self._lock:
+            self._trees[topic] = (count, tree)
+        return tree
+
+    def chunks(self, topic: str, ids: List[str]) -> Dict[str, List]:
+        data = self._collection(topic).get(ids=list(ids), include=["documents", "metadatas", "embeddings"])
+        embeddings = [list(map(float, e)) for e in data["embeddings"]]
+        return {"ids": data["ids"], "documents": data["documents"], "metadatas": data["metadatas"],
+                "embeddings": embeddings}
+
+    def apply(self, topic: str, records: Optional[Dict[str, List]] = None, delete_ids: Iterable[str] = (),
+              metadata: Optional[Dict] = None):
+        # metadata only applies when the collection is created here; Chroma
+        # defaults to l2 distance without it
+        collection = self.client.get_or_create_collection(topic, metadata=metadata)
+        if records and records["ids"]:
+            collection.upsert(ids=records["ids"], documents=records["documents"],
+                              metadatas=records["metadatas"], embeddings=records["embeddings"])
+        delete_ids = list(delete_ids)
+        if delete_ids:
+            collection.delete(ids=delete_ids)
+        with self._lock:
+            self._trees.pop(topic, None)
+
+
+class RemoteTopic:
+    """One topic's tree on a peer, fetched node by node over HTTP."""
+
+    def __init__(self, peer: "PeerClient", topic: str):
+        self.peer = peer
+        self.topic = topic
+
+    def node(self, prefix: str) -> Dict:
+        return self.peer.get(f"/api/replication/{self.topic}/tree", prefix=prefix)
+
+    def ids(self, prefix: str) -> List[str]:
+        return self.peer.get(f"/api/replication/{self.topic}/ids", prefix=prefix)["ids"]
+
+
+class PeerClient:
+    def __init__(self, base_url: str, token: Optional[str] = None, timeout_s: float = 30.0):
+        self.base_url = base_url.rstrip("/")
+        self.timeout_s = timeout_s
+        self.session = requests.Session()  # keep-alive across the tree walk
+        if token:
+            self.session.headers["X-Replication-Token"] = token
+        self.requests = 0
+
+    def get(self, path: str, **params) -> Dict:
+        self.requests += 1
+        resp = self.session.get(self.base_url + path, params=params, timeout=self.timeout_s)
+        resp.raise_for_status()
+        return resp.json()
+
+    def post(self, path: str, payload: Dict) -> Dict:
+        self.requests += 1
+        resp = self.session.post(self.base_url + path, json=payload, timeout=self.timeout_s)
+        resp.raise_for_status()
+        return resp.json()
+
+
+def sync_from_peer(replica: IndexReplica, peer: PeerClient, topics: Optional[List[str]] = None,
+                   persist_directory=None) -> Dict[str, Dict[str, int]]:
+    """Pull changes for ``topics`` (default: all the peer has) from ``peer``.
+
+    Returns per-topic counts of added and removed chunks. With
+    ``persist_directory`` the local index manifest is checked against the
+    peer's embedding model and its topic counts are updated.
+    """
+    info = peer.get("/api/replication/topics")
+    manifest = load_manifest(persist_directory) if persist_directory is not None else None
+    if manifest is not None and info.get("embedding_model_id") not in (None, manifest.get("embedding_model_id")):
+        raise IndexMismatchError(
+            f"peer embeds with '{info['embedding_model_id']}', this node with '{manifest.get('embedding_model_id')}'")
+
+    results: Dict[str, Dict[str, int]] = {}
+    local_topics = set(replica.topics())
+    for topic in topics or sorted(info["topics"]):
+        start_requests = peer.requests
+        local = replica.tree(topic) if topic in local_topics else MerkleTree([], replica.depth)
+        metadata = info["topics"].get(topic, {}).get("metadata")
+        missing, extra = diff_trees(local, RemoteTopic(peer, topic))
+        for i in range(0, len(missing), TRANSFER_BATCH):
+            records = peer.post(f"/api/replication/{topic}/chunks", {"ids": missing[i:i + TRANSFER_BATCH]})
+            replica.apply(topic, records, metadata=metadata)
+        if extra or topic not in local_topics:
+            replica.apply(topic, delete_ids=extra, metadata=metadata)
+        results[topic] = {"added": len(missing), "removed": len(extra), "requests": peer.requests - start_requests}
+        print(f"🔁 {topic}: +{len(missing)} / -{len(extra)} chunks ({results[topic]['requests']} requests)")
+
+    if manifest is not None:
+        for topic in results:
+            entry = dict(manifest.get("topics", {}).get(topic, {}))
+            entry["chunks"] = replica.tree(topic).size
+            manifest.setdefault("topics", {})[topic] = entry
+        write_manifest(persist_directory, manifest)
+    return results
@@ -0,0 +1,109 @@
+# src/core/retrieval_eval.py
+"""Retrieval quality against a labeled query set (recall@k, MRR, nDCG).
+
+Labels name the passage that answers a query and not a chunk id, so they
+stay valid across chunker settings. A label is ``{"source": file,
+"contains": phrase}``. The source is optional, meaning any file of the
+topic. A retrieved chunk is relevant when it comes from that source and
+contains the phrase, compared case- and whitespace-insensitively.
+
+- recall@k: the fraction of a query's labels hit by at least one of the
+  top k chunks. It is counted per fact and not per chunk, so a chunker that
+  splits a passage in two is not rewarded for it.
+- MRR: the reciprocal rank of the first relevant chunk.
+- nDCG@k: binary gains, ideal ranking from the index's own relevant chunks.
+"""
+import json
+import math
+import re
+from dataclasses import dataclass, field
+from typing import Dict, Iterable, List, Optional, Sequence
+
+_WORD_RE = re.compile(r"\S+")
+
+
+def _norm(text: str) -> str:
+    return " ".join(text.lower().split())
+
+
+@dataclass
+class LabeledQuery:
+    query: str
+    topic: str
+    relevant: List[Dict[str, str]] = field(default_factory=list)
+
+    def hits(self, text: str, source: str) -> List[int]:
+        """Indices of the labels this chunk satisfies"""
+        body = _norm(text)
+        return [i for i, label in enumerate(self.relevant)
+                if label.get("source") in (None, source) and _norm(label["contains"]) in body]
+
+
+def load_labels(path: str) -> List[LabeledQuery]:
+    with open(path, encoding="utf-8") as f:
+        return [LabeledQuery(**json.loads(line)) for line in f if line.strip()]
+
+
+# ---------- Chunkers (the ingestion split, and alternatives to compare) ----------
+def chunk_paragraphs(text: str, min_len: int = 50) -> List[str]:
+    """What SimpleRAG.load_documents_for_topic stores: blank-line paragraphs over min_len chars"""
+    return [p.strip() for p in text.split("\n\n") if p.strip() and len(p.strip()) > min_len]
+
+
+def chunk_words(text: str, size: int = 200, overlap: int = 40) -> List[str]:
+    """Fixed windows of `size` words, consecutive windows sharing `overlap` words"""
+    words = _WORD_RE.findall(text)
+    if not words:
+        return []
+    step = max(1, size - overlap)
+    return [" ".join(words[i:i + size]) for i in range(0, max(1, len(words) - overlap), step)]
+
+
+# ---------- Metrics ----------
+def recall_at_k(label_hits: Sequence[Sequence[int]], n_labels: int, k: int) -> float:
+    """`label_hits[r]` = labels satisfied by the chunk at rank r"""
+    if not n_labels:
+        return 0.0
+    found = {i for hits in label_hits[:k] for i in hits}
+    return len(found) / n_labels
+
+
+def reciprocal_rank(relevant: Sequence[bool]) -> float:
+    for rank, rel in enumerate(relevant, 1):
+        if rel:
+            return 1.0 / rank
+    return 0.0
+
+
+def ndcg_at_k(relevant: Sequence[bool], n_relevant: int, k: int) -> float:
+    dcg = sum(1.0 / math.log2(rank + 1) for rank, rel in enumerate(relevant[:k], 1) if rel)
+    ideal = sum(1.0 / math.log2(rank + 1) for rank in range(1, min(k, n_relevant) + 1))
+    return dcg / ideal if ideal else 0.0
+
+
+def score_query(q: LabeledQuery, docs: Sequence[str], sources: Sequence[str], n_relevant: int,
+                ks: Iterable[int]) -> Dict[str, float]:
+    """Metrics for one ranked result list; `n_relevant` = relevant chunks in the whole index"""
+    label_hits = [q.hits(doc, src) for doc, src in zip(docs, sources)]
+    relevant = [bool(h) for h in label_hits]
+    scores = {"mrr": reciprocal_rank(relevant)}
+    for k in ks:
+        scores[f"recall@{k}"] = recall_at_k(label_hits, len(q.relevant), k)
+        scores[f"ndcg@{k}"] = ndcg_at_k(relevant, n_relevant, k)
+    return scores
+
+
+def pareto_front(rows: Sequence[Dict[str, float]], maximize: Sequence[str] = (),
+                 minimize: Sequence[str] = ()) -> List[bool]:
+    """For each row, whether no other row is at least as good on every axis and better on one"""
+    def dominates(a, b):
+        ge = all(a[m] >= b[m] for m in maximize) and all(a[m] <= b[m] for m in minimize)
+        gt = any(a[m] > b[m] for m in maximize) or any(a[m] < b[m] for m in minimize)
+        return ge and gt
+
+    return [not any(dominates(other, row) for other in rows if other is not row) for row in rows]
+
+
+def mean(values: Iterable[float]) -> Optional[float]:
+    values = list(values)
+    return sum(values) / len(values) if values else None
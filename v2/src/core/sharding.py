@@ -0,0 +1,169 @@
+# src/core/sharding.py
+"""Topic-sharded retrieval: route topics to shard servers and merge results.
+
+Each shard (``src.api.shard_app``) hosts a subset of topic collections and
+answers vector queries over HTTP; the query embedding is computed once by
+the router's SimpleRAG, so shards need no embedding model. Topics map to
+shards through a static table or a consistent-hash ring (adding a shard only
+moves the topics that land on it). A query spanning several shards is
+scattered in parallel over pooled keep-alive connections; shards that miss
+their deadline, fail, or hold vectors from another embedding model are
+reported instead of failing the whole request.
+"""
+import bisect
+import hashlib
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor, wait
+from typing import Dict, List, Optional, Sequence
+
+import requests
+from requests.adapters import HTTPAdapter
+
+_MERGE_KEYS = ("ids", "documents", "metadatas", "distances", "embeddings")
+
+
+def _hash(key: str) -> int:
+    return int.from_bytes(hashlib.blake2b(key.encode("utf-8"), digest_size=8).digest(), "big")
+
+
+class HashRing:
+    """Consistent hashing of topics onto shard URLs, with virtual nodes."""
+
+    def __init__(self, shards: Sequence[str], replicas: int = 64):
+        self.shards = list(shards)
+        self._ring = sorted((_hash(f"{shard}#{i}"), shard) for shard in self.shards for i in range(replicas))
+        self._keys = [k for k, _ in self._ring]
+
+    def lookup(self, topic: str) -> str:
+        if not self._ring:
+            raise ValueError("hash ring has no shards")
+        i = bisect.bisect(self._keys, _hash(topic)) % len(self._ring)
+        return self._ring[i][1]
+
+
+def merge_results(parts: List[Dict[str, List]], n_results: int) -> Dict[str, List[List]]:
+    """Merge flat per-topic/per-shard hits into one Chroma-style result by distance."""
+    keys = [k for k in _MERGE_KEYS if parts and all(k in p for p in parts)]
+    if "distances" not in keys:
+        return {k: [[]] for k in _MERGE_KEYS[:4]}
+    rows = [row for p in parts for row in zip(*(p[k] for k in keys))]
+    dist_at = keys.index("distances")
+    rows.sort(key=lambda row: row[dist_at])
+    rows = rows[:n_results]
+    return {k: [[row[i] for row in rows]] for i, k in enumerate(keys)}
+
+
+def flatten_query_result(result: Dict) -> Dict[str, List]:
+    """Chroma ``query`` result for one query embedding -> flat lists."""
+    out = {}
+    for key in _MERGE_KEYS:
+        if result.get(key) is not None:
+            values = result[key][0]
+            out[key] = [list(map(float, v)) for v in values] if key == "embeddings" else list(values)
+    return out
+
+
+class ShardError(RuntimeError):
+    """No shard could answer the query."""
+
+
+class ShardRouter:
+    """Scatter-gather retrieval over shard servers."""
+
+    def __init__(self, shard_map: Optional[Dict[str, str]] = None, shards: Sequence[str] = (),
+                 timeout_s: float = 2.0, max_workers: int = 16):
+        if not shard_map and not shards:
+            raise ValueError("ShardRouter needs a static shard_map or a list of shards")
+        self.shard_map = dict(shard_map or {})
+        self.ring = HashRing(shards) if shards else None
+        self.timeout_s = timeout_s
+        self._unverified = set()  # shards already warned about for serving without a manifest
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="shard")
+        # one keep-alive pool per shard host, sized for concurrent scatters
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=max_workers, pool_maxsize=max_workers)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+
+    @property
+    def shards(self) -> List[str]:
+        return sorted(set(self.shard_map.values()) | set(self.ring.shards if self.ring else ()))
+
+    @classmethod
+    def from_env(cls) -> Optional["ShardRouter"]:
+        """Router from RAG_SHARD_MAP ("topic=url,...") and/or RAG_SHARDS ("url,url"); None if unset."""
+        shard_map = dict(item.split("=", 1) for item in os.getenv("RAG_SHARD_MAP", "").split(",") if "=" in item)
+        shards = [s.strip() for s in os.getenv("RAG_SHARDS", "").split(",") if s.strip()]
+        if not shard_map and not shards:
+            return None
+        return cls(shard_map=shard_map, shards=shards, timeout_s=float(os.getenv("RAG_SHARD_TIMEOUT_S", "2")))
+
+    def shard_for(self, topic: str) -> str:
+        # static entries win over the ring so hot topics can be pinned
+        if topic in self.shard_map:
+            return self.shard_map[topic]
+        if self.ring is None:
+            raise KeyError(f"no shard configured for topic '{topic}'")
+        return self.ring.lookup(topic)
+
+    def _query_shard(self, shard: str, topics: List[str], query_embedding: List[float], n_results: int,
+                     include_embeddings: bool, timeout: float) -> Dict[str, List]:
+        resp = self.session.post(f"{shard.rstrip('/')}/shard/query", timeout=timeout, json={
+            "topics": topics, "query_embedding": list(map(float, query_embedding)),
+            "n_results": n_results, "include_embeddings": include_embeddings,
+        })
+        resp.raise_for_status()
+        return resp.json()
+
+    def query(self, query_embedding: Sequence[float], topics: Sequence[str], n_results: int = 6,
+              include_embeddings: bool = False, deadline: Optional[float] = None,
+              embedding_model_id: Optional[str] = None) -> Dict[str, List]:
+        """Query every shard owning one of ``topics`` and merge the top ``n_results``.
+
+        Shards that fail or run past ``timeout_s`` (or the absolute ``deadline``
+        on ``time.monotonic()``) are skipped, and so are shards whose index was
+        embedded by a model other than ``embedding_model_id``: their distances
+        to this query mean nothing. The result then carries ``partial: True``
+        and ``missing_shards``. A shard without an index manifest reports no
+        model; it is trusted, with a warning the first time.
+        """
+        by_shard: Dict[str, List[str]] = {}
+        for topic in topics:
+            by_shard.setdefault(self.shard_for(topic), []).append(topic)
+
+        shard_deadline = time.monotonic() + self.timeout_s
+        if deadline is not None:
+            shard_deadline = min(shard_deadline, deadline)
+        timeout = max(shard_deadline - time.monotonic(), 0.001)
+        futures = {
+            self._executor.submit(self._query_shard, shard, shard_topics, query_embedding, n_results,
+                                  include_embeddings, timeout): shard
+            for shard, shard_topics in by_shard.items()
+        }
+        done, _ = wait(futures, timeout=timeout)
+        parts, missing = [], []
+        for future, shard in futures.items():
+            if future in done and future.exception() is None:
+                part = future.result()
+                shard_model = part.get("embedding_model_id")
+                if shard_model is None and embedding_model_id is not None and shard not in self._unverified:
+                    self._unverified.add(shard)
+                    print(f"⚠️  Shard {shard} has no index manifest: cannot check it was embedded "
+                          f"with '{embedding_model_id}'")
+                if embedding_model_id is None or shard_model in (None, embedding_model_id):
+                    parts.append(part)
+                    continue
+                error = f"index embedded with '{shard_model}', queries with '{embedding_model_id}'"
+            else:
+                error = future.exception() if future in done else "deadline exceeded"
+            print(f"⚠️  Shard {shard} skipped: {error}")
+            missing.append(shard)
+
+        if not parts:
+            raise ShardError(f"no shard answered for topics {list(topics)}")
+        merged = merge_results(parts, n_results)
+        if missing:
+            merged["partial"] = True
+            merged["missing_shards"] = missing
+        return merged
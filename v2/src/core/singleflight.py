@@ -0,0 +1,130 @@
+# src/core/singleflight.py
+"""Single-flight execution: concurrent callers with the same key share one call.
+
+When a teacher projects a question and a whole class submits it at once, only
+the first request (the leader) runs retrieval and generation; the others wait
+for and receive the leader's result. ``stream`` does the same for generators,
+replaying every chunk to each subscriber so SSE clients can attach late.
+"""
+import collections
+import threading
+from typing import Callable, Dict, Hashable, Iterator, List, Tuple
+
+
+class _Call:
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+        self.waiters = 0
+
+
+class _StreamCall:
+    def __init__(self):
+        self.cond = threading.Condition()
+        self.chunks: List[object] = []
+        self.finished = False
+        self.error = None
+
+
+class SingleFlight:
+    def __init__(self, name: str = "singleflight"):
+        self.name = name
+        self._lock = threading.Lock()
+        self._calls: Dict[Hashable, _Call] = {}
+        self._streams: Dict[Hashable, _StreamCall] = {}
+        self._stats = collections.Counter()
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            stats = {"requests": 0, "executions": 0, "coalesced": 0, **self._stats}
+            stats["in_flight"] = len(self._calls) + len(self._streams)
+        return stats
+
+    def do(self, key: Hashable, fn: Callable[[], object]) -> Tuple[object, bool]:
+        """Run ``fn`` once per in-flight ``key``; returns ``(result, shared)``.
+
+        ``shared`` is True for callers that attached to another caller's
+        execution. Exceptions raised by ``fn`` are re-raised in every caller.
+        """
+        with self._lock:
+            self._stats["requests"] += 1
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = _Call()
+                self._stats["executions"] += 1
+            else:
+                call.waiters += 1
+                self._stats["coalesced"] += 1
+
+        if not leader:
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result, True
+
+        try:
+            call.result = fn()
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            # forget the key before waking waiters: later requests start fresh
+            with self._lock:
+                del self._calls[key]
+            call.done.set()
+        return call.result, False
+
+    def stream(self, key: Hashable, gen_fn: Callable[[], Iterator[object]]) -> Tuple[Iterator[object], bool]:
+        """Share one running generator per ``key``; returns ``(iterator, shared)``.
+
+        The leader's generator runs on a background thread so a subscriber that
+        disconnects early does not cut the stream off for the others.
+        """
+        with self._lock:
+            self._stats["requests"] += 1
+            call = self._streams.get(key)
+            leader = call is None
+            if leader:
+                call = self._streams[key] = _StreamCall()
+                self._stats["executions"] += 1
+            else:
+                self._stats["coalesced"] += 1
+
+        if leader:
+            threading.Thread(target=self._produce, args=(key, call, gen_fn), daemon=True,
+                             name=f"{self.name}-stream").start()
+        return self._subscribe(call), not leader
+
+    def _produce(self, key: Hashable, call: _StreamCall, gen_fn):
+        try:
+            for chunk in gen_fn():
+                with call.cond:
+                    call.chunks.append(chunk)
+                    call.cond.notify_all()
+        except BaseException as e:
+            call.error = e
+        finally:
+            with self._lock:
+                del self._streams[key]
+            with call.cond:
+                call.finished = True
+                call.cond.notify_all()
+
+    @staticmethod
+    def _subscribe(call: _StreamCall) -> Iterator[object]:
+        i = 0
+        while True:
+            with call.cond:
+                while i >= len(call.chunks) and not call.finished:
+                    call.cond.wait()
+                pending = call.chunks[i:]
+                finished = call.finished
+            for chunk in pending:
+                yield chunk
+            i += len(pending)
+            if finished and i >= len(call.chunks):
+                if call.error is not None:
+                    raise call.error
+                return
@@ -0,0 +1,210 @@
+# src/core/snapshot.py
+"""Portable snapshots of a built index, and versioned restore with rollback.
+
+A snapshot is one zip file:
+
+- ``snapshot.json``: format version, snapshot id, index manifest, vector
+  shape, per-topic row ranges and collection metadata (distance space, HNSW
+  parameters), and a SHA-256 for every other member.
+- ``records.json``: ids, documents and metadatas per topic (deflated).
+- ``vectors.f32``: all embeddings as one row-major float32 matrix, stored
+  uncompressed so import can memory-map it straight out of the zip.
+
+Restores go to ``<root>/versions/<snapshot_id>`` and ``<root>/current`` is a
+symlink swapped atomically, so serving from ``<root>/current`` can switch to a
+new version, or roll back to an old one, without a half-written index.
+"""
+import hashlib
+import json
+import os
+import struct
+import time
+import zipfile
+from pathlib import Path
+from typing import Dict, List, Optional
+
+import numpy as np
+from chromadb import PersistentClient
+from chromadb.config import Settings
+
+from src.core.index_manifest import check_compatible, load_manifest, write_manifest
+
+SNAPSHOT_FORMAT_VERSION = 1
+_HEADER = "snapshot.json"
+_RECORDS = "records.json"
+_VECTORS = "vectors.f32"
+_UPSERT_BATCH = 1000
+
+
+class SnapshotError(RuntimeError):
+    """The snapshot is malformed, corrupted or from an unsupported format."""
+
+
+def _client(path: Path) -> PersistentClient:
+    return PersistentClient(path=str(path), settings=Settings(anonymized_telemetry=False))
+
+
+def _sha256(data) -> str:
+    return hashlib.sha256(data).hexdigest()
+
+
+# ---------- Export ----------
+def export_snapshot(persist_directory, out_path) -> Dict:
+    """Write every topic collection of a built index to ``out_path``; returns the header."""
+    persist_path = Path(persist_directory)
+    manifest = load_manifest(persist_path)
+    if manifest is None:
+        raise SnapshotError(f"{persist_path} has no index manifest; build it with scripts/build_index.py")
+
+    client = _client(persist_path)
+    records: Dict[str, Dict[str, List]] = {}
+    blocks, topics, row = [], {}, 0
+    for topic in sorted(manifest.get("topics", {})):
+        collection = client.get_collection(topic)
+        data = collection.get(include=["documents", "metadatas", "embeddings"])
+        vectors = np.asarray(data["embeddings"], dtype=np.float32).reshape(len(data["ids"]), -1)
+        records[topic] = {"ids": data["ids"], "documents": data["documents"], "metadatas": data["metadatas"]}
+        blocks.append(vectors)
+        topics[topic] = {"start": row, "count": len(data["ids"]), "metadata": collection.metadata}
+        row += len(data["ids"])
+
+    dim = manifest.get("embedding_dim") or (blocks[0].shape[1] if blocks else 0)
+    vectors = np.ascontiguousarray(np.concatenate(blocks) if blocks else np.zeros((0, dim), np.float32))
+    vector_bytes = vectors.tobytes()
+    records_bytes = json.dumps(records, ensure_ascii=False).encode("utf-8")
+    checksums = {_RECORDS: _sha256(records_bytes), _VECTORS: _sha256(vector_bytes)}
+    header = {
+        "format_version": SNAPSHOT_FORMAT_VERSION,
+        "snapshot_id": time.strftime("%Y%m%dT%H%M%SZ", time.gmtime()) + "-" + checksums[_VECTORS][:8],
+        "manifest": manifest,
+        "vectors": {"dtype": "float32", "rows": int(vectors.shape[0]), "dim": int(dim)},
+        "topics": topics,
+        "checksums": checksums,
+    }
+
+    out_path = Path(out_path)
+    out_path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = out_path.with_suffix(out_path.suffix + ".tmp")
+    with zipfile.ZipFile(tmp, "w") as zf:
+        zf.writestr(_HEADER, json.dumps(header, indent=2), compress_type=zipfile.ZIP_DEFLATED)
+        zf.writestr(_RECORDS, records_bytes, compress_type=zipfile.ZIP_DEFLATED)
+        zf.writestr(_VECTORS, vector_bytes, compress_type=zipfile.ZIP_STORED)
+    tmp.replace(out_path)
+    print(f"✅ Snapshot {header['snapshot_id']}: {row} vectors across {len(topics)} topics -> {out_path}")
+    return header
+
+
+# ---------- Read ----------
+def _member_offset(path: Path, info: zipfile.ZipInfo) -> int:
+    """Byte offset of a stored member's data (after its local file header)."""
+    with open(path, "rb") as f:
+        f.seek(info.header_offset)
+        local = f.read(30)
+    if local[:4] != b"PK\x03\x04":
+        raise SnapshotError(f"bad local header for {info.filename}")
+    name_len, extra_len = struct.unpack("<HH", local[26:30])
+    return info.header_offset + 30 + name_len + extra_len
+
+
+def read_snapshot(path, verify: bool = True):
+    """Return ``(header, records, vectors)``; ``vectors`` is a read-only memmap."""
+    path = Path(path)
+    with zipfile.ZipFile(path) as zf:
+        header = json.loads(zf.read(_HEADER))
+        if header.get("format_version") != SNAPSHOT_FORMAT_VERSION:
+            raise SnapshotError(f"snapshot format v{header.get('format_version')} != supported v{SNAPSHOT_FORMAT_VERSION}")
+        records_bytes = zf.read(_RECORDS)
+        info = zf.getinfo(_VECTORS)
+        if info.compress_type != zipfile.ZIP_STORED:
+            raise SnapshotError("vector payload must be stored uncompressed")
+
+    shape = (header["vectors"]["rows"], header["vectors"]["dim"])
+    if shape[0] == 0:
+        vectors = np.zeros(shape, dtype=np.float32)
+    else:
+        vectors = np.memmap(path, dtype=np.float32, mode="r", offset=_member_offset(path, info), shape=shape)
+    if verify:
+        checksums = header["checksums"]
+        if _sha256(records_bytes) != checksums[_RECORDS] or _sha256(vectors.data) != checksums[_VECTORS]:
+            raise SnapshotError(f"checksum mismatch in {path}; the snapshot is corrupted")
+    return header, json.loads(records_bytes), vectors
+
+
+# ---------- Restore & versions ----------
+def versions_dir(root) -> Path:
+    return Path(root) / "versions"
+
+
+def current_link(root) -> Path:
+    return Path(root) / "current"
+
+
+def list_versions(root) -> List[str]:
+    path = versions_dir(root)
+    return sorted(p.name for p in path.iterdir() if p.is_dir() and not p.name.startswith(".")) if path.exists() else []
+
+
+def current_version(root) -> Optional[str]:
+    link = current_link(root)
+    return Path(os.readlink(link)).name if link.is_symlink() else None
+
+
+def activate(root, snapshot_id: str):
+    """Atomically point ``<root>/current`` at a restored version (also used for rollback)."""
+    target = versions_dir(root) / snapshot_id
+    if not target.is_dir():
+        raise SnapshotError(f"version {snapshot_id} is not restored under {versions_dir(root)}")
+    tmp = Path(root) / ".current.tmp"
+    if tmp.is_symlink():
+        tmp.unlink()
+    tmp.symlink_to(Path("versions") / snapshot_id, target_is_directory=True)
+    os.replace(tmp, current_link(root))
+    print(f"🔀 Active index version: {snapshot_id}")
+
+
+def import_snapshot(snapshot_path, root, expected_model_id: Optional[str] = None,
+                    activate_version: bool = True, verify: bool = True) -> str:
+    """Restore a snapshot into ``<root>/versions/<id>`` without embedding anything.
+
+    Returns the snapshot id. With ``expected_model_id`` the import is refused
+    when the snapshot was embedded by another model.
+    """
+    header, records, vectors = read_snapshot(snapshot_path, verify=verify)
+    manifest = header["manifest"]
+    if expected_model_id is not None:
+        check_compatible(manifest, expected_model_id, header["vectors"]["dim"])
+
+    snapshot_id = header["snapshot_id"]
+    target = versions_dir(root) / snapshot_id
+    if (target / "index_manifest.json").exists():
+        print(f"♻️  Version {snapshot_id} already restored")
+    else:
+        staging = versions_dir(root) / f".{snapshot_id}.partial"
+        staging.mkdir(parents=True, exist_ok=True)
+        client = _client(staging)
+        for topic, span in header["topics"].items():
+            try:
+                client.delete_collection(topic)
+            except Exception:
+                pass  # fresh staging dir
+            # the distance space is fixed at creation: without it Chroma defaults to l2
+            collection = client.get_or_create_collection(topic, metadata=span.get("metadata"))
+            rec = records[topic]
+            for i in range(0, span["count"], _UPSERT_BATCH):
+                j = min(i + _UPSERT_BATCH, span["count"])
+                collection.upsert(
+                    ids=rec["ids"][i:j],
+                    documents=rec["documents"][i:j],
+                    metadatas=rec["metadatas"][i:j],
+                    embeddings=vectors[span["start"] + i:span["start"] + j].tolist(),
+                )
+        # the manifest goes last: a version without one never finished restoring
+        write_manifest(staging, manifest)
+        del client
+        os.replace(staging, target)
+        print(f"✅ Restored {header['vectors']['rows']} vectors into {target}")
+
+    if activate_version:
+        activate(root, snapshot_id)
+    return snapshot_id
+
@@ -0,0 +1,86 @@
+# src/core/startup.py
+"""Where start-up time goes: heavy imports and SimpleRAG.__init__ phases.
+
+The numbers are always recorded, because the modules are imported anyway.
+``/api/health/startup`` serves them. With STARTUP_REPORT set (or ``--out`` in
+scripts/startup_report.py) the report is also written as JSON after warm-up,
+so releases can be compared with ``scripts/startup_report.py --compare``.
+
+Import times are incremental. Modules are imported in dependency order and
+each is charged only for what was not loaded yet. With torch imported first,
+``sentence_transformers`` is charged for its own modules and not for torch.
+"""
+import importlib
+import json
+import os
+import platform
+import sys
+import threading
+import time
+from typing import Dict, Iterable, Optional
+
+
+class PhaseTimer:
+    """Consecutive laps: ``lap("llm")`` charges the time since the previous lap."""
+
+    def __init__(self):
+        self.phases: Dict[str, float] = {}
+        self._last = time.perf_counter()
+
+    def lap(self, name: str):
+        now = time.perf_counter()
+        self.phases[name] = self.phases.get(name, 0.0) + now - self._last
+        self._last = now
+
+
+class StartupProfile:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.imports: Dict[str, float] = {}
+        self.init_phases: Dict[str, float] = {}
+
+    def import_modules(self, names: Iterable[str]):
+        """Import ``names`` in order, recording the time each one adds."""
+        for name in names:
+            if name in sys.modules:
+                continue
+            start = time.perf_counter()
+            importlib.import_module(name)
+            with self._lock:
+                self.imports[name] = time.perf_counter() - start
+
+    def record_init(self, phases: Dict[str, float]):
+        """Phases of the latest SimpleRAG construction"""
+        with self._lock:
+            self.init_phases = dict(phases)
+
+    def report(self, warmup_phases: Optional[Dict[str, float]] = None) -> Dict[str, object]:
+        with self._lock:
+            imports, init_phases = dict(self.imports), dict(self.init_phases)
+        report = {
+            "pid": os.getpid(),
+            "python": platform.python_version(),
+            "ts": time.time(),
+            "imports_s": {name: round(s, 3) for name, s in imports.items()},
+            "init_phases_s": {name: round(s, 3) for name, s in init_phases.items()},
+            "warmup_phases_s": {name: round(s, 3) for name, s in (warmup_phases or {}).items()},
+        }
+        phases = report["warmup_phases_s"]
+        if phases and "total" not in phases:  # written from inside the warm-up: its phases are back to back
+            phases["total"] = round(sum(phases.values()), 3)
+        return report
+
+    def write(self, path: str, warmup_phases: Optional[Dict[str, float]] = None) -> Dict[str, object]:
+        report = self.report(warmup_phases)
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+        print(f"⏱️  Startup report written to {path}")
+        return report
+
+
+STARTUP = StartupProfile()
+
+# heavy third-party imports behind SimpleRAG, dependencies first
+RAG_IMPORTS = ("numpy", "chromadb", "google.generativeai", "src.core.rag_system")
+MODEL_IMPORTS = ("torch", "transformers", "sentence_transformers")
@@ -0,0 +1,159 @@
+# src/core/tracing.py
+"""Per-request traces: stage spans for Server-Timing and an opt-in span tree.
+
+The API opens a ``Trace`` per chat request. Every ``metrics.stage`` block run
+while it is current becomes a child span. The per-stage totals become the
+``Server-Timing`` header. Detailed traces also keep the attributes added
+with ``annotate`` (retrieval candidates, prompt tokens, model, retries) and
+are returned in the response's ``debug`` field. A sample of them is appended
+to a JSONL log. The current span lives in a context variable, so
+bulkhead pools copy the context into their worker threads.
+"""
+import json
+import os
+import random
+import threading
+import time
+import uuid
+from contextvars import ContextVar
+from typing import Dict, List, Optional
+
+_current_span: ContextVar[Optional["Span"]] = ContextVar("rag_span", default=None)
+_current_trace: ContextVar[Optional["Trace"]] = ContextVar("rag_trace", default=None)
+
+
+class Span:
+    __slots__ = ("name", "start", "end", "attrs", "children")
+
+    def __init__(self, name: str):
+        self.name = name
+        self.start = time.perf_counter()
+        self.end: Optional[float] = None
+        self.attrs: Optional[Dict[str, object]] = None
+        self.children: List["Span"] = []
+
+    @property
+    def duration_ms(self) -> float:
+        return ((self.end or time.perf_counter()) - self.start) * 1000
+
+    def to_dict(self, t0: float) -> Dict[str, object]:
+        out = {"name": self.name, "start_ms": round((self.start - t0) * 1000, 3),
+               "duration_ms": round(self.duration_ms, 3)}
+        if self.attrs:
+            out["attrs"] = self.attrs
+        if self.children:
+            out["children"] = [child.to_dict(t0) for child in self.children]
+        return out
+
+
+class Trace:
+    def __init__(self, request_id: str, name: str = "request", detailed: bool = False, sampled: bool = False):
+        self.request_id = request_id
+        self.detailed = detailed or sampled
+        self.sampled = sampled
+        self.started_at = time.time()
+        self.root = Span(name)
+
+    def timings(self) -> Dict[str, float]:
+        """Total milliseconds per stage name over the whole span tree."""
+        totals: Dict[str, float] = {}
+        stack = list(self.root.children)
+        while stack:
+            span = stack.pop()
+            totals[span.name] = totals.get(span.name, 0.0) + span.duration_ms
+            stack.extend(span.children)
+        return totals
+
+    def server_timing(self) -> str:
+        parts = [f"{name};dur={ms:.1f}" for name, ms in self.timings().items()]
+        parts.append(f"total;dur={self.root.duration_ms:.1f}")
+        return ", ".join(parts)
+
+    def to_dict(self) -> Dict[str, object]:
+        return {"request_id": self.request_id, "ts": self.started_at, **self.root.to_dict(self.root.start)}
+
+
+def new_request_id(incoming: Optional[str] = None) -> str:
+    """Keep a sane caller-supplied X-Request-ID, else make one."""
+    if incoming and len(incoming) <= 128 and all(c.isalnum() or c in "-_.:" for c in incoming):
+        return incoming
+    return uuid.uuid4().hex
+
+
+def start_trace(trace: Trace):
+    """Make ``trace`` current; returns a token for ``end_trace``."""
+    return _current_trace.set(trace), _current_span.set(trace.root)
+
+
+def end_trace(tokens):
+    trace = _current_trace.get()
+    if trace is not None:
+        trace.root.end = time.perf_counter()
+    _current_trace.reset(tokens[0])
+    _current_span.reset(tokens[1])
+
+
+def current_trace() -> Optional[Trace]:
+    return _current_trace.get()
+
+
+def detailed() -> bool:
+    """Whether attributes are being kept (guard for building costly annotations)."""
+    trace = _current_trace.get()
+    return trace is not None and trace.detailed
+
+
+def open_span(name: str):
+    parent = _current_span.get()
+    if parent is None:
+        return None
+    span = Span(name)
+    parent.children.append(span)
+    return span, _current_span.set(span)
+
+
+def close_span(handle):
+    if handle is not None:
+        span, token = handle
+        span.end = time.perf_counter()
+        _current_span.reset(token)
+
+
+def annotate(**attrs):
+    """Attach attributes to the current span of a detailed trace (no-op otherwise)."""
+    if not detailed():
+        return
+    span = _current_span.get()
+    if span.attrs is None:
+        span.attrs = {}
+    span.attrs.update(attrs)
+
+
+def _json_default(value):
+    if hasattr(value, "tolist"):  # numpy scalars and arrays
+        return value.tolist()
+    return str(value)
+
+
+class TraceLog:
+    """Appends sampled traces to a JSONL file (TRACE_LOG, TRACE_SAMPLE_RATE)."""
+
+    def __init__(self, path: str, sample_rate: float, seed: Optional[int] = None):
+        self.path = path
+        self.sample_rate = sample_rate
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_env(cls) -> "TraceLog":
+        return cls(os.getenv("TRACE_LOG", "logs/traces.jsonl"), float(os.getenv("TRACE_SAMPLE_RATE", "0")))
+
+    def sample(self) -> bool:
+        return self.sample_rate > 0 and self._rng.random() < self.sample_rate
+
+    def write(self, trace: Trace):
+        line = json.dumps(trace.to_dict(), default=_json_default)
+        with self._lock:
+            os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+            with open(self.path, "a", encoding="utf-8") as f:
+                f.write(line + "\n")
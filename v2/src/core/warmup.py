@@ -0,0 +1,96 @@
+# src/core/warmup.py
+"""Background warm-up with per-phase timings for readiness checks.
+
+The app binds its port immediately; heavy work (importing torch and
+friends, loading the model, opening the index, a first query) runs on a
+warm-up thread. Orchestrators poll readiness and route traffic only once the
+node is warm; liveness stays green throughout.
+"""
+import threading
+import time
+from contextlib import contextmanager
+from typing import Callable, Dict, Optional
+
+
+class Warmup:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._thread: Optional[threading.Thread] = None
+        self.created_at = time.monotonic()
+        self.phases: Dict[str, float] = {}
+        self.state = "idle"  # idle -> warming -> ready | failed
+        self.error: Optional[str] = None
+
+    @property
+    def ready(self) -> bool:
+        return self.state == "ready"
+
+    @contextmanager
+    def phase(self, name: str):
+        """Time a start-up phase (also usable outside the warm-up thread)."""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            with self._lock:
+                self.phases[name] = time.perf_counter() - start
+
+    def start(self, fn: Callable[[], object]) -> bool:
+        """Run ``fn`` once on a daemon thread; returns False if already started."""
+        with self._lock:
+            if self._thread is not None:
+                return False
+            self.state = "warming"
+            self._thread = threading.Thread(target=self._run, args=(fn,), daemon=True, name="warmup")
+        self._thread.start()
+        return True
+
+    def run(self, fn: Callable[[], object]) -> bool:
+        """Warm up synchronously (e.g. in a pre-fork master); returns readiness."""
+        with self._lock:
+            self.state = "warming"
+        self._run(fn)
+        return self.ready
+
+    def mark_ready(self) -> bool:
+        """The app was built outside a warm-up (lazily, by the first request): ready now.
+
+        A warm-up in progress (or one that failed) keeps owning the state.
+        Returns whether this call made the node ready.
+        """
+        with self._lock:
+            if self.state != "idle":
+                return False
+            self.state = "ready"
+        print("🔥 Built on first request: ready")
+        return True
+
+    def _run(self, fn):
+        start = time.perf_counter()
+        try:
+            fn()
+        except Exception as e:
+            with self._lock:
+                self.state, self.error = "failed", f"{type(e).__name__}: {e}"
+            print(f"❌ Warm-up failed: {self.error}")
+            return
+        with self._lock:
+            self.phases["total"] = time.perf_counter() - start
+            self.state = "ready"
+        print(f"🔥 Warm-up done in {self.phases['total']:.2f}s")
+
+    def wait(self, timeout: Optional[float] = None) -> bool:
+        thread = self._thread
+        if thread is not None:
+            thread.join(timeout)
+        return self.ready
+
+    def status(self) -> Dict[str, object]:
+        with self._lock:
+            return {
+                "state": self.state,
+                "ready": self.state == "ready",
+                "phases_s": {name: round(s, 3) for name, s in self.phases.items()},
+                "error": self.error,
+                "uptime_s": round(time.monotonic() - self.created_at, 3),
+            }
@@ -0,0 +1,121 @@
+"""
+Test admission control for /api/chat: per-client token buckets, bounded queue and load shedding
+"""
+
+import sys
+sys.path.append('.')
+
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from src.core.bulkhead import Bulkhead, BulkheadTimeoutError, bulkheads_from_env
+from src.core.ratelimit import ClientRateLimiter
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def test_token_bucket_allows_burst_then_refills():
+    clock = FakeClock()
+    limiter = ClientRateLimiter(rate_per_s=1.0, burst=2, clock=clock)
+    assert limiter.allow("ip:a")[0] and limiter.allow("ip:a")[0]
+    allowed, retry_after = limiter.allow("ip:a")
+    assert not allowed and retry_after == pytest.approx(1.0)
+    assert limiter.allow("ip:b")[0]  # other clients have their own bucket
+
+    clock.now = 1.0
+    assert limiter.allow("ip:a")[0]
+    assert limiter.stats()["limited"] == 1
+
+
+def test_limiter_forgets_least_recent_clients():
+    limiter = ClientRateLimiter(rate_per_s=1.0, burst=1, max_clients=2, clock=FakeClock())
+    for client in ("a", "b", "c"):
+        limiter.allow(client)
+    assert limiter.stats()["clients"] == 2
+
+
+def test_requests_waiting_too_long_are_shed():
+    pool = Bulkhead("generation", max_workers=1, max_queue=4, max_queue_wait_s=0.05)
+    slow = pool.submit(time.sleep, 0.2)
+    late = pool.submit(lambda: "too late")
+    with pytest.raises(BulkheadTimeoutError):
+        late.result(5)
+    slow.result(5)
+    assert pool.stats()["shed"] == 1
+
+
+def _app(monkeypatch, release, limiter=None, generation=(2, 3)):
+    from src.api.app import create_app
+    from src.api.routes import chat
+
+    class SlowRAG:
+        def generate_answer(self, query, topic, difficulty, deadline=None):
+            release.wait(10)
+            return f"answer to {query}"
+
+    monkeypatch.setattr(chat, "rag_system", SlowRAG())
+    monkeypatch.setattr(chat, "bulkheads", bulkheads_from_env({
+        "retrieval": (2, 4), "generation": generation, "light": (1, 8)}))
+    monkeypatch.setattr(chat, "rate_limiter", limiter)
+    return create_app(warmup=False)
+
+
+def test_per_client_limit_returns_429(monkeypatch):
+    release = threading.Event()
+    release.set()
+    app = _app(monkeypatch, release, limiter=ClientRateLimiter(rate_per_s=0.1, burst=2))
+    ask = {'query': 'What is the CRC?', 'topic': 'childrens_rights'}
+    with app.test_client() as client:
+        assert [client.post('/api/chat', json=ask).status_code for _ in range(2)] == [200, 200]
+        limited = client.post('/api/chat', json=ask)
+        assert limited.status_code == 429 and int(limited.headers['Retry-After']) >= 1
+        # an unknown API key doesn't buy a fresh bucket: it is still this address
+        assert client.post('/api/chat', json=ask, headers={'X-API-Key': 'made-up'}).status_code == 429
+        # a configured API key is a different client
+        monkeypatch.setenv('API_KEYS', 'teacher-1, teacher-2')
+        assert client.post('/api/chat', json=ask, headers={'X-API-Key': 'teacher-1'}).status_code == 200
+        admission = client.get('/api/stats').get_json()['admission']
+    assert admission['rate_limited'] == 2
+
+
+def test_class_burst_is_shed_fast_instead_of_queued(monkeypatch):
+    release = threading.Event()
+    app = _app(monkeypatch, release)
+
+    def ask(i):
+        start = time.perf_counter()
+        with app.test_client() as client:
+            status = client.post('/api/chat', json={'query': f'question {i}', 'topic': 'childrens_rights'}).status_code
+        return status, time.perf_counter() - start
+
+    with ThreadPoolExecutor(max_workers=40) as pool:
+        futures = [pool.submit(ask, i) for i in range(40)]
+        deadline = time.monotonic() + 5
+        while sum(f.done() for f in futures) < 35 and time.monotonic() < deadline:
+            time.sleep(0.01)
+        # everything beyond 2 running + 3 queued was answered at once
+        shed = [f.result() for f in futures if f.done()]
+        assert len(shed) == 35 and all(status == 503 and s < 1 for status, s in shed)
+        release.set()
+        admitted = [f.result(10) for f in futures]
+    assert sorted(status for status, _ in admitted).count(200) == 5
+
+    from src.api.routes import chat
+    admission = chat.admission_stats()
+    assert admission['shed'] == 35 and admission['capacity'] == 5 and admission['in_flight'] == 0
+
+
+def test_rate_limit_is_off_unless_configured(monkeypatch):
+    monkeypatch.delenv('RATE_LIMIT_PER_MIN', raising=False)
+    assert ClientRateLimiter.from_env() is None
+    monkeypatch.setenv('RATE_LIMIT_PER_MIN', '120')
+    assert ClientRateLimiter.from_env().rate_per_s == 2.0
@@ -0,0 +1,90 @@
+"""
+Test dynamic micro-batching of concurrent query embeddings
+"""
+
+import sys
+sys.path.append('.')
+
+import threading
+
+import numpy as np
+import pytest
+
+from src.core.batcher import BatchingEncoder, DynamicBatcher
+from src.core.embeddings import HashingEmbedder
+from src.core.llm_client import FakeLLMBackend
+from src.core.rag_system import SimpleRAG
+
+
+def _concurrently(n, fn):
+    barrier = threading.Barrier(n)
+    results = [None] * n
+
+    def run(i):
+        barrier.wait()
+        results[i] = fn(i)
+
+    threads = [threading.Thread(target=run, args=(i,)) for i in range(n)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    return results
+
+
+def test_concurrent_items_share_a_batch_and_get_their_own_result():
+    calls = []
+
+    def square(items):
+        calls.append(len(items))
+        return [x * x for x in items]
+
+    batcher = DynamicBatcher(square, max_batch=64, max_wait_ms=50)
+    assert _concurrently(16, batcher.submit) == [i * i for i in range(16)]
+    assert sum(calls) == 16 and len(calls) < 16
+    assert batcher.stats()["max_batch_seen"] > 1
+
+
+def test_max_batch_closes_a_batch_early():
+    calls = []
+
+    def identity(items):
+        calls.append(len(items))
+        return items
+
+    # the window would be 5s; only the size limit can close these batches
+    batcher = DynamicBatcher(identity, max_batch=4, max_wait_ms=5000)
+    assert _concurrently(8, batcher.submit) == list(range(8))
+    assert max(calls) <= 4
+
+
+def test_errors_propagate_to_every_caller_in_the_batch():
+    def boom(items):
+        raise ValueError("encoder failed")
+
+    batcher = DynamicBatcher(boom, max_wait_ms=20)
+    errors = _concurrently(4, lambda i: pytest.raises(ValueError, batcher.submit, i))
+    assert all("encoder failed" in str(e.value) for e in errors)
+
+
+def test_batching_encoder_matches_model():
+    model = HashingEmbedder()
+    encoder = BatchingEncoder(model, max_wait_ms=20)
+    queries = [f"what is article {i} about" for i in range(8)]
+    vectors = _concurrently(8, lambda i: encoder.encode(queries[i]))
+    assert np.allclose(np.stack(vectors), model.encode(queries))
+    # lists are already batches and bypass the batcher
+    assert np.allclose(encoder.encode(queries), model.encode(queries))
+    assert encoder.batcher.stats()["items"] == 8
+
+
+def test_rag_query_batching_is_configurable(tmp_path, monkeypatch):
+    rag = SimpleRAG(persist_directory=str(tmp_path), preload_topics=False,
+                    embedding_model=HashingEmbedder(), llm=FakeLLMBackend())
+    assert isinstance(rag.query_encoder, BatchingEncoder)
+    assert np.allclose(rag.embed_query("hello"), HashingEmbedder().encode("hello"))
+
+    monkeypatch.setenv("QUERY_BATCH_WAIT_MS", "0")
+    rag = SimpleRAG(persist_directory=str(tmp_path), preload_topics=False,
+                    embedding_model=HashingEmbedder(), llm=FakeLLMBackend())
+    assert rag.query_encoder is rag.embedding_model
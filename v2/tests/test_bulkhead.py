@@ -0,0 +1,128 @@
+"""
+Test bulkheaded execution pools: bounded queues, rejection and isolation of fast endpoints
+"""
+
+import sys
+sys.path.append('.')
+
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from src.core.bulkhead import Bulkhead, BulkheadFullError, bulkheads_from_env
+
+
+def test_pool_rejects_beyond_workers_plus_queue():
+    pool = Bulkhead("generation", max_workers=1, max_queue=1)
+    release = threading.Event()
+    running = pool.submit(release.wait, 5)
+    queued = pool.submit(lambda: "queued")
+    with pytest.raises(BulkheadFullError):
+        pool.submit(lambda: "rejected")
+    assert pool.full()
+    stats = pool.stats()
+    assert (stats["active"], stats["queued"], stats["rejected"]) == (1, 1, 1)
+
+    release.set()
+    assert running.result(5) is True and queued.result(5) == "queued"
+    assert pool.stats()["completed"] == 2 and not pool.full()
+
+
+def test_pool_sizes_come_from_env(monkeypatch):
+    monkeypatch.setenv("BULKHEAD_GENERATION_WORKERS", "3")
+    pools = bulkheads_from_env({"generation": (8, 8), "light": (2, 32)})
+    assert (pools["generation"].max_workers, pools["generation"].max_queue) == (3, 8)
+    assert (pools["light"].max_workers, pools["light"].max_queue) == (2, 32)
+
+
+def test_slow_generation_does_not_block_fast_endpoints(monkeypatch):
+    from src.api.app import create_app
+    from src.api.routes import chat
+
+    release = threading.Event()
+
+    class SlowGenerationRAG:
+        def generate_answer(self, query, topic, difficulty, deadline=None):
+            release.wait(10)
+            return f"answer to {query}\n\n📚 Sources: crc.txt"
+
+        def retrieve(self, query, topic, n_results=6, deadline=None):
+            return {"documents": [["The CRC ..."]], "metadatas": [[{"source": "crc.txt"}]], "distances": [[0.4]]}
+
+    monkeypatch.setattr(chat, "rag_system", SlowGenerationRAG())
+    monkeypatch.setattr(chat, "bulkheads", bulkheads_from_env({
+        "retrieval": (2, 4), "generation": (2, 2), "light": (1, 8)}))
+    app = create_app(warmup=False)
+
+    def ask(i):
+        with app.test_client() as client:
+            return client.post('/api/chat', json={'query': f'question {i}', 'topic': 'childrens_rights'})
+
+    with ThreadPoolExecutor(max_workers=8) as pool:
+        chats = [pool.submit(ask, i) for i in range(4)]
+        deadline = time.monotonic() + 5
+        while chat.bulkheads["generation"].stats()["active"] < 2 and time.monotonic() < deadline:
+            time.sleep(0.01)
+
+        with app.test_client() as client:
+            # generation is saturated: more chats are turned away at once...
+            busy = client.post('/api/chat', json={'query': 'one more', 'topic': 'childrens_rights'})
+            assert busy.status_code == 503 and busy.get_json()['pool'] == 'generation'
+            assert busy.headers['Retry-After'] == '1'
+            # ...while retrieval and light endpoints still answer immediately
+            start = time.perf_counter()
+            found = client.post('/api/retrieve', json={'query': 'What is the CRC?', 'topic': 'childrens_rights'})
+            topics = client.get('/api/topics')
+            assert time.perf_counter() - start < 1
+            assert found.status_code == 200 and found.get_json()['results'][0]['source'] == 'crc.txt'
+            assert topics.status_code == 200
+
+        release.set()
+        assert [f.result(10).status_code for f in chats] == [200] * 4
+
+    with app.test_client() as client:
+        stats = client.get('/api/stats').get_json()['bulkheads']
+    assert stats['generation']['rejected'] == 1 and stats['generation']['completed'] == 4
+    assert stats['retrieval']['completed'] == 1
+
+
+def test_stream_reports_busy_when_the_pool_fills_after_the_check(monkeypatch):
+    from src.api.app import create_app
+    from src.api.routes import chat
+
+    class RAG:
+        def generate_answer(self, query, topic, difficulty, deadline=None):
+            return f"answer to {query}\n\n📚 Sources: crc.txt"
+
+    monkeypatch.setattr(chat, "rag_system", RAG())
+    monkeypatch.setattr(chat, "bulkheads", bulkheads_from_env({"generation": (1, 0), "light": (1, 8)}))
+    release = threading.Event()
+    chat.bulkheads["generation"].submit(release.wait, 5)
+    # the early check ran while a slot was still free
+    monkeypatch.setattr(chat.bulkheads["generation"], "full", lambda: False)
+    app = create_app(warmup=False)
+    try:
+        with app.test_client() as client:
+            resp = client.post('/api/chat/stream', json={'query': 'q', 'topic': 'childrens_rights'})
+            body = resp.get_data(as_text=True)
+    finally:
+        release.set()
+    assert resp.status_code == 200
+    assert 'event: busy' in body and '"pool": "generation"' in body and '"retry_after_s": 1' in body
+    assert 'Internal server error' not in body
+
+
+def test_stream_returns_json_500_when_the_rag_system_cannot_be_built(monkeypatch):
+    from src.api.app import create_app
+    from src.api.routes import chat
+
+    def broken():
+        raise RuntimeError("index missing")
+
+    monkeypatch.setattr(chat, "get_rag_system", broken)
+    app = create_app(warmup=False)
+    with app.test_client() as client:
+        resp = client.post('/api/chat/stream', json={'query': 'q', 'topic': 'childrens_rights'})
+    assert resp.status_code == 500 and 'index missing' in resp.get_json()['error']
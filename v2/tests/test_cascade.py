@@ -0,0 +1,127 @@
+"""
+Test the latency-budgeted model cascade against local fake backends
+"""
+
+import sys
+sys.path.append('.')
+
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from src.core.cascade import CascadeRule, ModelCascade
+from src.core.embeddings import HashingEmbedder
+from src.core.llm_client import FakeLLMBackend, LLMClient
+from src.core.rag_system import SimpleRAG
+
+
+def make_cascade(full_latency: float, race: bool = False, budget: float = 0.1) -> ModelCascade:
+    full = LLMClient(FakeLLMBackend(answer="full answer", base_latency_s=full_latency, model_name="full"), timeout_s=2.0)
+    fast = LLMClient(FakeLLMBackend(answer="fast answer", model_name="fast"), timeout_s=2.0)
+    return ModelCascade(
+        clients={"full": full, "fast": fast},
+        default="full",
+        rules=[CascadeRule(model="fast", difficulties=("beginner",)),
+               CascadeRule(model="fast", max_prompt_tokens=50)],
+        fallback="fast",
+        latency_budget_s=budget,
+        race=race,
+    )
+
+
+def test_rules_route_by_difficulty_and_prompt_size():
+    cascade = make_cascade(full_latency=0.0)
+    assert cascade.choose("beginner", 900) == "fast"
+    assert cascade.choose("advanced", 40) == "fast"
+    assert cascade.choose("advanced", 900) == "full"
+    assert cascade.generate("q", difficulty="advanced", prompt_tokens=900) == ("full answer", "full")
+
+
+def test_falls_back_when_primary_runs_over_budget():
+    cascade = make_cascade(full_latency=1.0)
+    start = time.monotonic()
+    assert cascade.generate("q", difficulty="advanced", prompt_tokens=900) == ("fast answer", "fast")
+    assert time.monotonic() - start < 0.5
+    stats = cascade.stats()
+    assert stats["full"]["failovers"] == 1 and stats["fast"]["calls"] == 1
+
+
+def test_race_mode_returns_first_answer_after_budget():
+    cascade = make_cascade(full_latency=1.0, race=True)
+    start = time.monotonic()
+    assert cascade.generate("q", difficulty="advanced", prompt_tokens=900) == ("fast answer", "fast")
+    assert time.monotonic() - start < 0.5
+
+
+def test_race_mode_keeps_the_request_trace():
+    from src.core import tracing
+
+    cascade = make_cascade(full_latency=0.3, race=True)
+    trace = tracing.Trace("req-1", detailed=True)
+    tokens = tracing.start_trace(trace)
+    try:
+        span = tracing.open_span("llm")
+        assert cascade.generate("q", difficulty="advanced", prompt_tokens=900) == ("fast answer", "fast")
+        tracing.close_span(span)
+    finally:
+        tracing.end_trace(tokens)
+    # annotated by LLMClient.generate on the cascade's threads
+    llm = trace.root.children[0]
+    assert llm.attrs["attempts"] == 1 and llm.attrs["model"] in ("fast", "full")
+
+
+def test_simple_rag_records_model_used(tmp_path):
+    rag = SimpleRAG(persist_directory=str(tmp_path), preload_topics=False,
+                    embedding_model=HashingEmbedder(), cascade=make_cascade(full_latency=0.0),
+                    llm=FakeLLMBackend())
+    rag.load_documents_for_topic("childrens_rights")
+    answer = rag.generate_answer("What is the CRC?", "childrens_rights", "beginner")
+    assert answer.startswith("fast answer")
+    assert answer.prompt_stats["model"] == "fast"
+
+
+def test_concurrent_requests_route_on_their_own_prompt_size(tmp_path):
+    rag = SimpleRAG(persist_directory=str(tmp_path), preload_topics=False,
+                    embedding_model=HashingEmbedder(), llm=FakeLLMBackend())
+    rag.load_documents_for_topic("childrens_rights")
+    small, large = ("What is the CRC?", "beginner"), ("What is the CRC? " * 40, "advanced")
+    sizes = [rag.generate_answer(q, "childrens_rights", d).prompt_stats["prompt_tokens_after"] for q, d in (small, large)]
+    assert sizes[0] < sizes[1]
+
+    # route by prompt size only: small prompts to "fast", large ones to "full"
+    cascade = make_cascade(full_latency=0.02, budget=5.0)
+    cascade.rules = [CascadeRule(model="fast", max_prompt_tokens=sum(sizes) // 2)]
+    rag.cascade = cascade
+    barrier = threading.Barrier(16)
+
+    def ask(i):
+        query, difficulty = (small, large)[i % 2]
+        barrier.wait()
+        return i % 2, rag.generate_answer(query, "childrens_rights", difficulty)
+
+    with ThreadPoolExecutor(max_workers=16) as pool:
+        answers = list(pool.map(ask, range(16)))
+    assert all(answer.prompt_stats["model"] == ("fast", "full")[kind] for kind, answer in answers)
+
+
+def test_cascade_without_llm_skips_gemini_and_is_exported(tmp_path, monkeypatch):
+    from src.api.app import create_app
+    from src.api.routes import chat
+
+    def no_gemini(model_name):
+        raise AssertionError("Gemini must not be set up when a cascade is given")
+
+    monkeypatch.setattr(SimpleRAG, "_gemini_backend", staticmethod(no_gemini))
+    rag = SimpleRAG(persist_directory=str(tmp_path), preload_topics=False,
+                    embedding_model=HashingEmbedder(), cascade=make_cascade(full_latency=0.0))
+    assert rag.llm is rag.cascade.clients["full"]
+    rag.load_documents_for_topic("childrens_rights")
+    monkeypatch.setattr(chat, "rag_system", rag)
+    with create_app(warmup=False).test_client() as client:
+        assert client.post('/api/chat', json={'query': 'What is the CRC?', 'topic': 'childrens_rights',
+                                              'difficulty': 'beginner'}).status_code == 200
+        stats = client.get('/api/stats').get_json()['cascade']
+        text = client.get('/api/metrics').get_data(as_text=True)
+    assert stats["fast"]["calls"] == 1 and stats["full"].get("calls", 0) == 0
+    assert 'rag_llm_cascade{model="fast",field="calls"' in text
+    assert 'rag_llm_client{model="fast",field="calls"' in text
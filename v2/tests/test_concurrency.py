@@ -0,0 +1,110 @@
+"""
+Stress tests for concurrent first requests (singleton creation, lazy topic loads)
+"""
+
+import sys
+sys.path.append('.')
+
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from src.core.bulkhead import Bulkhead
+from src.core.embeddings import HashingEmbedder
+from src.core.llm_client import FakeLLMBackend
+from src.core.rag_system import SimpleRAG
+
+CONCURRENCY = 300
+
+
+def test_concurrent_first_requests_build_one_rag_system(monkeypatch):
+    from src.api.app import create_app
+    from src.api.routes import chat
+
+    built = []
+
+    class SlowToBuildRAG:
+        def __init__(self, preload_topics=True, **kwargs):
+            built.append(self)
+            time.sleep(0.2)  # model load + ingestion
+
+        def generate_answer(self, query, topic, difficulty, deadline=None):
+            return f"answer to {query}\n\n📚 Sources: crc.txt"
+
+    monkeypatch.setattr(chat, "SimpleRAG", SlowToBuildRAG)
+    monkeypatch.setattr(chat, "rag_system", None)
+    # admission control is not under test: let every request through to generation
+    monkeypatch.setitem(chat.bulkheads, "generation", Bulkhead("generation", 8, CONCURRENCY))
+    monkeypatch.setattr(chat, "rate_limiter", None)
+    app = create_app()
+    barrier = threading.Barrier(CONCURRENCY)
+
+    def first_request(i):
+        barrier.wait()
+        with app.test_client() as client:
+            # distinct queries: no coalescing, every request needs the singleton
+            return client.post('/api/chat', json={'query': f'question {i}', 'topic': 'childrens_rights'}).status_code
+
+    with ThreadPoolExecutor(max_workers=CONCURRENCY) as pool:
+        statuses = list(pool.map(first_request, range(CONCURRENCY)))
+
+    assert statuses == [200] * CONCURRENCY
+    assert len(built) == 1
+
+
+def test_concurrent_queries_load_an_unloaded_topic_once(tmp_path):
+    rag = SimpleRAG(persist_directory=str(tmp_path), preload_topics=False,
+                    embedding_model=HashingEmbedder(), llm=FakeLLMBackend())
+    loads = []
+    original = rag.load_documents_for_topic
+
+    def counting_load(topic, *args, **kwargs):
+        loads.append(topic)
+        return original(topic, *args, **kwargs)
+
+    rag.load_documents_for_topic = counting_load
+    barrier = threading.Barrier(CONCURRENCY)
+
+    def query(_):
+        barrier.wait()
+        results = rag.retrieve("What is CEDAW?", "womens_rights", n_results=3)
+        return len(results["documents"][0])
+
+    with ThreadPoolExecutor(max_workers=CONCURRENCY) as pool:
+        counts = list(pool.map(query, range(CONCURRENCY)))
+
+    assert loads == ["womens_rights"]
+    # nobody queried a half-ingested collection
+    assert counts == [3] * CONCURRENCY
+
+
+def test_concurrent_answers_keep_their_own_prompt_stats(tmp_path):
+    from src.core.context import count_tokens
+    from src.core.prompts import DIFFICULTIES, get_prompt
+
+    rag = SimpleRAG(persist_directory=str(tmp_path), preload_topics=False,
+                    embedding_model=HashingEmbedder(), llm=FakeLLMBackend(base_latency_s=0.05))
+    rag.load_documents_for_topic("childrens_rights")
+    barrier = threading.Barrier(24)
+
+    def ask(i):
+        difficulty = DIFFICULTIES[i % len(DIFFICULTIES)]
+        barrier.wait()
+        return difficulty, rag.generate_answer("What is the CRC?", "childrens_rights", difficulty)
+
+    with ThreadPoolExecutor(max_workers=24) as pool:
+        answers = list(pool.map(ask, range(24)))
+
+    # each request sees the prefix of its own difficulty, not a neighbour's
+    for difficulty, answer in answers:
+        assert answer.prompt_stats["prefix_tokens"] == count_tokens(get_prompt(difficulty).prefix)
+        assert answer.prompt_stats["model"] == "fake-llm"
+
+
+def test_answers_do_not_share_a_default_prompt_stats_dict():
+    from src.core.rag_system import Answer
+
+    first, second = Answer("a"), Answer("b")
+    assert first.prompt_stats is None and second.prompt_stats is None
+    first.prompt_stats = {"model": "fast"}
+    assert second.prompt_stats is None and Answer.prompt_stats is None
@@ -0,0 +1,95 @@
+"""
+Test context selection (MMR) and sentence-aware trimming
+"""
+
+import sys
+sys.path.append('.')
+
+import numpy as np
+
+from src.core.context import mmr_select, split_sentences, trim_to_sentences
+
+
+def test_mmr_skips_near_duplicate_passages():
+    query = np.array([1.0, 0.0, 0.0])
+    cands = np.array([
+        [0.95, 0.30, 0.0],   # most relevant
+        [0.95, 0.31, 0.0],   # near copy of the first
+        [0.80, 0.0, 0.60],   # a bit less relevant, different content
+    ])
+    assert mmr_select(query, cands, k=2, lambda_mult=0.5) == [0, 2]
+
+
+def test_mmr_pure_relevance_matches_similarity_order():
+    rng = np.random.default_rng(1)
+    query = rng.standard_normal(16)
+    cands = rng.standard_normal((10, 16))
+    sims = (cands / np.linalg.norm(cands, axis=1, keepdims=True)) @ (query / np.linalg.norm(query))
+    assert mmr_select(query, cands, k=4, lambda_mult=1.0) == list(np.argsort(-sims)[:4])
+
+
+def test_mmr_handles_small_pools():
+    assert mmr_select([1.0, 0.0], [], k=3) == []
+    assert mmr_select([1.0, 0.0], [[0.0, 1.0]], k=3) == [0]
+
+
+def test_trim_stops_at_sentence_boundary():
+    text = "Everyone has the right to life. Everyone has the right to liberty. No one shall be held in slavery."
+    trimmed = trim_to_sentences(text, 70)
+    assert trimmed == "Everyone has the right to life. Everyone has the right to liberty."
+    assert split_sentences(trimmed)[-1].endswith(".")
+
+
+def test_pack_context_respects_budget_and_labels_sources():
+    from src.core.context import count_tokens, pack_context
+    from src.core.embeddings import HashingEmbedder
+
+    embedder = HashingEmbedder(dim=64)
+    passages = [
+        "Children have the right to education. The weather in Geneva is mild in spring. "
+        "Primary education shall be compulsory and available free to all.",
+        "Every child has the right to play and leisure. Meetings are held twice a year in New York.",
+    ]
+    query = "What is the right to education for children?"
+    packed = pack_context(
+        query, embedder.encode(query), passages, embedder.encode(passages),
+        ["crc.txt", "guide.txt"], encode=embedder.encode, budget_tokens=40,
+    )
+    assert packed.tokens <= 40
+    assert packed.text.startswith("[Source: crc.txt]")
+    assert "right to education" in packed.text
+    assert "weather" not in packed.text
+
+
+def test_pack_context_counts_labels_against_the_budget():
+    from src.core.context import pack_context
+    from src.core.embeddings import HashingEmbedder
+
+    embedder = HashingEmbedder(dim=64)
+    passages = [f"Article {i} protects the right of every child to education and to rest." for i in range(8)]
+    sources = [f"a_rather_long_source_document_name_{i}.txt" for i in range(8)]
+    query = "right of every child to education"
+    for budget in (20, 40, 60, 100):
+        packed = pack_context(query, embedder.encode(query), passages, embedder.encode(passages), sources,
+                              encode=embedder.encode, budget_tokens=budget)
+        assert packed.tokens <= budget
+        assert packed.text.count("[Source: ") == len(packed.sources)
+
+
+def test_packing_never_grows_the_prompt(tmp_path):
+    from src.core.embeddings import HashingEmbedder
+    from src.core.llm_client import FakeLLMBackend
+    from src.core.rag_system import SimpleRAG
+
+    rag = SimpleRAG(persist_directory=str(tmp_path), preload_topics=False,
+                    embedding_model=HashingEmbedder(), llm=FakeLLMBackend())
+    rag.load_documents_for_topic("childrens_rights")
+    for difficulty in ("beginner", "intermediate", "advanced"):
+        stats = rag.generate_answer("What is the CRC?", "childrens_rights", difficulty).prompt_stats
+        assert stats["prompt_tokens_after"] <= stats["prompt_tokens_before"]
+
+    # passages that already fit the budget are sent as they are, without re-encoding sentences
+    rag.context_token_budget = {"beginner": 10 ** 6, "intermediate": 10 ** 6, "advanced": 10 ** 6}
+    stats = rag.generate_answer("What is the CRC?", "childrens_rights", "advanced").prompt_stats
+    assert stats["context_sentences"] is None
+    assert stats["prompt_tokens_after"] == stats["prompt_tokens_before"]
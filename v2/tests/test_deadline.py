@@ -0,0 +1,84 @@
+"""
+Test per-request deadlines and the degraded extractive answer when the LLM is too slow
+"""
+
+import sys
+sys.path.append('.')
+
+import time
+
+import pytest
+
+from src.core.embeddings import HashingEmbedder
+from src.core.llm_client import FakeLLMBackend
+from src.core.rag_system import SimpleRAG
+
+
+def _rag(tmp_path, llm):
+    rag = SimpleRAG(persist_directory=str(tmp_path), preload_topics=False,
+                    embedding_model=HashingEmbedder(), llm=llm)
+    rag.load_documents_for_topic("childrens_rights")
+    return rag
+
+
+def test_slow_llm_degrades_to_extractive_answer_by_the_deadline(tmp_path):
+    rag = _rag(tmp_path, FakeLLMBackend(base_latency_s=5.0))
+    start = time.perf_counter()
+    answer = rag.generate_answer("What rights does the CRC protect?", "childrens_rights",
+                                 deadline=time.monotonic() + 0.8)
+    assert time.perf_counter() - start < 2
+    assert answer.degraded
+    assert "[Source:" in answer and "📚 Sources:" in answer
+
+
+def test_answer_within_deadline_is_not_degraded(tmp_path):
+    llm = FakeLLMBackend(answer="The CRC protects children.")
+    answer = _rag(tmp_path, llm).generate_answer("What is the CRC?", "childrens_rights",
+                                                 deadline=time.monotonic() + 5)
+    assert not answer.degraded and answer.startswith("The CRC protects children.")
+
+
+def test_spent_deadline_skips_the_llm(tmp_path):
+    llm = FakeLLMBackend()
+    rag = _rag(tmp_path, llm)
+    answer = rag.generate_answer("What is the CRC?", "childrens_rights", deadline=time.monotonic())
+    assert answer.degraded and llm.calls == 0
+
+
+@pytest.mark.parametrize("compress", [True, False])
+def test_extractive_answer_without_packed_context(tmp_path, monkeypatch, compress):
+    rag = _rag(tmp_path, FakeLLMBackend())
+    monkeypatch.setattr(rag, "compress_context", compress)
+    answer = rag.generate_answer("What is the CRC?", "childrens_rights", deadline=time.monotonic())
+    assert answer.degraded and "most relevant passages" in answer
+
+
+def test_deadline_header_reaches_generation(tmp_path, monkeypatch):
+    from src.api.app import create_app
+    from src.api.routes import chat
+
+    monkeypatch.setattr(chat, "rag_system", _rag(tmp_path, FakeLLMBackend(base_latency_s=5.0)))
+    app = create_app(warmup=False)
+    with app.test_client() as client:
+        start = time.perf_counter()
+        resp = client.post('/api/chat', json={'query': 'What is the CRC?', 'topic': 'childrens_rights'},
+                           headers={'X-Deadline-Ms': '800'})
+        elapsed = time.perf_counter() - start
+    body = resp.get_json()
+    assert resp.status_code == 200 and body['degraded'] is True and body['sources']
+    assert elapsed < 2
+
+
+@pytest.mark.parametrize("header", ["0", "-250"])
+def test_non_positive_deadline_header_is_already_spent(tmp_path, monkeypatch, header):
+    from src.api.app import create_app
+    from src.api.routes import chat
+
+    llm = FakeLLMBackend()
+    monkeypatch.setattr(chat, "rag_system", _rag(tmp_path, llm))
+    app = create_app(warmup=False)
+    with app.test_client() as client:
+        resp = client.post('/api/chat', json={'query': 'What is the CRC?', 'topic': 'childrens_rights'},
+                           headers={'X-Deadline-Ms': header})
+    assert resp.status_code == 200 and resp.get_json()['degraded'] is True
+    assert llm.calls == 0
@@ -0,0 +1,114 @@
+"""
+Test near-duplicate chunk detection used at ingestion
+"""
+
+import sys
+sys.path.append('.')
+
+from src.core.dedup import MinHasher, NearDuplicateIndex
+
+ARTICLE_1 = (
+    "All human beings are born free and equal in dignity and rights. They are "
+    "endowed with reason and conscience and should act towards one another in a "
+    "spirit of brotherhood. Everyone is entitled to all the rights and freedoms "
+    "set forth in this Declaration, without distinction of any kind, such as race, "
+    "colour, sex, language, religion, political or other opinion."
+)
+
+
+def test_identical_text_has_identical_signature():
+    hasher = MinHasher()
+    assert (hasher.signature(ARTICLE_1) == hasher.signature(ARTICLE_1.upper())).all()
+
+
+def test_near_duplicate_maps_to_canonical():
+    index = NearDuplicateIndex(threshold=0.8)
+    assert index.add("booklet", ARTICLE_1) is None
+
+    # same article re-extracted from another PDF: whitespace and punctuation differ
+    copy = ARTICLE_1.replace(". ", ".\n").replace(",", " ,")
+    assert index.add("toolkit", copy) == "booklet"
+    assert len(index) == 1
+
+
+def test_distinct_text_is_kept():
+    index = NearDuplicateIndex(threshold=0.8)
+    index.add("udhr", ARTICLE_1)
+    other = (
+        "States Parties shall take all appropriate measures to eliminate "
+        "discrimination against women in the field of education in order to "
+        "ensure to them equal rights with men."
+    )
+    assert index.add("cedaw", other) is None
+    assert "cedaw" in index and len(index) == 2
+
+
+def test_partial_overlap_below_threshold_is_kept():
+    index = NearDuplicateIndex(threshold=0.85)
+    index.add("a", ARTICLE_1)
+    half = ARTICLE_1[: len(ARTICLE_1) // 2] + " The right to education is universal and free."
+    assert index.add("b", half) is None
+
+
+ARTICLE_2 = (
+    "No one shall be held in slavery or servitude; slavery and the slave trade "
+    "shall be prohibited in all their forms. No one shall be subjected to torture "
+    "or to cruel, inhuman or degrading treatment or punishment."
+)
+
+
+def _corpus(root):
+    """Two topics: the booklet and the toolkit both reproduce Article 1, and a women's rights handbook quotes it too"""
+    copy = ARTICLE_1.replace(". ", ".\n").replace(",", " ,")
+    for topic, files in {
+        "foundational_rights": {"booklet.txt": f"{ARTICLE_1}\n\n{ARTICLE_2}", "toolkit.txt": copy},
+        "womens_rights": {"handbook.txt": copy},
+    }.items():
+        (root / topic).mkdir(parents=True)
+        for name, text in files.items():
+            (root / topic / name).write_text(text, encoding="utf-8")
+    return root
+
+
+def _rag(tmp_path, **kwargs):
+    from src.core.embeddings import HashingEmbedder
+    from src.core.llm_client import FakeLLMBackend
+    from src.core.rag_system import SimpleRAG
+
+    return SimpleRAG(persist_directory=str(tmp_path / "index"), topics_dir=str(tmp_path / "corpus"),
+                     preload_topics=False, embedding_model=HashingEmbedder(), llm=FakeLLMBackend(), **kwargs)
+
+
+def test_ingestion_keeps_one_copy_and_records_alt_sources(tmp_path):
+    _corpus(tmp_path / "corpus")
+    rag = _rag(tmp_path)
+    assert rag.load_documents_for_topic("foundational_rights") == {"docs": 2, "chunks": 2, "skipped": 1}
+    stored = rag.collections["foundational_rights"].get(include=["metadatas"])
+    assert {m["source"] for m in stored["metadatas"]} == {"booklet.txt"}
+    article_1, article_2 = sorted(stored["metadatas"], key=lambda m: m["chunk_id"])
+    assert article_1["alt_sources"] == "toolkit.txt" and "alt_sources" not in article_2
+    # topics are deduplicated on their own by default
+    assert rag.load_documents_for_topic("womens_rights")["skipped"] == 0
+
+
+def test_cross_topic_dedup_points_to_the_other_topic(tmp_path):
+    _corpus(tmp_path / "corpus")
+    rag = _rag(tmp_path, dedup_across_topics=True)
+    rag.load_documents_for_topic("foundational_rights")
+    assert rag.load_documents_for_topic("womens_rights") == {"docs": 1, "chunks": 0, "skipped": 1}
+    article_1 = rag.collections["foundational_rights"].get(where={"chunk_id": 0}, include=["metadatas"])["metadatas"][0]
+    assert article_1["alt_sources"] == "toolkit.txt, womens_rights/handbook.txt"
+    # reloading a topic does not record its own chunks as copies of themselves
+    rag.load_documents_for_topic("foundational_rights")
+    article_1 = rag.collections["foundational_rights"].get(where={"chunk_id": 0}, include=["metadatas"])["metadatas"][0]
+    assert article_1["alt_sources"] == "toolkit.txt, womens_rights/handbook.txt"
+
+
+def test_reingest_deletes_copies_stored_before_dedup(tmp_path):
+    _corpus(tmp_path / "corpus")
+    assert _rag(tmp_path, dedup_chunks=False).load_documents_for_topic("foundational_rights")["chunks"] == 3
+    rag = _rag(tmp_path)
+    rag.load_documents_for_topic("foundational_rights")
+    stored = rag.collections["foundational_rights"].get(include=["metadatas"])
+    assert len(stored["ids"]) == 2
+    assert not any(i.startswith("toolkit_") for i in stored["ids"])
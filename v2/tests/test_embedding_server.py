@@ -0,0 +1,122 @@
+"""
+Test the shared embedding server: binary protocol, cross-client batching and SimpleRAG integration
+"""
+
+import sys
+sys.path.append('.')
+
+import os
+import tempfile
+import threading
+from pathlib import Path
+
+import numpy as np
+import pytest
+
+from src.core.embedding_server import EmbeddingClient, EmbeddingServer, EmbeddingServiceError
+from src.core.embeddings import HashingEmbedder
+from src.core.llm_client import FakeLLMBackend
+from src.core.rag_system import SimpleRAG
+
+
+@pytest.fixture
+def socket_path():
+    # AF_UNIX paths are limited to ~108 bytes; pytest's tmp_path can exceed that
+    with tempfile.TemporaryDirectory(prefix="emb") as tmp:
+        yield str(Path(tmp) / "embed.sock")
+
+
+def test_client_matches_local_model(socket_path):
+    model = HashingEmbedder()
+    server = EmbeddingServer(model, socket_path).start()
+    try:
+        client = EmbeddingClient(socket_path)
+        assert client.model_id == model.model_id
+        assert client.get_sentence_embedding_dimension() == 384
+
+        texts = ["What is the CRC?", "Right to education ✓", ""]
+        assert np.allclose(client.encode(texts), model.encode(texts))
+        assert np.allclose(client.encode("single query"), model.encode("single query"))
+        assert client.encode([]).shape == (0, 384)
+    finally:
+        server.close()
+
+
+def test_concurrent_requests_share_batches(socket_path):
+    server = EmbeddingServer(HashingEmbedder(), socket_path, max_wait_ms=20).start()
+    try:
+        client = EmbeddingClient(socket_path)
+        barrier = threading.Barrier(8)
+        results = {}
+
+        def worker(i):
+            barrier.wait()
+            results[i] = client.encode([f"question {i}"])[0]
+
+        threads = [threading.Thread(target=worker, args=(i,)) for i in range(8)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+
+        for i, vec in results.items():
+            assert np.allclose(vec, HashingEmbedder().encode(f"question {i}"))
+        stats = server.stats()
+        assert stats["requests"] == 8 and stats["batches"] < 8
+    finally:
+        server.close()
+
+
+def test_model_errors_reach_the_client(socket_path):
+    class Broken(HashingEmbedder):
+        def encode(self, sentences, **kwargs):
+            raise ValueError("model crashed")
+
+    server = EmbeddingServer(Broken(), socket_path).start()
+    try:
+        client = EmbeddingClient(socket_path)
+        with pytest.raises(EmbeddingServiceError, match="model crashed"):
+            client.encode(["anything"])
+    finally:
+        server.close()
+
+
+def test_rag_uses_embedding_socket(socket_path, tmp_path, monkeypatch):
+    server = EmbeddingServer(HashingEmbedder(), socket_path).start()
+    try:
+        monkeypatch.setenv("EMBEDDING_SOCKET", socket_path)
+        rag = SimpleRAG(persist_directory=str(tmp_path), preload_topics=False, llm=FakeLLMBackend())
+        assert isinstance(rag.embedding_model, EmbeddingClient)
+        assert rag.embedding_model_id == HashingEmbedder().model_id
+
+        assert rag.load_documents_for_topic("childrens_rights")["chunks"] > 0
+        assert rag.retrieve("What is the CRC?", "childrens_rights")["documents"][0]
+        assert server.stats()["texts"] > 1
+    finally:
+        server.close()
+
+
+def test_forked_workers_do_not_share_pooled_connections(socket_path):
+    model = HashingEmbedder()
+    server = EmbeddingServer(model, socket_path).start()
+    try:
+        client = EmbeddingClient(socket_path)  # pre-fork, like a preloaded gunicorn master
+        client.encode("warm the pool")
+        pids = []
+        for w in range(4):
+            pid = os.fork()
+            if pid == 0:
+                wrong = 0
+                try:
+                    for i in range(100):
+                        text = f"worker {w} question {i}"
+                        wrong += not np.allclose(client.encode(text), model.encode(text))
+                except Exception:
+                    wrong = 99
+                os._exit(min(wrong, 99))
+            pids.append(pid)
+        codes = [os.waitstatus_to_exitcode(os.waitpid(pid, 0)[1]) for pid in pids]
+        assert codes == [0, 0, 0, 0]
+        assert np.allclose(client.encode("parent still fine"), model.encode("parent still fine"))
+    finally:
+        server.close()
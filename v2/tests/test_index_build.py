@@ -0,0 +1,42 @@
+"""
+Test offline index building and read-only serving from the prebuilt index
+"""
+
+import sys
+sys.path.append('.')
+
+import pytest
+
+from scripts.build_index import build_index
+from src.core.embeddings import HashingEmbedder
+from src.core.index_manifest import IndexMismatchError, load_manifest
+from src.core.llm_client import FakeLLMBackend
+from src.core.rag_system import SimpleRAG
+
+
+def test_read_only_serves_prebuilt_index_without_ingesting(tmp_path):
+    manifest = build_index(tmp_path, topics=["childrens_rights"], embedding_model=HashingEmbedder())
+    assert manifest["topics"]["childrens_rights"]["chunks"] > 0
+    assert load_manifest(tmp_path)["embedding_model_id"] == HashingEmbedder().model_id
+
+    rag = SimpleRAG(persist_directory=str(tmp_path), read_only=True,
+                    embedding_model=HashingEmbedder(), llm=FakeLLMBackend())
+    assert rag.topics == ["childrens_rights"]
+    with pytest.raises(RuntimeError):
+        rag.load_documents_for_topic("childrens_rights")
+
+    answer = rag.generate_answer("What is the CRC?", "childrens_rights", "beginner")
+    assert "Sources:" in answer
+
+
+def test_read_only_refuses_index_from_other_model(tmp_path):
+    build_index(tmp_path, topics=["childrens_rights"], embedding_model=HashingEmbedder())
+    with pytest.raises(IndexMismatchError):
+        SimpleRAG(persist_directory=str(tmp_path), read_only=True,
+                  embedding_model=HashingEmbedder(model_id="other-model"), llm=FakeLLMBackend())
+
+
+def test_read_only_requires_manifest(tmp_path):
+    with pytest.raises(IndexMismatchError):
+        SimpleRAG(persist_directory=str(tmp_path), read_only=True,
+                  embedding_model=HashingEmbedder(), llm=FakeLLMBackend())
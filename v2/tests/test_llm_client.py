@@ -0,0 +1,104 @@
+"""
+Test the LLM client policy: deadlines, retries, hedging, circuit breaker
+"""
+
+import sys
+sys.path.append('.')
+
+import itertools
+import time
+
+import pytest
+
+from src.core.llm_client import (CircuitBreaker, CircuitOpenError, FakeLLMBackend, LLMClient, LLMError,
+                                 LLMTimeoutError)
+
+
+class ScriptedBackend(FakeLLMBackend):
+    """Fake whose per-call latency / failure follows a fixed script."""
+
+    def __init__(self, script):
+        super().__init__()
+        self._script = itertools.chain(script, itertools.repeat((0.0, False)))
+
+    def generate(self, suffix, prefix="", prefix_key=None, timeout=None):
+        with self._lock:
+            latency, fail = next(self._script)
+            self.calls += 1
+        time.sleep(latency)
+        if fail:
+            raise LLMError("scripted failure")
+        return self.answer
+
+
+def test_deadline_bounds_a_stalled_call():
+    client = LLMClient(FakeLLMBackend(base_latency_s=2.0), timeout_s=0.1, max_retries=0)
+    start = time.monotonic()
+    with pytest.raises(LLMTimeoutError):
+        client.generate("question")
+    assert time.monotonic() - start < 0.5
+
+
+def test_transient_failures_are_retried():
+    backend = ScriptedBackend([(0.0, True), (0.0, True)])
+    client = LLMClient(backend, max_retries=2, backoff_base_s=0.001, seed=1)
+    assert client.generate("question") == backend.answer
+    assert backend.calls == 3
+    assert client.stats()["retries"] == 2
+
+
+def test_gives_up_after_max_retries():
+    client = LLMClient(FakeLLMBackend(failure_rate=1.0), max_retries=1, backoff_base_s=0.001)
+    with pytest.raises(LLMError):
+        client.generate("question")
+
+
+def test_hedged_request_wins_over_slow_first_call():
+    backend = ScriptedBackend([(1.0, False), (0.0, False)])
+    client = LLMClient(backend, hedge=True, hedge_after_s=0.05, timeout_s=2.0)
+    start = time.monotonic()
+    assert client.generate("question") == backend.answer
+    assert time.monotonic() - start < 0.5
+    assert client.stats()["hedged"] == 1
+
+
+def test_circuit_opens_then_recovers():
+    breaker = CircuitBreaker(failure_threshold=2, reset_timeout_s=0.05)
+    backend = ScriptedBackend([(0.0, True), (0.0, True)])
+    client = LLMClient(backend, max_retries=0, breaker=breaker)
+    for _ in range(2):
+        with pytest.raises(LLMError):
+            client.generate("question")
+    with pytest.raises(CircuitOpenError):
+        client.generate("question")
+    assert backend.calls == 2
+
+    time.sleep(0.06)
+    assert client.generate("question") == backend.answer
+    assert breaker.state == "closed"
+
+
+def test_caller_deadline_does_not_open_the_circuit():
+    breaker = CircuitBreaker(failure_threshold=2, reset_timeout_s=60)
+    client = LLMClient(FakeLLMBackend(base_latency_s=0.2), timeout_s=5.0, max_retries=0, breaker=breaker)
+    for _ in range(5):
+        with pytest.raises(LLMTimeoutError):
+            client.generate("question", deadline=time.monotonic() + 0.02)
+    assert breaker.state == "closed"
+    assert client.stats()["deadline_exceeded"] == 5
+
+    # the client's own timeout still counts against the backend
+    client.timeout_s = 0.02
+    for _ in range(2):
+        with pytest.raises(LLMTimeoutError):
+            client.generate("question")
+    assert breaker.state == "open"
+
+
+def test_abandoned_half_open_trial_releases_the_circuit():
+    breaker = CircuitBreaker(failure_threshold=1, reset_timeout_s=0.01)
+    breaker.record_failure()
+    time.sleep(0.02)
+    assert breaker.allow() and breaker.state == "half_open"
+    breaker.record_abandoned()
+    assert breaker.allow()
@@ -0,0 +1,50 @@
+"""
+Test the offline load-test suite: report shape, Server-Timing stages and baseline comparison
+"""
+
+import sys
+sys.path.append('.')
+
+import copy
+
+from scripts import loadtest
+
+
+def test_parse_server_timing():
+    assert loadtest.parse_server_timing("embed_query;dur=4.1, llm;dur=812.0, junk, total;dur=x") == \
+        {"embed_query": 4.1, "llm": 812.0}
+
+
+def test_small_run_reports_throughput_and_stage_percentiles(monkeypatch):
+    from src.api.routes import chat
+
+    # run() swaps these module globals for the bench; restore them afterwards
+    monkeypatch.setattr(chat, "rag_system", chat.rag_system)
+    monkeypatch.setattr(chat, "rate_limiter", chat.rate_limiter)
+    report = loadtest.run(["chat", "retrieve", "ingest"], [1, 2], 6,
+                          {"base_latency_s": 0.005, "tail_latency_s": 0.05, "tail_rate": 0.2, "seed": 1},
+                          ingest_rounds=1)
+
+    assert set(report["results"]) == {"chat@1", "chat@2", "retrieve@1", "retrieve@2", "ingest@1", "ingest@2"}
+    chat_result = report["results"]["chat@2"]
+    assert chat_result["ok"] == chat_result["requests"] == 6 and chat_result["throughput_rps"] > 0
+    assert set(chat_result["latency_ms"]) == {"p50", "p95", "p99"}
+    assert {"embed_query", "vector_query", "llm", "total"} <= set(chat_result["stages_ms"])
+    assert "vector_query" in report["results"]["retrieve@1"]["stages_ms"]
+    assert report["results"]["ingest@2"]["chunks_per_s"] > 0
+
+
+def test_compare_fails_on_regressions_only():
+    base = {"results": {"chat@4": {"requests": 10, "ok": 10, "status": {"200": 10}, "throughput_rps": 50.0,
+                                   "latency_ms": {"p50": 40.0, "p95": 80.0, "p99": 100.0}}}}
+    assert loadtest.compare(copy.deepcopy(base), base) == []
+
+    noisy = copy.deepcopy(base)
+    noisy["results"]["chat@4"]["latency_ms"]["p99"] = 103.0  # within tolerance
+    assert loadtest.compare(noisy, base) == []
+
+    slower = copy.deepcopy(base)
+    slower["results"]["chat@4"].update(throughput_rps=30.0, ok=9, status={"200": 9, "503": 1})
+    slower["results"]["chat@4"]["latency_ms"]["p99"] = 250.0
+    problems = loadtest.compare(slower, base)
+    assert len(problems) == 3 and any("p99" in p for p in problems)
@@ -0,0 +1,141 @@
+"""
+Test stage instrumentation and the Prometheus /api/metrics endpoint
+"""
+
+import sys
+sys.path.append('.')
+
+import os
+import re
+import time
+
+from src.core import metrics
+from src.core.embeddings import HashingEmbedder
+from src.core.llm_client import FakeLLMBackend
+from src.core.metrics import Registry
+from src.core.rag_system import SimpleRAG
+
+
+def test_histogram_renders_cumulative_buckets():
+    registry = Registry()
+    latency = registry.histogram("demo_seconds", "Demo latency", ["stage"], buckets=(0.1, 1.0))
+    hits = registry.counter("demo_hits", "Demo hits", ["cache"])
+    for value in (0.05, 0.5, 5.0):
+        latency.observe(value, stage="llm")
+    hits.inc(cache='say "hi"')
+
+    text = registry.render()
+    assert "# TYPE demo_seconds histogram" in text
+    assert re.search(r'demo_seconds_bucket\{stage="llm",le="0.1"\} 1\n', text)
+    assert re.search(r'demo_seconds_bucket\{stage="llm",le="1"\} 2\n', text)
+    assert re.search(r'demo_seconds_bucket\{stage="llm",le="\+Inf"\} 3\n', text)
+    assert re.search(r'demo_seconds_sum\{stage="llm"\} 5.55\n', text)
+    assert re.search(r'demo_hits_total\{cache="say \\"hi\\""\} 1\n', text)
+
+
+def test_metric_types_must_implement_merge_and_samples():
+    import pytest
+
+    class Gauge(metrics._Metric):
+        type = "gauge"
+
+        def samples(self, children=None):
+            return []
+
+    with pytest.raises(TypeError):
+        Gauge("demo_gauge", "Demo gauge")
+    assert metrics.Counter("demo_total", "Demo").samples() is not None
+
+
+def test_recording_a_stage_is_cheap():
+    n = 20000
+    start = time.perf_counter()
+    for _ in range(n):
+        with metrics.stage("overhead_probe"):
+            pass
+    assert (time.perf_counter() - start) / n < 50e-6
+
+
+def test_generate_answer_records_every_stage(tmp_path):
+    rag = SimpleRAG(persist_directory=str(tmp_path), preload_topics=False,
+                    embedding_model=HashingEmbedder(), llm=FakeLLMBackend())
+    rag.load_documents_for_topic("childrens_rights")
+    stages = ("embed_query", "vector_query", "rerank", "context", "prompt_build", "llm", "postprocess")
+    before = {s: metrics.STAGE_SECONDS.count(stage=s) for s in stages}
+    answers = metrics.ANSWERS.value(topic="childrens_rights", difficulty="beginner", outcome="ok")
+
+    rag.generate_answer("What is the CRC?", "childrens_rights", "beginner")
+
+    assert all(metrics.STAGE_SECONDS.count(stage=s) == before[s] + 1 for s in stages)
+    assert metrics.ANSWERS.value(topic="childrens_rights", difficulty="beginner", outcome="ok") == answers + 1
+    assert metrics.PROMPT_TOKENS.count(difficulty="beginner") >= 1
+    assert metrics.CACHE.value(cache="prompt_prefix", result="hit") >= 1
+
+
+def test_metrics_endpoint_exposes_stages_and_pools(tmp_path, monkeypatch):
+    from src.api.app import create_app
+    from src.api.routes import chat
+
+    rag = SimpleRAG(persist_directory=str(tmp_path), preload_topics=False,
+                    embedding_model=HashingEmbedder(), llm=FakeLLMBackend())
+    rag.load_documents_for_topic("childrens_rights")
+    monkeypatch.setattr(chat, "rag_system", rag)
+    app = create_app(warmup=False)
+    with app.test_client() as client:
+        assert client.post('/api/chat', json={'query': 'What is the CRC?', 'topic': 'childrens_rights'}).status_code == 200
+        resp = client.get('/api/metrics')
+    text = resp.get_data(as_text=True)
+    assert resp.status_code == 200 and resp.mimetype == 'text/plain'
+    assert 'rag_stage_seconds_bucket{stage="llm"' in text
+    assert 'rag_answers_total{topic="childrens_rights",difficulty="intermediate",outcome="ok"' in text
+    assert 'rag_bulkhead{pool="generation",field="completed"' in text
+    assert 'rag_admission{pool="generation",field="shed"' in text
+    assert 'rag_llm_client{model="fake-llm"' in text
+
+
+def test_unknown_difficulty_never_becomes_a_label(tmp_path, monkeypatch):
+    from src.api.app import create_app
+    from src.api.routes import chat
+
+    rag = SimpleRAG(persist_directory=str(tmp_path), preload_topics=False,
+                    embedding_model=HashingEmbedder(), llm=FakeLLMBackend())
+    rag.load_documents_for_topic("childrens_rights")
+    monkeypatch.setattr(chat, "rag_system", rag)
+    with create_app(warmup=False).test_client() as client:
+        resp = client.post('/api/chat', json={'query': 'What is the CRC?', 'topic': 'childrens_rights',
+                                              'difficulty': 'x' * 40})
+    assert resp.status_code == 400 and 'difficulty' in resp.get_json()['error']
+
+    intermediate = metrics.ANSWERS.value(topic="childrens_rights", difficulty="intermediate", outcome="ok")
+    rag.generate_answer("What is the CRC?", "childrens_rights", "expert-level")
+    assert metrics.ANSWERS.value(topic="childrens_rights", difficulty="intermediate", outcome="ok") == intermediate + 1
+    assert "expert-level" not in metrics.REGISTRY.render()
+
+
+def test_workers_share_counters_through_snapshots(tmp_path):
+    from src.core.metrics import stats_family
+
+    registry = Registry(directory=str(tmp_path))
+    hits = registry.counter("demo_hits", "Demo hits", ["cache"])
+    latency = registry.histogram("demo_seconds", "Demo latency", buckets=(0.1, 1.0))
+    registry.register_collector(lambda: [stats_family("demo_pool", "Demo pool", {"p": {"in_flight": 1}}, "pool")])
+    hits.inc(cache="a")
+
+    children = []
+    for n in (2, 3):
+        pid = os.fork()
+        if pid == 0:
+            registry.reset()
+            hits.inc(n, cache="a")
+            latency.observe(0.5)
+            registry.write_snapshot()
+            os._exit(0)
+        children.append(pid)
+    for pid in children:
+        os.waitpid(pid, 0)
+
+    text = registry.render()
+    assert 'demo_hits_total{cache="a"} 6\n' in text
+    assert 'demo_seconds_bucket{le="1"} 2\n' in text and 'demo_seconds_count 2\n' in text
+    # live gauges come from running workers only: the children have exited
+    assert text.count("demo_pool{") == 1 and f'pid="{os.getpid()}"' in text
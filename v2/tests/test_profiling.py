@@ -0,0 +1,107 @@
+"""
+Test on-demand profiling of the answer path and the admin profile endpoints
+"""
+
+import sys
+sys.path.append('.')
+
+import pstats
+
+import pytest
+
+from src.core import profiling
+from src.core.embeddings import HashingEmbedder
+from src.core.llm_client import FakeLLMBackend
+from src.core.rag_system import SimpleRAG
+
+ADMIN = {'X-Admin-Token': 'secret'}
+
+
+@pytest.fixture
+def profiler(tmp_path, monkeypatch):
+    p = profiling.Profiler(str(tmp_path / "profiles"), keep=3)
+    monkeypatch.setattr(profiling, "PROFILER", p)
+    return p
+
+
+@pytest.fixture
+def client(tmp_path, monkeypatch, profiler):
+    from src.api.app import create_app
+    from src.api.routes import chat
+
+    monkeypatch.setenv("ADMIN_TOKEN", "secret")
+    rag = SimpleRAG(persist_directory=str(tmp_path / "db"), preload_topics=False,
+                    embedding_model=HashingEmbedder(), llm=FakeLLMBackend())
+    rag.load_documents_for_topic("childrens_rights")
+    monkeypatch.setattr(chat, "rag_system", rag)
+    app = create_app(warmup=False)
+    with app.test_client() as c:
+        yield c
+
+
+def _ask(client, headers):
+    return client.post('/api/chat', json={'query': 'What is the CRC?', 'topic': 'childrens_rights'},
+                       headers=headers)
+
+
+def test_unrequested_calls_are_not_profiled(profiler):
+    assert profiling.profiled("demo")(lambda: 42)() == 42
+    assert profiler.list() == []
+
+
+def test_sampled_calls_are_profiled_and_pruned(profiler):
+    profiler.sample_rate = 1.0
+    for _ in range(5):
+        profiling.profiled("demo")(sum)(range(1000))
+    listed = profiler.list()
+    assert len(listed) == 3 and listed[0]["kind"] == "demo"
+    assert pstats.Stats(profiler.path(listed[0]["name"])).total_calls > 0
+    assert profiler.stats()["captured"] == 5
+
+
+def test_admin_header_profiles_the_request(client, profiler):
+    plain = _ask(client, {'X-Profile': '1'})  # no admin token: ignored
+    assert 'X-Profile-Id' not in plain.headers and profiler.list() == []
+
+    resp = _ask(client, {'X-Profile': '1', **ADMIN})
+    name = resp.headers['X-Profile-Id']
+    assert resp.status_code == 200 and '-generate_answer-' in name
+
+    listing = client.get('/api/admin/profiles', headers=ADMIN).get_json()
+    assert [p['name'] for p in listing['profiles']] == [name]
+
+    text = client.get(f'/api/admin/profiles/{name}?format=text', headers=ADMIN).get_data(as_text=True)
+    assert 'generate_answer' in text and 'cumulative' in text
+    raw = client.get(f'/api/admin/profiles/{name}', headers=ADMIN)
+    assert raw.status_code == 200 and raw.data == open(profiler.path(name), 'rb').read()
+
+
+def test_admin_endpoints_require_the_token(client, profiler):
+    assert client.get('/api/admin/profiles').status_code == 403
+    assert client.get('/api/admin/profiles', headers={'X-Admin-Token': 'wrong'}).status_code == 403
+    assert client.get('/api/admin/profiles/..%2F..%2Fsecrets.prof', headers=ADMIN).status_code == 404
+
+
+def test_profile_includes_batcher_and_llm_worker_threads(tmp_path, profiler):
+    rag = SimpleRAG(persist_directory=str(tmp_path / "db"), preload_topics=False,
+                    embedding_model=HashingEmbedder(), llm=FakeLLMBackend())
+    rag.load_documents_for_topic("childrens_rights")
+    profiler.sample_rate = 1.0
+    rag.generate_answer("What is the CRC?", "childrens_rights", "beginner")
+
+    listed = [p for p in profiler.list() if p["kind"] == "generate_answer"]
+    assert len(listed) == 1
+    functions = {(line, name) for _, line, name in pstats.Stats(profiler.path(listed[0]["name"])).stats}
+    # query embedding ran on the batcher thread, generation on the LLM client's executor
+    assert any(name == "_encode_batch" for _, name in functions)
+    assert (FakeLLMBackend.generate.__code__.co_firstlineno, "generate") in functions
+
+
+def test_worker_profiles_after_the_capture_closed_are_dropped(profiler):
+    profiler.sample_rate = 1.0
+    captures = []
+    profiling.profiled("demo")(lambda: captures.append(profiling.current_capture()))()
+    with profiling.profile_thread(captures[0]):
+        sum(range(1000))
+    assert captures[0].closed and captures[0].profiles == []
+    assert profiling.current_capture() is None
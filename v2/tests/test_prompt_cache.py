@@ -0,0 +1,117 @@
+"""
+Test compiled prompt templates and prefix caching in the LLM backend
+"""
+
+import sys
+sys.path.append('.')
+
+import threading
+import time
+
+from src.core.context import count_tokens
+from src.core.llm_client import CACHE_MIN_TOKENS, FakeLLMBackend, GeminiBackend
+from src.core.prompts import COMPILED_PROMPTS, PREFIX, get_prompt
+
+
+def test_prefix_is_static_and_shared_by_every_difficulty():
+    for difficulty, compiled in COMPILED_PROMPTS.items():
+        assert compiled.prefix is PREFIX and compiled.cache_key == "hr-edu-prompt"
+        assert f"Instructions for {difficulty.title()}-Level Response" in compiled.prefix
+        assert difficulty.title() in compiled.render_suffix("ctx", "q", "womens_rights")
+        assert "{" not in compiled.prefix.replace("{{", "")
+    assert get_prompt("unknown") is COMPILED_PROMPTS["intermediate"]
+
+
+def test_request_fields_only_in_suffix():
+    compiled = get_prompt("beginner")
+    suffix = compiled.render_suffix("CTX-123", "What is UNDRIP?", "indigenous_rights")
+    assert "CTX-123" in suffix and "What is UNDRIP?" in suffix and "Indigenous Rights" in suffix
+    assert compiled.render("CTX-123", "What is UNDRIP?", "indigenous_rights") == compiled.prefix + suffix
+
+
+def test_cached_prefix_is_sent_once():
+    compiled = get_prompt("advanced")
+    suffix = compiled.render_suffix("context", "question", "womens_rights")
+
+    llm = FakeLLMBackend(cache_prefixes=True)
+    for _ in range(3):
+        llm.generate(suffix, prefix=compiled.prefix, prefix_key=compiled.cache_key)
+    assert llm.last_prompt == suffix
+
+    uncached = FakeLLMBackend(cache_prefixes=False)
+    for _ in range(3):
+        uncached.generate(suffix, prefix=compiled.prefix, prefix_key=compiled.cache_key)
+    assert uncached.last_prompt == compiled.prefix + suffix
+    assert llm.billed_prompt_tokens < uncached.billed_prompt_tokens / 3
+
+
+def test_shipped_prefix_clears_the_provider_minimum(monkeypatch):
+    assert count_tokens(PREFIX) >= CACHE_MIN_TOKENS["gemini-2.5-flash"]
+    created = []
+    backend = _gemini(monkeypatch, lambda **kwargs: created.append(kwargs["display_name"]) or "cache-0")
+    backend.min_cache_tokens = CACHE_MIN_TOKENS["gemini-2.5-flash"]
+    compiled = get_prompt("beginner")
+    assert backend._cached_model(compiled.cache_key, compiled.prefix) == ("cached-model", "cache-0")
+    # the other levels reuse the same entry
+    assert backend._cached_model(get_prompt("advanced").cache_key, PREFIX) and created == ["hr-edu-prompt"]
+
+
+def test_prefixes_under_the_provider_minimum_are_not_cached():
+    llm = FakeLLMBackend(cache_prefixes=True)
+    prefix = "You are an expert human rights educator. " * 10
+    llm.generate("question", prefix=prefix, prefix_key="short")
+    assert llm.last_prompt == prefix + "question"
+
+
+def _gemini(monkeypatch, create):
+    from src.core import llm_client
+
+    monkeypatch.setattr(llm_client.caching.CachedContent, "create", create)
+    monkeypatch.setattr(llm_client.genai.GenerativeModel, "from_cached_content",
+                        staticmethod(lambda cached_content: ("cached-model", cached_content)))
+    backend = GeminiBackend(cache_retry_s=0.05)
+    backend.min_cache_tokens = 10
+    return backend
+
+
+def test_gemini_registers_a_prefix_once_under_concurrency(monkeypatch):
+    calls = []
+
+    def create(**kwargs):
+        calls.append(kwargs["display_name"])
+        time.sleep(0.05)
+        return "cache-1"
+
+    backend = _gemini(monkeypatch, create)
+    prefix = "static instructions " * 20
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(backend._cached_model("k", prefix)))
+               for _ in range(8)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert calls == ["k"]
+    # threads that arrived mid-registration sent the full prompt instead of waiting
+    assert ("cached-model", "cache-1") in results
+    assert backend._cached_model("k", prefix) == ("cached-model", "cache-1")
+
+
+def test_gemini_retries_a_failed_registration_after_backoff(monkeypatch):
+    attempts = []
+
+    def create(**kwargs):
+        attempts.append(time.monotonic())
+        if len(attempts) == 1:
+            raise RuntimeError("503 cache service unavailable")
+        return "cache-2"
+
+    backend = _gemini(monkeypatch, create)
+    prefix = "static instructions " * 20
+    assert backend._cached_model("k", prefix) is None
+    assert backend._cached_model("k", prefix) is None and len(attempts) == 1  # backing off
+    time.sleep(0.06)
+    assert backend._cached_model("k", prefix) == ("cached-model", "cache-2")
+
+    # too short for the provider: never sent at all
+    assert backend._cached_model("short", "tiny") is None and len(attempts) == 2
@@ -0,0 +1,147 @@
+"""
+Test Merkle-tree delta replication, including a sync between two local processes
+"""
+
+import sys
+sys.path.append('.')
+
+import os
+import shutil
+import socket
+import subprocess
+import time
+from pathlib import Path
+
+import pytest
+import requests
+from chromadb import PersistentClient
+from chromadb.config import Settings
+
+from scripts.build_index import build_index
+from src.core.embeddings import HashingEmbedder
+from src.core.replication import MerkleTree, diff_trees
+
+TOPIC = "childrens_rights"
+
+
+def test_diff_finds_only_changed_ids():
+    base = [f"doc_c{i}_{i:016x}" for i in range(2000)]
+    remote = MerkleTree(base[5:] + ["new_c0_a", "new_c1_b"])
+    local = MerkleTree(base)
+    assert diff_trees(MerkleTree(base), MerkleTree(base)) == ([], [])
+    missing, extra = diff_trees(local, remote)
+    assert sorted(missing) == ["new_c0_a", "new_c1_b"]
+    assert sorted(extra) == sorted(base[:5])
+
+
+def _free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def _ids(persist_dir):
+    client = PersistentClient(path=str(persist_dir), settings=Settings(anonymized_telemetry=False))
+    return set(client.get_collection(TOPIC).get(include=[])["ids"])
+
+
+def test_sync_between_two_processes(tmp_path):
+    # node A: current corpus; node B: built before one document was edited
+    build_index(tmp_path / "a", topics=[TOPIC], embedding_model=HashingEmbedder())
+    old_topics = tmp_path / "old_topics" / TOPIC
+    shutil.copytree(Path("data/processed") / TOPIC, old_topics)
+    edited = old_topics / "CEDAW-for-Youth.txt"
+    edited.write_text(edited.read_text(encoding="utf-8") + "\n\n" + "An older closing paragraph. " * 20,
+                      encoding="utf-8")
+    build_index(tmp_path / "b", topics_dir=str(tmp_path / "old_topics"), topics=[TOPIC],
+                embedding_model=HashingEmbedder())
+    before = _ids(tmp_path / "b")
+    target = _ids(tmp_path / "a")
+    assert before != target
+
+    port = _free_port()
+    env = dict(os.environ, CHROMA_PERSIST_DIR=str(tmp_path / "a"), FLASK_DEBUG="False", RAG_WARMUP="False",
+               REPLICATION_TOKEN="secret")
+    server = subprocess.Popen(
+        [sys.executable, "-c", f"from src.api.app import create_app; create_app().run(port={port})"],
+        env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    try:
+        peer = f"http://127.0.0.1:{port}"
+        for _ in range(100):
+            try:
+                requests.get(peer + "/api/health/live", timeout=1)
+                break
+            except requests.ConnectionError:
+                time.sleep(0.1)
+        else:
+            pytest.fail("replication server did not start")
+
+        out = subprocess.run([sys.executable, "-m", "scripts.sync_index", "--peer", peer,
+                              "--persist-dir", str(tmp_path / "b")],
+                             capture_output=True, text=True, timeout=120, env=env)
+        assert out.returncode == 0, out.stderr
+    finally:
+        server.terminate()
+        server.wait(timeout=10)
+
+    assert _ids(tmp_path / "b") == target
+    assert f"+{len(target - before)} / -{len(before - target)} chunks" in out.stdout
+
+
+class _TestClientPeer:
+    """PeerClient over a Flask test client instead of HTTP"""
+
+    def __init__(self, client, headers=None):
+        self.client, self.headers, self.requests = client, headers or {}, 0
+
+    def get(self, path, **params):
+        self.requests += 1
+        resp = self.client.get(path, query_string=params, headers=self.headers)
+        assert resp.status_code == 200, resp.get_json()
+        return resp.get_json()
+
+    def post(self, path, payload):
+        self.requests += 1
+        resp = self.client.post(path, json=payload, headers=self.headers)
+        assert resp.status_code == 200, resp.get_json()
+        return resp.get_json()
+
+
+def test_new_topic_keeps_the_peer_collection_metadata(tmp_path, monkeypatch):
+    from src.api.app import create_app
+    from src.api.routes import replication
+    from src.core.replication import IndexReplica, sync_from_peer
+
+    build_index(tmp_path / "a", topics=[TOPIC], embedding_model=HashingEmbedder())
+    source = PersistentClient(path=str(tmp_path / "a"), settings=Settings(anonymized_telemetry=False))
+    monkeypatch.setattr(replication, "replica", IndexReplica(source))
+    monkeypatch.setenv("CHROMA_PERSIST_DIR", str(tmp_path / "a"))
+    monkeypatch.setenv("REPLICATION_TOKEN", "secret")
+
+    fresh = PersistentClient(path=str(tmp_path / "c"), settings=Settings(anonymized_telemetry=False))
+    with create_app(warmup=False).test_client() as client:
+        sync_from_peer(IndexReplica(fresh), _TestClientPeer(client, {"X-Replication-Token": "secret"}))
+
+    original, copied = source.get_collection(TOPIC), fresh.get_collection(TOPIC)
+    assert copied.metadata == original.metadata and copied.metadata["hnsw:space"] == "cosine"
+    query = HashingEmbedder().encode(["What is the CRC?"]).tolist()
+    before = original.query(query_embeddings=query, n_results=5)
+    after = copied.query(query_embeddings=query, n_results=5)
+    assert after["ids"] == before["ids"] and after["distances"][0] == pytest.approx(before["distances"][0], abs=1e-5)
+
+
+def test_every_replication_route_requires_the_token(monkeypatch):
+    from src.api.app import create_app
+
+    routes = [("get", "/api/replication/topics"), ("get", f"/api/replication/{TOPIC}/tree"),
+              ("get", f"/api/replication/{TOPIC}/ids"), ("post", f"/api/replication/{TOPIC}/chunks"),
+              ("post", "/api/replication/sync")]
+    with create_app(warmup=False).test_client() as client:
+        monkeypatch.delenv("REPLICATION_TOKEN", raising=False)
+        # not configured: replication is off, whatever the caller sends
+        assert {getattr(client, m)(path, headers={"X-Replication-Token": ""}).status_code
+                for m, path in routes} == {403}
+        monkeypatch.setenv("REPLICATION_TOKEN", "secret")
+        assert {getattr(client, m)(path).status_code for m, path in routes} == {403}
+        assert {getattr(client, m)(path, headers={"X-Replication-Token": "wrong-é"}).status_code
+                for m, path in routes} == {403}
@@ -0,0 +1,88 @@
+"""
+Test retrieval quality metrics, the labeled query set and the quality/latency harness
+"""
+
+import sys
+sys.path.append('.')
+
+import json
+import math
+
+import pytest
+
+from src.core.retrieval_eval import (LabeledQuery, chunk_words, load_labels, ndcg_at_k, pareto_front,
+                                     recall_at_k, reciprocal_rank, score_query)
+
+
+def test_ranking_metrics():
+    assert reciprocal_rank([False, False, True]) == pytest.approx(1 / 3)
+    assert reciprocal_rank([False, False]) == 0.0
+    assert ndcg_at_k([True, False, True], n_relevant=2, k=3) == pytest.approx(
+        (1 + 1 / math.log2(4)) / (1 + 1 / math.log2(3)))
+    assert ndcg_at_k([True], n_relevant=0, k=3) == 0.0
+    # one label found twice, the other never: half the facts
+    assert recall_at_k([[0], [0], []], n_labels=2, k=3) == 0.5
+    assert recall_at_k([[], [1]], n_labels=2, k=1) == 0.0
+
+
+def test_labels_match_by_source_and_phrase():
+    q = LabeledQuery("q", "t", [{"source": "a.txt", "contains": "Best  Interests"}, {"contains": "hostilities"}])
+    assert q.hits("the best\ninterests of the child", "a.txt") == [0]
+    assert q.hits("the best interests of the child", "b.txt") == []
+    assert q.hits("direct part in hostilities", "b.txt") == [1]
+    scores = score_query(q, ["nothing", "about hostilities", "best interests"], ["a.txt", "b.txt", "a.txt"],
+                         n_relevant=2, ks=[1, 3])
+    assert scores["mrr"] == 0.5 and scores["recall@1"] == 0.0 and scores["recall@3"] == 1.0
+
+
+def test_word_windows_overlap():
+    chunks = chunk_words(" ".join(str(i) for i in range(10)), size=4, overlap=2)
+    assert chunks == ["0 1 2 3", "2 3 4 5", "4 5 6 7", "6 7 8 9"]
+    assert chunk_words("   ") == []
+
+
+def test_pareto_front():
+    rows = [{"q": 0.9, "ms": 5.0}, {"q": 0.8, "ms": 1.0}, {"q": 0.7, "ms": 2.0}, {"q": 0.9, "ms": 5.0}]
+    assert pareto_front(rows, maximize=["q"], minimize=["ms"]) == [True, True, False, True]
+
+
+def test_shipped_labels_all_have_an_answer_in_the_corpus():
+    from src.core.retrieval_eval import chunk_paragraphs
+    from pathlib import Path
+
+    labels = load_labels("data/eval/retrieval_queries.jsonl")
+    assert len(labels) >= 27 and len({q.topic for q in labels}) == 9
+    for q in labels:
+        chunks = [(c, p.name) for p in Path("data/processed", q.topic).glob("*.txt")
+                  for c in chunk_paragraphs(p.read_text(encoding="utf-8", errors="ignore"))]
+        assert any(q.hits(c, s) for c, s in chunks), q.query
+
+
+def test_harness_produces_pareto_table(tmp_path):
+    from scripts.bench_retrieval_quality import pareto_table, run
+
+    labels = tmp_path / "labels.jsonl"
+    labels.write_text("\n".join(json.dumps(r) for r in [
+        {"query": "Can children take part in hostilities?", "topic": "childrens_rights",
+         "relevant": [{"contains": "direct part in hostilities"}]},
+        {"query": "Which article defines discrimination against women?", "topic": "womens_rights",
+         "relevant": [{"source": "cedaw_summary.txt", "contains": "defines discrimination against women"}]},
+    ]))
+    report = run(str(labels), "tests/fixtures/corpus", ["paragraph", "words:40:10"],
+                 ["exact", "chroma:M=8,ef=10"], [1, 3], repeats=1)
+
+    assert len(report["rows"]) == 4
+    exact = next(r for r in report["rows"] if r["chunker"] == "paragraph" and r["backend"] == "exact")
+    assert exact["recall@3"] == 1.0 and exact["index_mb"] > 0 and exact["search_p95_ms"] >= 0
+    windows = next(r for r in report["rows"] if r["chunker"] == "words:40:10" and r["backend"] == "exact")
+    assert 0 < windows["context_words@3"] <= 3 * 40 and exact["context_words@3"] > 0
+    table = pareto_table(report, 3)
+    assert table.count("\n") == 5 and "★" in table
+    # context size is an axis of its own: the row that hands the prompt the least text is never dominated
+    rows = report["rows"]
+    front = pareto_front(rows, maximize=["ndcg@3", "recall@3"],
+                         minimize=["context_words@3", "search_p95_ms", "index_mb"])
+    assert table.count("★") == sum(front)
+    assert front[min(range(len(rows)), key=lambda i: (rows[i]["context_words@3"], -rows[i]["ndcg@3"],
+                                                       -rows[i]["recall@3"], rows[i]["search_p95_ms"],
+                                                       rows[i]["index_mb"]))]
@@ -0,0 +1,184 @@
+"""
+Test topic-sharded retrieval against local shard server processes
+"""
+
+import sys
+sys.path.append('.')
+
+import socket
+import subprocess
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+import requests
+
+from scripts.build_index import build_index
+from src.core.embeddings import HashingEmbedder
+from src.core.llm_client import FakeLLMBackend
+from src.core.rag_system import SimpleRAG
+from src.core.sharding import HashRing, ShardError, ShardRouter, merge_results
+
+TOPICS = [f"topic_{i}" for i in range(200)]
+
+
+def test_hash_ring_moves_only_topics_claimed_by_new_shard():
+    before = HashRing(["http://a", "http://b", "http://c"])
+    after = HashRing(["http://a", "http://b", "http://c", "http://d"])
+    moved = [t for t in TOPICS if before.lookup(t) != after.lookup(t)]
+    assert all(after.lookup(t) == "http://d" for t in moved)
+    assert 0 < len(moved) < len(TOPICS) / 2
+
+
+def test_merge_results_orders_by_distance():
+    merged = merge_results([
+        {"ids": ["a1", "a2"], "documents": ["A1", "A2"], "metadatas": [{}, {}], "distances": [0.1, 0.5]},
+        {"ids": ["b1"], "documents": ["B1"], "metadatas": [{}], "distances": [0.3]},
+    ], n_results=2)
+    assert merged["ids"] == [["a1", "b1"]]
+    assert merged["distances"] == [[0.1, 0.3]]
+
+
+def _free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def _start_shard(persist_dir):
+    port = _free_port()
+    proc = subprocess.Popen([sys.executable, "-m", "src.api.shard_app", "--persist-dir", str(persist_dir),
+                             "--port", str(port)], stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    url = f"http://127.0.0.1:{port}"
+    for _ in range(100):
+        try:
+            requests.get(url + "/shard/info", timeout=1)
+            return proc, url
+        except requests.ConnectionError:
+            time.sleep(0.1)
+    proc.kill()
+    pytest.fail("shard server did not start")
+
+
+class _SlowShard(BaseHTTPRequestHandler):
+    def do_POST(self):
+        time.sleep(1.0)
+        self.send_response(500)
+        self.end_headers()
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture(scope="module")
+def shards(tmp_path_factory):
+    root = tmp_path_factory.mktemp("shards")
+    build_index(root / "a", topics=["childrens_rights", "womens_rights"], embedding_model=HashingEmbedder())
+    build_index(root / "b", topics=["foundational_rights"], embedding_model=HashingEmbedder())
+    procs = [_start_shard(root / "a"), _start_shard(root / "b")]
+    yield root, procs[0][1], procs[1][1]
+    for proc, _ in procs:
+        proc.terminate()
+        proc.wait(timeout=10)
+
+
+def test_router_matches_local_retrieval(shards):
+    root, shard_a, shard_b = shards
+    router = ShardRouter(shard_map={"childrens_rights": shard_a, "womens_rights": shard_a,
+                                    "foundational_rights": shard_b})
+    routed = SimpleRAG(router=router, embedding_model=HashingEmbedder(), llm=FakeLLMBackend())
+    local = SimpleRAG(persist_directory=str(root / "a"), read_only=True,
+                      embedding_model=HashingEmbedder(), llm=FakeLLMBackend())
+
+    query = ("What is the CRC?", "childrens_rights")
+    assert routed.retrieve(*query)["ids"] == local.retrieve(*query)["ids"]
+    assert "Sources:" in routed.generate_answer(*query, "beginner")
+
+    # scatter-gather across both shards returns the global top-n by distance
+    both = ["childrens_rights", "foundational_rights"]
+    merged = routed.retrieve("rights of every person", both, n_results=12)
+    per_topic = [routed.retrieve("rights of every person", t, n_results=12) for t in both]
+    expected = sorted((d, i) for r in per_topic for d, i in zip(r["distances"][0], r["ids"][0]))[:12]
+    assert merged["ids"][0] == [i for _, i in expected]
+    assert not merged.get("partial")
+
+
+def test_slow_shard_yields_partial_results_within_deadline(shards):
+    _, shard_a, _ = shards
+    slow = ThreadingHTTPServer(("127.0.0.1", 0), _SlowShard)
+    threading.Thread(target=slow.serve_forever, daemon=True).start()
+    slow_url = f"http://127.0.0.1:{slow.server_address[1]}"
+    try:
+        router = ShardRouter(shard_map={"childrens_rights": shard_a, "foundational_rights": slow_url}, timeout_s=0.3)
+        embedding = HashingEmbedder().encode("What is the CRC?").tolist()
+        start = time.monotonic()
+        result = router.query(embedding, ["childrens_rights", "foundational_rights"], n_results=4)
+        assert time.monotonic() - start < 0.8
+        assert result["partial"] and result["missing_shards"] == [slow_url]
+        assert len(result["ids"][0]) == 4
+    finally:
+        slow.shutdown()
+
+
+def test_shard_embedded_with_another_model_is_rejected(shards):
+    _, shard_a, shard_b = shards
+    router = ShardRouter(shard_map={"childrens_rights": shard_a, "foundational_rights": shard_b})
+    embedding = HashingEmbedder().encode("What is the CRC?").tolist()
+    both = ["childrens_rights", "foundational_rights"]
+    assert not router.query(embedding, both, embedding_model_id="hashing-embedder-v1").get("partial")
+    # every shard holds hashing vectors: none can answer a query embedded by another model
+    with pytest.raises(ShardError):
+        router.query(embedding, both, embedding_model_id="all-MiniLM-L6-v2")
+
+
+def test_partial_retrieval_marks_the_answer_degraded(shards):
+    _, shard_a, _ = shards
+    slow = ThreadingHTTPServer(("127.0.0.1", 0), _SlowShard)
+    threading.Thread(target=slow.serve_forever, daemon=True).start()
+    slow_url = f"http://127.0.0.1:{slow.server_address[1]}"
+    try:
+        # the router's own timeout is generous: only the request deadline can cut the slow shard
+        router = ShardRouter(shard_map={"childrens_rights": shard_a, "foundational_rights": slow_url}, timeout_s=5)
+        rag = SimpleRAG(router=router, embedding_model=HashingEmbedder(), llm=FakeLLMBackend())
+        both = ["childrens_rights", "foundational_rights"]
+        start = time.monotonic()
+        result = rag.retrieve("What is the CRC?", both, deadline=time.monotonic() + 0.3)
+        assert time.monotonic() - start < 0.8
+        assert result["partial"] and result["missing_shards"] == [slow_url]
+
+        assert not rag.generate_answer("What is the CRC?", "childrens_rights", "beginner").degraded
+        # a prompt takes one topic: have its scatter reach the slow shard too
+        query = router.query
+        router.query = lambda embedding, topics, **kw: query(embedding, list(topics) + ["foundational_rights"], **kw)
+        answer = rag.generate_answer("What is the CRC?", "childrens_rights", "beginner",
+                                     deadline=time.monotonic() + 0.3)
+        assert "Sources:" in answer and answer.partial and answer.degraded
+    finally:
+        slow.shutdown()
+
+
+def test_shard_without_manifest_is_trusted(tmp_path):
+    from chromadb import PersistentClient
+    from chromadb.config import Settings
+
+    # an index written straight to Chroma, not by build_index: no manifest, so no model id
+    embedder = HashingEmbedder()
+    texts = ["The Convention on the Rights of the Child protects every child.",
+             "States Parties shall respect the right of the child to education."]
+    client = PersistentClient(path=str(tmp_path), settings=Settings(anonymized_telemetry=False))
+    client.create_collection("childrens_rights", metadata={"hnsw:space": "cosine"}).add(
+        ids=["c0", "c1"], documents=texts, metadatas=[{"source": "crc.txt"}] * 2,
+        embeddings=embedder.encode(texts).tolist())
+    proc, url = _start_shard(tmp_path)
+    try:
+        assert requests.get(url + "/shard/info").json()["embedding_model_id"] is None
+        rag = SimpleRAG(router=ShardRouter(shard_map={"childrens_rights": url}), embedding_model=embedder,
+                        llm=FakeLLMBackend())
+        result = rag.retrieve("What is the CRC?", "childrens_rights", n_results=2)
+        assert sorted(result["ids"][0]) == ["c0", "c1"] and not result.get("partial")
+        answer = rag.generate_answer("What is the CRC?", "childrens_rights", "beginner")
+        assert not answer.partial and not answer.degraded
+    finally:
+        proc.terminate()
+        proc.wait(timeout=10)
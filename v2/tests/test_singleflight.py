@@ -0,0 +1,141 @@
+"""
+Test coalescing of identical in-flight chat requests
+"""
+
+import sys
+sys.path.append('.')
+
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from src.core.singleflight import SingleFlight
+
+
+def test_concurrent_calls_share_one_execution():
+    flight = SingleFlight()
+    calls = []
+    barrier = threading.Barrier(30)
+
+    def work():
+        calls.append(1)
+        time.sleep(0.2)
+        return "answer"
+
+    def request():
+        barrier.wait()
+        return flight.do("same question", work)
+
+    with ThreadPoolExecutor(max_workers=30) as pool:
+        results = list(pool.map(lambda _: request(), range(30)))
+
+    assert len(calls) == 1
+    assert all(result == "answer" for result, _ in results)
+    assert sum(shared for _, shared in results) == 29
+    assert flight.stats() == {"requests": 30, "executions": 1, "coalesced": 29, "in_flight": 0}
+
+
+def test_errors_reach_every_waiter_and_key_is_released():
+    flight = SingleFlight()
+    started = threading.Event()
+
+    def boom():
+        started.set()
+        time.sleep(0.1)
+        raise ValueError("generation failed")
+
+    with ThreadPoolExecutor(max_workers=2) as pool:
+        leader = pool.submit(flight.do, "k", boom)
+        started.wait()
+        follower = pool.submit(flight.do, "k", lambda: "never called")
+        for future in (leader, follower):
+            with pytest.raises(ValueError):
+                future.result()
+
+    assert flight.do("k", lambda: "fresh") == ("fresh", False)
+
+
+def test_stream_subscribers_receive_every_chunk():
+    flight = SingleFlight()
+    release = threading.Event()
+
+    def produce():
+        yield "first"
+        release.wait()
+        yield "second"
+
+    leader, shared_a = flight.stream("k", produce)
+    follower, shared_b = flight.stream("k", produce)
+    release.set()
+    assert (shared_a, shared_b) == (False, True)
+    assert list(leader) == ["first", "second"]
+    assert list(follower) == ["first", "second"]
+
+
+def test_chat_endpoint_coalesces_identical_questions():
+    from src.api.app import create_app
+    from src.api.routes import chat
+
+    class SlowRAG:
+        calls = 0
+
+        def generate_answer(self, query, topic, difficulty, deadline=None):
+            SlowRAG.calls += 1
+            time.sleep(0.3)
+            return "Children have rights.\n\n📚 Sources: crc.txt (score=0.1)"
+
+    chat.rag_system, chat.inflight = SlowRAG(), SingleFlight("chat")
+    app = create_app()
+    queries = ["What is the CRC?", "what is the  CRC?"] * 5
+
+    def post(query):
+        with app.test_client() as client:
+            return client.post('/api/chat', json={'query': query, 'topic': 'childrens_rights'})
+
+    try:
+        with ThreadPoolExecutor(max_workers=10) as pool:
+            responses = list(pool.map(post, queries))
+        assert all(r.status_code == 200 for r in responses)
+        assert responses[0].get_json()['sources'] == ['crc.txt (score=0.1)']
+        assert SlowRAG.calls == 1
+
+        with app.test_client() as client:
+            stats = client.get('/api/stats').get_json()['coalescing']
+            stream = client.post('/api/chat/stream', json={'query': 'What is the CRC?', 'topic': 'childrens_rights'})
+        assert stats['coalesced'] == 9
+        body = stream.get_data(as_text=True)
+        assert 'event: chunk' in body and 'Children have rights.' in body and 'event: done' in body
+    finally:
+        chat.rag_system, chat.inflight = None, SingleFlight("chat")
+
+
+def test_requests_with_different_deadline_budgets_do_not_share_an_answer():
+    from src.api.app import create_app
+    from src.api.routes import chat
+
+    class SlowRAG:
+        budgets = []
+
+        def generate_answer(self, query, topic, difficulty, deadline=None):
+            SlowRAG.budgets.append(round(deadline - time.monotonic(), 1))
+            time.sleep(0.3)
+            return "Children have rights."
+
+    chat.rag_system, chat.inflight = SlowRAG(), SingleFlight("chat")
+    app = create_app()
+
+    def post(budget_ms):
+        with app.test_client() as client:
+            return client.post('/api/chat', json={'query': 'What is the CRC?', 'topic': 'childrens_rights'},
+                               headers={'X-Deadline-Ms': budget_ms})
+
+    try:
+        with ThreadPoolExecutor(max_workers=4) as pool:
+            responses = list(pool.map(post, ["200", "10000", "200", "10000"]))
+        assert all(r.status_code == 200 for r in responses)
+        # one execution per budget, each generated with its own deadline
+        assert sorted(SlowRAG.budgets) == [0.2, 10.0]
+    finally:
+        chat.rag_system, chat.inflight = None, SingleFlight("chat")
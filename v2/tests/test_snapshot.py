@@ -0,0 +1,87 @@
+"""
+Test index snapshot export/import, corruption detection and version rollback
+"""
+
+import sys
+sys.path.append('.')
+
+import zipfile
+
+import numpy as np
+import pytest
+
+from scripts.build_index import build_index
+from src.core.embeddings import HashingEmbedder
+from src.core.index_manifest import IndexMismatchError
+from src.core.llm_client import FakeLLMBackend
+from src.core.rag_system import SimpleRAG
+from src.core.snapshot import (SnapshotError, activate, current_link, current_version, export_snapshot,
+                               import_snapshot, list_versions, read_snapshot)
+
+
+@pytest.fixture
+def snapshot(tmp_path):
+    build_index(tmp_path / "built", topics=["childrens_rights"], embedding_model=HashingEmbedder())
+    export_snapshot(tmp_path / "built", tmp_path / "index.ragsnap")
+    return tmp_path / "index.ragsnap"
+
+
+def test_restored_index_serves_same_results(tmp_path, snapshot):
+    header, _, vectors = read_snapshot(snapshot)
+    assert isinstance(vectors, np.memmap)
+    assert vectors.shape == (header["vectors"]["rows"], 384)
+
+    snapshot_id = import_snapshot(snapshot, tmp_path / "node", expected_model_id="hashing-embedder-v1")
+    assert current_version(tmp_path / "node") == snapshot_id
+
+    kwargs = dict(read_only=True, embedding_model=HashingEmbedder(), llm=FakeLLMBackend())
+    original = SimpleRAG(persist_directory=str(tmp_path / "built"), **kwargs)
+    restored = SimpleRAG(persist_directory=str(current_link(tmp_path / "node")), **kwargs)
+    query = ("What is the CRC?", "childrens_rights")
+    assert restored.retrieve(*query)["ids"] == original.retrieve(*query)["ids"]
+
+
+def test_corrupted_snapshot_is_rejected(tmp_path, snapshot):
+    with zipfile.ZipFile(snapshot) as zf:
+        offset = zf.getinfo("vectors.f32").header_offset + 100
+    data = bytearray(snapshot.read_bytes())
+    data[offset] ^= 0xFF
+    snapshot.write_bytes(bytes(data))
+    with pytest.raises(SnapshotError):
+        import_snapshot(snapshot, tmp_path / "node")
+
+
+def test_import_refuses_other_model(tmp_path, snapshot):
+    with pytest.raises(IndexMismatchError):
+        import_snapshot(snapshot, tmp_path / "node", expected_model_id="sentence-transformers/all-MiniLM-L6-v2")
+
+
+def test_activate_switches_between_versions(tmp_path, snapshot):
+    root = tmp_path / "node"
+    first = import_snapshot(snapshot, root)
+    (root / "versions" / "older").mkdir()
+    activate(root, "older")
+    assert current_version(root) == "older"
+    activate(root, first)
+    assert current_version(root) == first
+    assert list_versions(root) == sorted([first, "older"])
+    with pytest.raises(SnapshotError):
+        activate(root, "missing")
+
+
+def test_restore_keeps_the_collection_distance_space(tmp_path, snapshot):
+    from src.core.snapshot import _client
+
+    header, _, _ = read_snapshot(snapshot)
+    assert header["topics"]["childrens_rights"]["metadata"]["hnsw:space"] == "cosine"
+
+    import_snapshot(snapshot, tmp_path / "node")
+    original = _client(tmp_path / "built").get_collection("childrens_rights")
+    restored = _client(current_link(tmp_path / "node")).get_collection("childrens_rights")
+    assert restored.metadata == original.metadata
+
+    query = HashingEmbedder().encode(["What is the CRC?"]).tolist()
+    before = original.query(query_embeddings=query, n_results=5)
+    after = restored.query(query_embeddings=query, n_results=5)
+    assert after["ids"] == before["ids"]
+    assert np.allclose(after["distances"], before["distances"], atol=1e-5)
@@ -0,0 +1,65 @@
+"""
+Test the start-up breakdown: import times, SimpleRAG.__init__ phases, report and health endpoint
+"""
+
+import sys
+sys.path.append('.')
+
+import json
+import time
+
+from src.core.embeddings import HashingEmbedder
+from src.core.llm_client import FakeLLMBackend
+from src.core.rag_system import SimpleRAG
+from src.core.startup import STARTUP, PhaseTimer, StartupProfile
+from src.core.warmup import Warmup
+
+
+def test_phase_timer_charges_consecutive_laps():
+    timer = PhaseTimer()
+    time.sleep(0.02)
+    timer.lap("first")
+    timer.lap("second")
+    assert timer.phases["first"] >= 0.02 and timer.phases["second"] < 0.01
+
+
+def test_imports_are_timed_once_and_incrementally():
+    profile = StartupProfile()
+    sys.modules.pop("colorsys", None)
+    profile.import_modules(["colorsys", "json"])  # json is already loaded: not charged
+    assert list(profile.imports) == ["colorsys"] and "colorsys" in sys.modules
+
+
+def test_rag_records_init_phases(tmp_path):
+    rag = SimpleRAG(persist_directory=str(tmp_path), topics_dir="data/processed",
+                    embedding_model=HashingEmbedder(), llm=FakeLLMBackend())
+    assert list(rag.init_phases) == ["llm", "embedding_model", "vector_db", "topics", "ingest"]
+    assert STARTUP.report()["init_phases_s"]["ingest"] > 0
+
+
+def test_warm_up_writes_report_and_health_serves_it(tmp_path, monkeypatch):
+    from src.api.app import create_app
+    from src.api.routes import chat
+
+    rag = SimpleRAG(persist_directory=str(tmp_path / "db"), preload_topics=False,
+                    embedding_model=HashingEmbedder(), llm=FakeLLMBackend())
+    rag.load_documents_for_topic("childrens_rights")
+    monkeypatch.setattr(chat, "rag_system", rag)
+    monkeypatch.setattr(chat, "warmup", Warmup())
+    monkeypatch.setenv("STARTUP_REPORT", str(tmp_path / "startup.json"))
+    assert chat.warmup.run(chat.warm_up)
+
+    written = json.loads((tmp_path / "startup.json").read_text())
+    assert set(written["warmup_phases_s"]) == {"warm_query", "total"}
+    with create_app(warmup=False).test_client() as client:
+        body = client.get('/api/health/startup').get_json()
+    assert body["state"] == "ready" and "vector_db" in body["init_phases_s"]
+    assert body["warmup_phases_s"]["total"] >= body["warmup_phases_s"]["warm_query"]
+
+
+def test_compare_flags_slower_phases():
+    from scripts.startup_report import compare
+
+    baseline = {"imports_s": {"torch": 3.0}, "init_phases_s": {"ingest": 1.0, "vector_db": 0.1}}
+    report = {"imports_s": {"torch": 3.1}, "init_phases_s": {"ingest": 2.0, "vector_db": 0.2}}
+    assert compare(report, baseline, tolerance=0.25, min_delta_s=0.2) == ["init_phases.ingest"]
@@ -0,0 +1,99 @@
+"""
+Test request IDs, Server-Timing headers and the opt-in per-request trace breakdown
+"""
+
+import sys
+sys.path.append('.')
+
+import json
+
+import pytest
+
+from src.core import tracing
+from src.core.bulkhead import Bulkhead
+from src.core.embeddings import HashingEmbedder
+from src.core.llm_client import FakeLLMBackend, LLMClient
+from src.core.metrics import stage
+from src.core.rag_system import SimpleRAG
+
+
+@pytest.fixture
+def client(tmp_path, monkeypatch):
+    from src.api.app import create_app
+    from src.api.routes import chat
+
+    rag = SimpleRAG(persist_directory=str(tmp_path / "db"), preload_topics=False,
+                    embedding_model=HashingEmbedder(), llm=LLMClient(FakeLLMBackend()))
+    rag.load_documents_for_topic("childrens_rights")
+    monkeypatch.setattr(chat, "rag_system", rag)
+    monkeypatch.setattr(chat, "trace_log", tracing.TraceLog(str(tmp_path / "traces.jsonl"), 0))
+    app = create_app(warmup=False)
+    with app.test_client() as c:
+        yield c
+
+
+def _ask(client, **headers):
+    return client.post('/api/chat', json={'query': 'What is the CRC?', 'topic': 'childrens_rights'},
+                       headers=headers)
+
+
+def _find(span, name):
+    if span['name'] == name:
+        return span
+    for child in span.get('children', []):
+        found = _find(child, name)
+        if found:
+            return found
+    return None
+
+
+def test_spans_follow_the_request_into_bulkhead_threads():
+    trace = tracing.Trace("t1")
+    tokens = tracing.start_trace(trace)
+    try:
+        def work():
+            with stage("outer"):
+                with stage("inner"):
+                    pass
+        Bulkhead("demo", 1, 0).run(work)
+    finally:
+        tracing.end_trace(tokens)
+    outer, = trace.root.children
+    assert outer.name == "outer" and [c.name for c in outer.children] == ["inner"]
+    assert "outer;dur=" in trace.server_timing() and "total;dur=" in trace.server_timing()
+
+
+def test_server_timing_and_request_id_on_every_response(client):
+    resp = _ask(client, **{'X-Request-ID': 'abc-123'})
+    assert resp.status_code == 200
+    assert resp.headers['X-Request-ID'] == 'abc-123'
+    timing = resp.headers['Server-Timing']
+    for name in ("embed_query", "vector_query", "rerank", "prompt_build", "llm", "total"):
+        assert f"{name};dur=" in timing
+    assert 'debug' not in resp.get_json()
+
+    bad = client.post('/api/chat', json={'query': 'x'}, headers={'X-Request-ID': 'no spaces allowed'})
+    assert bad.status_code == 400 and len(bad.headers['X-Request-ID']) == 32
+    assert bad.headers['Server-Timing'].startswith('total;dur=')
+
+
+def test_opt_in_debug_trace_has_candidates_and_model(client):
+    body = _ask(client, **{'X-Debug-Trace': '1'}).get_json()
+    tree = body['debug']['trace']
+    rerank = _find(tree, 'rerank')
+    assert rerank['attrs']['candidates'] and 'distance' in rerank['attrs']['candidates'][0]
+    assert _find(tree, 'prompt_build')['attrs']['suffix_tokens'] > 0
+    llm = _find(tree, 'llm')['attrs']
+    assert llm['model'] == 'fake-llm' and llm['attempts'] == 1
+    assert body['debug']['coalesced'] is False
+
+
+def test_sampled_traces_are_appended_to_the_log(client, tmp_path, monkeypatch):
+    from src.api.routes import chat
+
+    monkeypatch.setattr(chat, "trace_log", tracing.TraceLog(str(tmp_path / "traces.jsonl"), 1.0))
+    resp = _ask(client)
+    assert 'debug' not in resp.get_json()
+    record = json.loads((tmp_path / "traces.jsonl").read_text().splitlines()[-1])
+    assert record['request_id'] == resp.headers['X-Request-ID']
+    assert _find(record, 'rerank')['attrs']['candidates']
@@ -0,0 +1,93 @@
+"""
+Test lazy imports, background warm-up and liveness/readiness health checks
+"""
+
+import sys
+sys.path.append('.')
+
+import subprocess
+import threading
+
+from src.core.warmup import Warmup
+
+
+def test_app_import_defers_heavy_modules():
+    code = ("import sys; import src.api.app; "
+            "print(sorted(m for m in ('torch', 'sentence_transformers', 'chromadb', 'google.generativeai') "
+            "if m in sys.modules))")
+    out = subprocess.run([sys.executable, "-c", code], capture_output=True, text=True, timeout=60)
+    assert out.stdout.strip().splitlines()[-1] == "[]"
+
+
+def test_readiness_waits_for_warm_up(monkeypatch):
+    from src.api.app import create_app
+    from src.api.routes import chat
+
+    release = threading.Event()
+
+    class SlowRAG:
+        warmed = False
+
+        def __init__(self, **kwargs):
+            release.wait(5)
+
+        def warm_up(self):
+            SlowRAG.warmed = True
+
+    monkeypatch.setattr(chat, "SimpleRAG", SlowRAG)
+    monkeypatch.setattr(chat, "rag_system", None)
+    monkeypatch.setattr(chat, "warmup", Warmup())
+    app = create_app(warmup=True)
+    with app.test_client() as client:
+        assert client.get('/api/health/live').status_code == 200
+        starting = client.get('/api/health/ready')
+        assert starting.status_code == 503 and starting.get_json()['state'] == 'warming'
+
+        release.set()
+        assert chat.warmup.wait(5)
+        ready = client.get('/api/health/ready')
+    assert ready.status_code == 200
+    assert SlowRAG.warmed
+    assert {'build', 'warm_query', 'total'} <= set(ready.get_json()['phases_s'])
+
+
+def test_failed_warm_up_reports_error():
+    warmup = Warmup()
+
+    def boom():
+        raise RuntimeError("no index")
+
+    warmup.start(boom)
+    assert not warmup.wait(5)
+    status = warmup.status()
+    assert status['state'] == 'failed' and 'no index' in status['error']
+
+
+def test_lazy_build_marks_ready_without_warm_up(monkeypatch):
+    from src.api.app import create_app
+    from src.api.routes import chat
+
+    class LazyRAG:
+        def __init__(self, **kwargs):
+            pass
+
+    monkeypatch.setattr(chat, "SimpleRAG", LazyRAG)
+    monkeypatch.setattr(chat, "rag_system", None)
+    monkeypatch.setattr(chat, "warmup", Warmup())
+    app = create_app(warmup=False)
+    with app.test_client() as client:
+        idle = client.get('/api/health/ready')
+        assert idle.status_code == 503 and idle.get_json()['state'] == 'idle'
+
+        chat.get_rag_system()
+        ready = client.get('/api/health/ready')
+    assert ready.status_code == 200 and 'build' in ready.get_json()['phases_s']
+
+
+def test_mark_ready_leaves_a_running_warm_up_alone():
+    warmup = Warmup()
+    release = threading.Event()
+    warmup.start(lambda: release.wait(5))
+    assert not warmup.mark_ready() and warmup.status()['state'] == 'warming'
+    release.set()
+    assert warmup.wait(5)
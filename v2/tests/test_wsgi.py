@@ -0,0 +1,63 @@
+"""
+Test the gunicorn entry point with the model and index preloaded before fork
+"""
+
+import sys
+sys.path.append('.')
+
+import os
+import socket
+import subprocess
+import time
+from pathlib import Path
+
+import pytest
+import requests
+
+from scripts.build_index import build_index
+from src.core.embeddings import HashingEmbedder
+
+pytest.importorskip("gunicorn")
+
+
+def test_preloaded_workers_serve_chat(tmp_path):
+    build_index(tmp_path / "index", topics=["childrens_rights"], embedding_model=HashingEmbedder())
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        port = s.getsockname()[1]
+    env = dict(os.environ, WEB_CONCURRENCY="2", GUNICORN_THREADS="2", GUNICORN_BIND=f"127.0.0.1:{port}",
+               RAG_PRELOAD="True", RAG_READ_ONLY="True", CHROMA_PERSIST_DIR=str(tmp_path / "index"),
+               GUNICORN_GRACEFUL_TIMEOUT="2", BENCH_MODEL_MB="1", BENCH_MODEL_ID="hashing-embedder-v1",
+               METRICS_DIR=str(tmp_path / "metrics"), METRICS_FLUSH_S="0.1")
+    log = open(tmp_path / "gunicorn.log", "w")
+    proc = subprocess.Popen(["gunicorn", "-c", "gunicorn.conf.py", "scripts.bench_workers:offline_app()"],
+                            env=env, stdout=log, stderr=subprocess.STDOUT)
+    base = f"http://127.0.0.1:{port}"
+    try:
+        for _ in range(300):
+            try:
+                ready = requests.get(base + "/api/health/ready", timeout=1)
+                break
+            except requests.RequestException:
+                time.sleep(0.1)
+        else:
+            pytest.fail("gunicorn did not start:\n" + Path(tmp_path / "gunicorn.log").read_text())
+        assert ready.status_code == 200
+        assert {'build', 'warm_query'} <= set(ready.json()['phases_s'])
+        for i in range(4):
+            resp = requests.post(base + "/api/chat", json={"query": f"What is the CRC? {i}", "topic": "childrens_rights"})
+            assert resp.status_code == 200 and resp.json()['sources']
+        # whichever worker answers the scrape reports the whole server
+        time.sleep(0.5)
+        answered = 'rag_answers_total{topic="childrens_rights",difficulty="intermediate",outcome="ok"} 4\n'
+        scrapes = [requests.get(base + "/api/metrics").text for _ in range(6)]
+        assert all(answered in text for text in scrapes)
+        pids = {line.split('pid="')[1].split('"')[0] for text in scrapes for line in text.splitlines()
+                if line.startswith('rag_bulkhead{')}
+        assert len(pids) == 2
+    finally:
+        proc.terminate()
+        proc.wait(timeout=30)
+        log.close()
+    # the index was built once, in the master, before the workers forked
+    assert Path(tmp_path / "gunicorn.log").read_text().count("Initializing RAG system") == 1